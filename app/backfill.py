@@ -0,0 +1,344 @@
+"""Bulk reprocessing of stored SMS.
+
+Re-runs the processing logic of process_sms_task over historical messages,
+e.g. after changing reply rules:
+
+    python -m app.backfill --start 2024-05-01 --end 2024-06-01 --state unprocessed \\
+        --processes 4 --segments 16 --rate 100 --checkpoint backfill/may
+
+The SMS table is read with a parallel segmented scan; segments are spread
+over a process pool and each page of a segment is one batch. The rate
+ceiling is shared by the processes. With --checkpoint every segment's scan
+position is saved after each batch, so an interrupted run resumes where it
+stopped. --dry-run only scans and evaluates reply rules, and reports the
+throughput and a lower bound on the duration of the real run.
+
+The reply rule and reply selected for each message are stored with it.
+Replies are not sent and events are not published unless asked for with
+--send-replies and --publish, so reprocessing does not message customers twice.
+Replies sent by a run are recorded under a reply ID of that run, next to
+the replies the message already had.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.models.sms import SMSResponse
+from app.services.sms_service import SMSService
+from app.utils.helpers import parse_datetime
+
+logger = logging.getLogger("skippy.backfill")
+
+STATES = ("all", "unprocessed", "processed", "unreplied")
+
+
+class Selection(NamedTuple):
+    """Which stored messages to reprocess."""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    state: str = "all"
+
+
+class Options(NamedTuple):
+    """How to reprocess them."""
+    dry_run: bool = False
+    send_replies: bool = False
+    publish: bool = False
+    rate: float = 0.0  # Messages per second per process; 0 means unlimited
+    page_size: int = 500
+    run_id: Optional[str] = None  # Replies are recorded as "backfill:<run_id>"
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def matches(item: Dict[str, Any], selection: Selection) -> bool:
+    """Return True if a stored SMS item is selected."""
+    state = selection.state
+    if state == "unprocessed" and item.get('processed'):
+        return False
+    if state == "processed" and not item.get('processed'):
+        return False
+    if state == "unreplied" and item.get('reply_sent'):
+        return False
+    if selection.start or selection.end:
+        created = item.get('created')
+        created = parse_datetime(created) if isinstance(created, str) else None
+        if created is None:
+            return False
+        created = _utc(created)
+        if selection.start and created < selection.start:
+            return False
+        if selection.end and created >= selection.end:
+            return False
+    return True
+
+
+class Pacer:
+    """Space out calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next_at = 0.0
+
+    def wait(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        if self._next_at > now:
+            time.sleep(self._next_at - now)
+        self._next_at = max(self._next_at, now) + 1.0 / self.rate
+
+
+class Checkpoint:
+    """Per-segment progress files of one backfill job."""
+
+    def __init__(self, directory: str, job: Dict[str, Any], restart: bool = False):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        job_path = os.path.join(directory, "job.json")
+        if os.path.exists(job_path) and not restart:
+            with open(job_path) as f:
+                saved = json.load(f)
+            # A resumed run keeps its ID, so replies it already sent are not recorded twice
+            self.run_id = saved.pop("run_id", None) or uuid.uuid4().hex
+            if saved != job:
+                raise ValueError(
+                    f"Checkpoint {directory} belongs to a different job ({saved}); use --restart to discard it"
+                )
+        else:
+            for name in os.listdir(directory):
+                if name.startswith("segment-"):
+                    os.remove(os.path.join(directory, name))
+            self.run_id = uuid.uuid4().hex
+            self._write(job_path, {**job, "run_id": self.run_id})
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:04d}.json")
+
+    @staticmethod
+    def _write(path: str, data: Dict[str, Any]):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def load(self, segment: int) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(segment)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, segment: int, progress: Dict[str, Any]):
+        self._write(self._path(segment), progress)
+
+
+def _new_progress(segment: int) -> Dict[str, Any]:
+    return {
+        "segment": segment, "done": False, "last_key": None,
+        "scanned": 0, "selected": 0, "processed": 0, "failed": 0,
+        "failed_ids": [], "rules": {}, "scan_seconds": 0.0, "rule_seconds": 0.0,
+    }
+
+
+def run_segment(
+    segment: int,
+    total_segments: int,
+    selection: Selection,
+    options: Options,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[str, Any]:
+    """Scan one segment of the SMS table and reprocess the selected messages."""
+    from app.workers.sms_tasks import process_sms
+
+    progress = (checkpoint.load(segment) if checkpoint else None) or _new_progress(segment)
+    if progress["done"]:
+        return progress
+    process_kwargs: Dict[str, Any] = {}
+    if options.send_replies:
+        # Not the live task's reply ID, which messages that were answered already have
+        process_kwargs["reply_id"] = f"backfill:{options.run_id}"
+
+    sms_service = SMSService()
+    table = sms_service.db_service.dynamodb.Table(sms_service.sms_table_name)
+    pacer = Pacer(options.rate)
+    rules = Counter(progress["rules"])
+    kwargs: Dict[str, Any] = {'Segment': segment, 'TotalSegments': total_segments, 'Limit': options.page_size}
+    if progress["last_key"]:
+        kwargs['ExclusiveStartKey'] = progress["last_key"]
+
+    while True:
+        started = time.perf_counter()
+        response = table.scan(**kwargs)
+        progress["scan_seconds"] += time.perf_counter() - started
+
+        for item in response.get('Items', []):
+            progress["scanned"] += 1
+            if not matches(item, selection):
+                continue
+            progress["selected"] += 1
+            sms = SMSResponse.from_item(item)
+            if options.dry_run:
+                started = time.perf_counter()
+                _, rule = sms_service.select_reply(sms.message)
+                progress["rule_seconds"] += time.perf_counter() - started
+                rules[rule.id if rule else "default"] += 1
+                continue
+            pacer.wait()
+            try:
+                result = process_sms(
+                    sms_service, sms,
+                    send_reply=options.send_replies, publish=options.publish, record_stats=False,
+                    **process_kwargs
+                )
+                rules[result["reply_rule"] or "default"] += 1
+                progress["processed"] += 1
+            except Exception as e:
+                logger.warning(f"Reprocessing SMS {sms.id} failed: {e}")
+                progress["failed"] += 1
+                progress["failed_ids"].append(sms.id)
+
+        progress["rules"] = dict(rules)
+        progress["last_key"] = response.get('LastEvaluatedKey')
+        progress["done"] = not progress["last_key"]
+        if checkpoint is not None and not options.dry_run:
+            checkpoint.save(segment, progress)
+        if progress["done"]:
+            return progress
+        kwargs['ExclusiveStartKey'] = progress["last_key"]
+
+
+def _run_segment_star(args) -> Dict[str, Any]:
+    return run_segment(*args)
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float, options: Options, processes: int) -> Dict[str, Any]:
+    """Add up segment results and compute throughput (and, for dry runs, a duration estimate).
+
+    A real run scans the whole table like the dry run did, then processes
+    each selected message no faster than the rate ceiling and no faster than
+    its measured rule cost allows. The writes of process_sms are not
+    measured, so the estimate is a lower bound.
+    """
+    totals = {key: sum(result[key] for result in results) for key in ("scanned", "selected", "processed", "failed")}
+    rules = Counter()
+    for result in results:
+        rules.update(result["rules"])
+    summary: Dict[str, Any] = {
+        **totals,
+        "elapsed_seconds": round(elapsed, 3),
+        "rules": dict(rules.most_common()),
+        "failed_ids": [sms_id for result in results for sms_id in result["failed_ids"]],
+    }
+    if elapsed > 0:
+        summary["scanned_per_second"] = round(totals["scanned"] / elapsed, 1)
+        summary["processed_per_second"] = round(totals["processed"] / elapsed, 1)
+    if options.dry_run:
+        rule_seconds = sum(result["rule_seconds"] for result in results)
+        selected = totals["selected"]
+        summary["rule_us_per_message"] = round(rule_seconds / selected * 1e6, 1) if selected else None
+        # Each process scans its segments, then processes their selected messages
+        scan_seconds = sum(result["scan_seconds"] for result in results) / processes
+        process_seconds = rule_seconds / processes
+        if options.rate > 0:
+            process_seconds = max(process_seconds, selected / (options.rate * processes))
+        summary["estimated_min_seconds"] = round(scan_seconds + process_seconds, 1)
+    return summary
+
+
+def run_backfill(
+    selection: Selection,
+    options: Options,
+    segments: int = 8,
+    processes: int = 4,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[str, Any]:
+    """Reprocess the selected messages across a process pool; returns a summary.
+
+    `options.rate` is the total ceiling and is split evenly over the processes.
+    """
+    processes = max(1, min(processes, segments))
+    per_process = options._replace(
+        rate=options.rate / processes if options.rate > 0 else 0.0,
+        run_id=options.run_id or (checkpoint.run_id if checkpoint else uuid.uuid4().hex)
+    )
+    jobs = [(segment, segments, selection, per_process, checkpoint) for segment in range(segments)]
+
+    started = time.perf_counter()
+    results = []
+    if processes == 1:
+        for job in jobs:
+            results.append(run_segment(*job))
+    else:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            for result in pool.imap_unordered(_run_segment_star, jobs):
+                logger.info(
+                    f"Segment {result['segment']} done: {result['scanned']} scanned, "
+                    f"{result['selected']} selected, {result['processed']} processed, {result['failed']} failed"
+                )
+                results.append(result)
+    return summarize(results, time.perf_counter() - started, options, processes)
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"invalid ISO timestamp: {value}")
+    return _utc(parsed)
+
+
+def main(argv=None):
+    """Parse arguments and run the backfill."""
+    parser = argparse.ArgumentParser(description="Reprocess stored SMS messages")
+    parser.add_argument("--start", type=_parse_time, help="Only messages created at or after this time (UTC)")
+    parser.add_argument("--end", type=_parse_time, help="Only messages created before this time (UTC)")
+    parser.add_argument("--state", choices=STATES, default="all")
+    parser.add_argument("--segments", type=int, default=8, help="Parallel scan segments")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rate", type=float, default=50.0, help="Max messages per second in total (0 = unlimited)")
+    parser.add_argument("--page-size", type=int, default=500, help="Items per scan page (one batch)")
+    parser.add_argument("--checkpoint", help="Directory to save progress in, for resuming")
+    parser.add_argument("--restart", action="store_true", help="Discard the progress saved in --checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Only scan and evaluate reply rules")
+    parser.add_argument("--send-replies", action="store_true", help="Send replies (with suppression) again")
+    parser.add_argument("--publish", action="store_true", help="Publish sms.received events to subscribers again")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    selection = Selection(args.start, args.end, args.state)
+    options = Options(
+        dry_run=args.dry_run,
+        send_replies=args.send_replies,
+        publish=args.publish,
+        rate=args.rate,
+        page_size=args.page_size
+    )
+    checkpoint = None
+    if args.checkpoint and not args.dry_run:
+        job = {
+            "start": args.start.isoformat() if args.start else None,
+            "end": args.end.isoformat() if args.end else None,
+            "state": args.state,
+            "segments": args.segments,
+        }
+        checkpoint = Checkpoint(args.checkpoint, job, restart=args.restart)
+
+    summary = run_backfill(selection, options, segments=args.segments, processes=args.processes, checkpoint=checkpoint)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
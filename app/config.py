@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -14,6 +14,34 @@ class Settings(BaseSettings):
     # DynamoDB Configuration
     dynamodb_table_name: str = "skippy_webhooks"
     dynamodb_endpoint_url: Optional[str] = None  # For local development
+    dynamodb_connect_timeout: float = 2.0
+    dynamodb_read_timeout: float = 5.0
+    dynamodb_max_attempts: int = 3  # Including the first attempt
+    
+    # Ingest Spool Configuration (local fallback while DynamoDB is unavailable)
+    spool_enabled: bool = True
+    spool_dir: str = "spool"
+    spool_segment_max_mb: int = 64
+    spool_failure_threshold: int = 3  # Consecutive failed writes before spooling directly
+    spool_fallback_timeout: float = 10.0  # Seconds to spool directly before retrying DynamoDB
+    spool_replay_rate: float = 50.0  # Max replayed writes per second
+    spool_replay_interval: float = 5.0  # Seconds between replay attempts
+    
+    # Webhook Batch Configuration (POST /webhooks/batch)
+    webhook_batch_max_items: int = 10000  # Events per request
+    webhook_batch_max_item_bytes: int = 256 * 1024  # Encoded size of one event
+    webhook_batch_concurrency: int = 8  # BatchWriteItem chunks written in parallel
+    
+    # Outbound Webhook Configuration (event fan-out to subscribers)
+    webhook_delivery_enabled: bool = True
+    subscriptions_table_name: str = "skippy_subscriptions"
+    subscriptions_reload_interval: float = 30.0  # Seconds between registry refreshes
+    webhook_delivery_timeout: float = 5.0
+    webhook_delivery_max_connections: int = 100  # Shared HTTP pool size per worker process
+    webhook_delivery_retries: int = 2  # Immediate retries before a delivery is re-queued
+    webhook_delivery_max_attempts: int = 8  # Re-queued attempts before an event is dropped
+    webhook_delivery_breaker_threshold: int = 5  # Consecutive failures that open a subscriber's circuit
+    webhook_delivery_breaker_reset: float = 30.0  # Seconds before an open circuit is retried
     
     # Redis Configuration
     redis_url: str = "redis://localhost:6379"
@@ -22,10 +50,119 @@ class Settings(BaseSettings):
     app_name: str = "Skippy"
     debug: bool = False
     
+    # Production Server Configuration (python -m app.server)
+    web_host: str = "0.0.0.0"
+    web_port: int = 8000
+    web_concurrency: Optional[int] = None  # Worker processes (defaults to CPU count)
+    web_graceful_timeout: int = 30  # Seconds to drain in-flight requests on shutdown
+    web_max_memory_mb: Optional[int] = None  # Recycle workers above this RSS
+    web_backlog: int = 2048
+    
+    # Health Probe Configuration
+    health_probe_interval: float = 5.0  # Seconds between background dependency checks
+    health_probe_timeout: float = 2.0
+    health_max_in_flight: int = 500  # Report not ready above this many in-flight requests
+    
+    # Metrics Configuration
+    metrics_enabled: bool = True
+    worker_metrics_port: Optional[int] = None  # Base port for Celery worker exporters
+    server_timing_enabled: bool = False  # Return phase timings in a Server-Timing header
+    
+    # Tracing Configuration
+    tracing_enabled: bool = False
+    tracing_sample_rate: float = 0.1  # Fraction of traces recorded (decided at ingest)
+    tracing_exporter: str = "file"  # "file" or "otlp"
+    tracing_file_path: str = "traces.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    
+    # Memory Profiling Configuration (tracemalloc; slows allocation down while on)
+    memory_profiling_enabled: bool = False  # Trace allocations from process start
+    memory_snapshot_interval: float = 300.0  # Seconds between growth reports in the log; 0 for on demand only
+    memory_trace_frames: int = 1  # Frames kept per allocation; more gives tracebacks but costs more
+    memory_report_top: int = 10  # Allocation sites per report
+    memory_sample_seconds: float = 30.0  # Seconds an on-demand report traces for while profiling is off
+    worker_max_tasks_per_child: int = 1000  # Recycle Celery worker processes after this many tasks; 0 never recycles
+    
+    # Admin Configuration
+    admin_token: Optional[str] = None  # Enables /admin endpoints when set
+    profiler_max_seconds: int = 60
+    
     # 46elks SMS Configuration (Optional)
     elks_api_username: Optional[str] = None
     elks_api_password: Optional[str] = None
     elks_sms_from_number: Optional[str] = None
+    elks_api_url: str = "https://api.46elks.com/a1"
+    elks_timeout: float = 10.0
+    elks_max_connections: int = 100  # Shared HTTP pool size per worker process
+    
+    # Delivery Report Configuration (46elks whendelivered callbacks)
+    delivery_report_url: Optional[str] = None  # Public URL of /elks/delivery, set as whendelivered on every send
+    delivery_reports_table_name: str = "skippy_sms_delivery"
+    delivery_reports_flush_interval: float = 1.0  # Seconds reports are coalesced before writing
+    delivery_reports_max_pending: int = 5000  # Flush early above this many pending messages
+    delivery_reports_concurrency: int = 8  # Parallel status writes per flush
+    
+    # Traffic Stats Configuration (hourly/daily rollups)
+    traffic_stats_enabled: bool = True
+    traffic_stats_table_name: str = "skippy_sms_stats"
+    traffic_stats_flush_interval: float = 10.0  # Seconds counters are aggregated before writing
+    traffic_stats_per_sender: bool = False  # Also keep rollups per sender number
+    
+    # SMS Search Configuration (local SQLite FTS5 index)
+    sms_search_enabled: bool = False
+    sms_search_index_path: str = "search/sms.db"  # Shared by the processes of one host
+    sms_search_batch_size: int = 500  # Max changes committed per index transaction
+    sms_search_rebuild_segments: int = 8  # Parallel scan segments when rebuilding
+    
+    # SMS Worker Configuration
+    sms_task_payload_enabled: bool = False  # Enqueue the message with process_sms_task (skips a read)
+    sms_replies_table_name: str = "skippy_sms_replies"  # One item per reply, keyed by SMS ID
+    
+    # SMS Scheduler Configuration (python -m app.scheduler)
+    scheduler_enabled: bool = False  # Needs a running dispatcher; also used for coalesced replies
+    scheduler_tick_ms: int = 100  # Timer wheel resolution
+    scheduler_horizon: float = 300.0  # Seconds of upcoming sends the dispatcher keeps loaded
+    scheduler_refill_interval: float = 1.0  # Seconds between loads from Redis
+    scheduler_max_loaded: int = 100000  # Max sends held in the dispatcher's timer wheel
+    scheduler_batch_size: int = 100  # Sends per send task
+    scheduler_lease: float = 60.0  # Seconds before an unacknowledged claim is dispatched again
+    scheduler_metrics_port: Optional[int] = None  # Expose the dispatcher's metrics on this port
+    
+    # Campaign Configuration (bulk sends, /campaigns)
+    campaigns_table_name: str = "skippy_campaigns"
+    campaign_chunks_table_name: str = "skippy_campaign_chunks"
+    campaign_chunk_size: int = 500  # Recipients per stored chunk and per send task
+    campaign_max_recipients: int = 1000000  # Per upload request
+    campaign_sends_per_second: float = 50.0  # Budget shared by all campaigns and workers
+    campaign_send_burst: int = 50  # Sends the budget allows at once
+    campaign_concurrency: int = 20  # In-flight sends per chunk task
+    campaign_checkpoint_interval: float = 2.0  # Seconds between progress writes (and pause checks)
+    campaign_chunk_lease: float = 300.0  # Seconds before another worker may take over a chunk
+    campaign_budget_timeout: float = 60.0  # Seconds to wait for send budget before releasing a chunk
+    
+    # Auto-reply Rules Configuration
+    reply_rules_path: Optional[str] = None  # JSON file with reply rules
+    reply_rules_table_name: Optional[str] = None  # DynamoDB table with reply rules
+    reply_rules_reload_interval: float = 30.0  # Seconds between reload checks
+    
+    # Auto-reply Suppression Configuration
+    reply_suppression_window: int = 300  # Seconds; 0 disables suppression
+    reply_suppression_max_replies: int = 1  # Replies per sender per window
+    reply_suppression_coalesce: bool = False  # Send one delayed reply for suppressed bursts
+    
+    # Inbound Rate Limit Configuration (/elks/sms, checked before storing)
+    rate_limit_enabled: bool = True
+    rate_limit_sender_limit: int = 30  # SMS per sender per period; 0 disables the policy
+    rate_limit_sender_period: float = 60.0  # Seconds
+    rate_limit_sender_burst: int = 10  # SMS accepted at once before spacing is enforced
+    rate_limit_sender_action: Literal["reject", "drop"] = "drop"  # "reject" (429) or "drop" (acknowledge without storing)
+    rate_limit_ip_limit: int = 6000  # Requests per client IP per period; 0 disables the policy
+    rate_limit_ip_period: float = 60.0
+    rate_limit_ip_burst: int = 500
+    rate_limit_ip_action: Literal["reject", "drop"] = "reject"
+    rate_limit_exempt_ips: str = ""  # Comma-separated addresses/CIDR ranges skipped by the IP policy
+    rate_limit_trusted_proxies: int = 0  # Proxies in front that append to X-Forwarded-For (0 ignores the header)
+    rate_limit_local_fraction: float = 0.1  # Share of a burst a process admits without asking Redis
     
     class Config:
         env_file = ".env"
@@ -1,13 +1,44 @@
+import asyncio
+import hmac
 import logging
-from typing import List
-from fastapi import FastAPI, HTTPException, Depends, Request
+import signal
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import ValidationError
 
 from app.config import settings
-from app.models.sms import SMSWebhook
+from app.models.sms import SMSWebhook, StoredReply
+from app.models.campaign import Campaign, CampaignCreate, CampaignRecipient, CampaignUploadResponse
+from app.models.delivery_report import DeliveryReport, DeliveryStatus
+from app.models.subscription import SubscriptionCreate
+from app.models.schedule import ScheduledSMS, ScheduledSMSCreate
+from app.models.search import SMSSearchHit
+from app.models.traffic_stats import TrafficBucket
+from app.models.webhook import WebhookCreate, WebhookUpdate, WebhookResponse, WebhookBatchResponse
 from app.services.sms_service import SMSService
-from app.workers.sms_tasks import process_sms_task
+from app.services.webhook_service import WebhookService
+from app.services.campaigns import CampaignStateError, RecipientUploader, get_campaign_store
+from app.services.webhook_delivery import get_subscription_registry
+from app.services.delivery_reports import get_delivery_report_buffer
+from app.services.sms_scheduler import get_sms_scheduler
+from app.services.sms_search import get_sms_search_index, close_sms_search_index
+from app.services.traffic_stats import ALL_SCOPE, MAX_RANGE, get_traffic_stats, query_range, stop_traffic_stats
+from app.services.health_service import InFlightMiddleware, health_prober
+from app.services.ingest_spool import SpoolReplayer, get_ingest_spool
+from app.services.rate_limiter import REJECT, RateLimitDecision, client_ip, get_rate_limiter, retry_after_header
+from app.workers.sms_tasks import process_sms_task, task_payload
+from app.workers.campaign_tasks import queue_chunks
+from app.workers.tasks import process_webhook_task, process_webhook_batch_task
+from app.utils.metrics import MetricsMiddleware, generate_latest, CONTENT_TYPE_LATEST
+from app.utils.timing import ServerTimingMiddleware, phase
+from app.utils.profiling import profiler
+from app.utils.memory import get_memory_tracker, start_memory_profiling
+from app.utils.tracing import start_span, extract, KIND_SERVER
+from app.utils.helpers import run_sync
+from app.utils.json_stream import JSONStreamError, iter_json_array, iter_ndjson
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,7 +48,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title=settings.app_name,
     description="A webhook service with DynamoDB storage and worker tasks",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -29,11 +61,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count in-flight requests for the readiness probe
+app.add_middleware(InFlightMiddleware, prober=health_prober)
+
+# Add request metrics middleware
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Add Server-Timing middleware (phase timings are not recorded when disabled)
+if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware)
+
 # Dependency to get SMS service
 def get_sms_service():
     return SMSService()
 
 
+# Dependency to get webhook service
+def get_webhook_service():
+    return WebhookService()
+
+
+# Dependency to protect admin endpoints
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+# Drains SMS spooled during DynamoDB outages (None when spooling is disabled)
+spool_replayer: Optional[SpoolReplayer] = None
+
+# Running search index rebuild, if any
+search_rebuild: Optional[asyncio.Future] = None
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
@@ -41,10 +104,61 @@ async def startup_event():
     
     sms_service = SMSService()
     await sms_service.initialize()
+    await WebhookService().initialize()
+    if settings.webhook_delivery_enabled:
+        await get_subscription_registry().initialize()
+    
+    # Coalesce 46elks delivery reports and write them in the background
+    delivery_reports = get_delivery_report_buffer()
+    await delivery_reports.store.initialize()
+    delivery_reports.start()
+    
+    # Aggregate traffic rollups in memory and flush them periodically
+    traffic_stats = get_traffic_stats()
+    if traffic_stats is not None:
+        await traffic_stats.initialize()
+    
+    await get_campaign_store().initialize()
+    
+    # Trace allocations when enabled; SIGUSR2 logs a growth report on demand
+    start_memory_profiling()
+    try:
+        signal.signal(signal.SIGUSR2, lambda signum, frame: get_memory_tracker().request_report())
+    except ValueError:
+        # Not running in the main thread (e.g. under a test client)
+        pass
+    
+    # Start background dependency checks for the readiness probe
+    health_prober.start()
+    
+    # Replay SMS spooled while DynamoDB was unavailable and queue them for processing
+    global spool_replayer
+    spool = get_ingest_spool()
+    if spool is not None:
+        spool_replayer = SpoolReplayer(
+            spool,
+            write=lambda item: run_sync(sms_service.replay_spooled_sms(item)),
+            on_replayed=lambda item: process_sms_task.delay(item['id']),
+            rate=settings.spool_replay_rate,
+            interval=settings.spool_replay_interval
+        )
+        spool_replayer.start()
     
     logger.info("Skippy webhook service started successfully!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background services on shutdown."""
+    await health_prober.stop()
+    await get_delivery_report_buffer().stop()
+    await asyncio.get_running_loop().run_in_executor(None, stop_traffic_stats)
+    await asyncio.get_running_loop().run_in_executor(None, close_sms_search_index)
+    if spool_replayer is not None:
+        await spool_replayer.stop()
+        spool_replayer.spool.close()
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -54,52 +168,571 @@ async def health_check():
         "version": "1.0.0"
     }
 
+
+@app.get("/health/live")
+async def liveness_probe():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_probe():
+    """Readiness probe served from the cached background dependency checks."""
+    snapshot = health_prober.snapshot()
+    return JSONResponse(
+        content=snapshot,
+        status_code=200 if snapshot["ready"] else 503
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(
+        content=generate_latest(),
+        media_type=CONTENT_TYPE_LATEST
+    )
+
+@app.post("/webhooks", response_model=WebhookResponse)
+async def create_webhook(
+    webhook: WebhookCreate,
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """Receive a single webhook event."""
+    webhook_response = await webhook_service.create_webhook(webhook)
+    process_webhook_task.delay(webhook_response.id)
+    return webhook_response
+
+@app.post("/webhooks/batch", response_model=WebhookBatchResponse)
+async def create_webhooks_batch(
+    request: Request,
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """Receive many webhook events as a JSON array or NDJSON (application/x-ndjson).
+    
+    The body is validated and written while it streams in; the response has
+    one result per event, by position. If the body is malformed or too long,
+    reading stops with a 400/413 and the events read until then are reported.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    parse = iter_ndjson if content_type in ("application/x-ndjson", "application/ndjson") else iter_json_array
+    writer = webhook_service.batch_writer(on_written=process_webhook_batch_task.delay)
+    
+    error, status_code, index = None, 200, 0
+    try:
+        async for value in parse(request.stream(), settings.webhook_batch_max_item_bytes):
+            if index >= settings.webhook_batch_max_items:
+                error = f"Batch exceeds {settings.webhook_batch_max_items} events"
+                status_code = 413
+                break
+            try:
+                webhook = WebhookCreate.model_validate(value)
+            except ValidationError as e:
+                writer.reject(index, "; ".join(
+                    f"{'.'.join(map(str, err['loc'])) or 'event'}: {err['msg']}" for err in e.errors()
+                ))
+            else:
+                await writer.add(index, webhook)
+            index += 1
+    except JSONStreamError as e:
+        error, status_code = str(e), 400
+    
+    results = await writer.close()
+    counts = {"created": 0, "invalid": 0, "failed": 0}
+    for result in results:
+        counts[result.status] += 1
+    response = WebhookBatchResponse(**counts, error=error, results=results)
+    return ORJSONResponse(content=response.model_dump(), status_code=status_code)
+
+@app.get("/webhooks", response_model=List[WebhookResponse])
+async def list_webhooks(
+    limit: int = Query(default=100, ge=1, le=1000),
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """List webhooks."""
+    return await webhook_service.list_webhooks(limit=limit)
+
+@app.get("/webhooks/{webhook_id}", response_model=WebhookResponse)
+async def get_webhook(
+    webhook_id: str,
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """Get a specific webhook."""
+    webhook = await webhook_service.get_webhook(webhook_id)
+    if not webhook:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return webhook
+
+@app.put("/webhooks/{webhook_id}", response_model=WebhookResponse)
+async def update_webhook(
+    webhook_id: str,
+    update: WebhookUpdate,
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """Update a webhook."""
+    webhook = await webhook_service.update_webhook(webhook_id, update)
+    if not webhook:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return webhook
+
+@app.delete("/webhooks/{webhook_id}")
+async def delete_webhook(
+    webhook_id: str,
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """Delete a webhook."""
+    if not await webhook_service.delete_webhook(webhook_id):
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return {"message": "Webhook deleted successfully"}
+
+@app.post("/webhooks/{webhook_id}/process")
+async def process_webhook(
+    webhook_id: str,
+    webhook_service: WebhookService = Depends(get_webhook_service)
+):
+    """Manually trigger processing of a webhook."""
+    webhook = await webhook_service.get_webhook(webhook_id)
+    if not webhook:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    process_webhook_task.delay(webhook_id)
+    return {"message": "Webhook queued for processing"}
+
+def _rate_limited_response(action: str, decision: RateLimitDecision) -> Response:
+    """429 with Retry-After for rejecting policies; a plain 200 so 46elks does not retry for dropping ones."""
+    if action == REJECT:
+        return Response(
+            content="Rate limit exceeded",
+            media_type="text/plain",
+            status_code=429,
+            headers={"Retry-After": retry_after_header(decision)}
+        )
+    return Response(status_code=200)
+
+
 @app.post("/elks/sms")
 async def receive_sms_webhook(
     request: Request,
     sms_service: SMSService = Depends(get_sms_service)
 ):
     """Receive SMS webhook from 46elks."""
+    span = start_span(
+        "receive_sms_webhook",
+        parent=extract(request.headers.get("traceparent")),
+        kind=KIND_SERVER,
+        attributes={"http.route": "/elks/sms"}
+    )
+    with span:
+        try:
+            limiter = get_rate_limiter()
+            if limiter is not None:
+                with phase("rate_limit"):
+                    ip = client_ip(
+                        request.client.host if request.client else None,
+                        request.headers.get("x-forwarded-for"),
+                        settings.rate_limit_trusted_proxies
+                    )
+                    if not limiter.is_exempt(ip):
+                        decision = await limiter.check("ip", ip)
+                        if not decision.allowed:
+                            logger.warning(f"Rate limited SMS webhook from IP {ip}")
+                            return _rate_limited_response(limiter.policies["ip"].action, decision)
+
+            with phase("parse"):
+                # Parse form data from 46elks webhook
+                form_data = await request.form()
+                
+                # Debug: Log the received form data
+                logger.info(f"Received form data: {dict(form_data)}")
+                
+                # Convert form data to dict and handle URL encoding
+                sms_data = {}
+                for key, value in form_data.items():
+                    if key == "from":
+                        sms_data["from_number"] = value
+                    elif key == "to":
+                        sms_data["to_number"] = value
+                    else:
+                        sms_data[key] = value
+                
+                # Debug: Log the processed SMS data
+                logger.info(f"Processed SMS data: {sms_data}")
+            
+            with phase("validate"):
+                # Create SMS webhook object
+                sms_webhook = SMSWebhook(**sms_data)
+                span.set_attribute("sms.id", sms_webhook.id)
+            
+            if limiter is not None:
+                with phase("rate_limit"):
+                    decision = await limiter.check("sender", sms_webhook.from_number)
+                    if not decision.allowed:
+                        logger.warning(f"Rate limited SMS {sms_webhook.id} from {sms_webhook.from_number}")
+                        return _rate_limited_response(limiter.policies["sender"].action, decision)
+            
+            with phase("store"):
+                # Store SMS in DynamoDB
+                sms_response = await sms_service.store_sms(sms_webhook)
+            
+            with phase("dispatch"):
+                # Queue the SMS for processing, with the message itself if workers accept it
+                if settings.sms_task_payload_enabled:
+                    process_sms_task.delay(sms_webhook.id, task_payload(sms_response))
+                else:
+                    process_sms_task.delay(sms_webhook.id)
+            
+            return Response(
+                status_code=200
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing SMS webhook: {e}")
+            logger.error(f"Error type: {type(e).__name__}")
+            span.record_exception(e)
+            if hasattr(e, 'errors'):
+                logger.error(f"Validation errors: {e.errors}")
+            return Response(
+                content="Error processing SMS",
+                media_type="text/plain",
+                status_code=500
+            )
+
+@app.post("/elks/delivery")
+async def receive_delivery_report(
+    request: Request,
+    sms_id: Optional[str] = Query(default=None, description="Incoming SMS the message replied to")
+):
+    """Receive a delivery report from 46elks (the `whendelivered` callback).
+    
+    Acknowledged once the report is stored, so 46elks sends it again if the
+    write fails or the process dies first.
+    """
+    form_data = await request.form()
     try:
-        # Parse form data from 46elks webhook
-        form_data = await request.form()
-        
-        # Debug: Log the received form data
-        logger.info(f"Received form data: {dict(form_data)}")
-        
-        # Convert form data to dict and handle URL encoding
-        sms_data = {}
-        for key, value in form_data.items():
-            if key == "from":
-                sms_data["from_number"] = value
-            elif key == "to":
-                sms_data["to_number"] = value
-            else:
-                sms_data[key] = value
-        
-        # Debug: Log the processed SMS data
-        logger.info(f"Processed SMS data: {sms_data}")
-        
-        # Create SMS webhook object
-        sms_webhook = SMSWebhook(**sms_data)
-        
-        # Store SMS in DynamoDB
-        sms_response = await sms_service.store_sms(sms_webhook)
-        
-        return Response(
-            status_code=200
+        report = DeliveryReport(
+            id=form_data.get("id"),
+            status=form_data.get("status"),
+            delivered=form_data.get("delivered") or None,
+            sms_id=sms_id
         )
-        
+    except ValidationError as e:
+        logger.warning(f"Invalid delivery report {dict(form_data)}: {e}")
+        return Response(content="Invalid delivery report", media_type="text/plain", status_code=400)
+    
+    # Buffered: several reports for one message are written once
+    try:
+        await get_delivery_report_buffer().submit(report)
     except Exception as e:
-        logger.error(f"Error processing SMS webhook: {e}")
-        logger.error(f"Error type: {type(e).__name__}")
-        if hasattr(e, 'errors'):
-            logger.error(f"Validation errors: {e.errors}")
-        return Response(
-            content="Error processing SMS",
-            media_type="text/plain",
-            status_code=500
+        logger.error(f"Error storing delivery report {report.id}: {e}")
+        return Response(content="Error storing delivery report", media_type="text/plain", status_code=503)
+    return Response(status_code=200)
+
+@app.get("/deliveries/{message_id}", response_model=DeliveryStatus)
+async def get_delivery_status(message_id: str):
+    """Get the latest delivery status of an outbound message."""
+    status = await get_delivery_report_buffer().status(message_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Delivery status not found")
+    return status
+
+@app.get("/sms/{sms_id}/deliveries", response_model=List[DeliveryStatus])
+async def get_sms_deliveries(sms_id: str):
+    """Get the delivery status of the replies sent to an SMS."""
+    return await get_delivery_report_buffer().store.for_sms(sms_id)
+
+@app.get("/sms/{sms_id}/replies", response_model=List[StoredReply])
+async def get_sms_replies(
+    sms_id: str,
+    sms_service: SMSService = Depends(get_sms_service)
+):
+    """Get the replies recorded for an SMS, oldest first."""
+    return await sms_service.list_replies(sms_id)
+
+@app.get("/stats/traffic", response_model=List[TrafficBucket])
+async def get_traffic_stats_buckets(
+    granularity: Literal["hour", "day"] = Query(default="hour"),
+    start: Optional[datetime] = Query(default=None, description="Defaults to 24 hours or 30 days before end"),
+    end: Optional[datetime] = Query(default=None, description="Defaults to now"),
+    number: Optional[str] = Query(default=None, description="Only traffic to this receiving number"),
+    sender: Optional[str] = Query(default=None, description="Only traffic from this sender (needs TRAFFIC_STATS_PER_SENDER)")
+):
+    """Get hourly or daily traffic rollups, oldest first."""
+    stats = get_traffic_stats()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Traffic stats are disabled")
+    if number and sender:
+        raise HTTPException(status_code=400, detail="Filter by number or sender, not both")
+    start, end = query_range(granularity, start, end)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if end - start > MAX_RANGE[granularity]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too long for {granularity} buckets (max {MAX_RANGE[granularity].days} days)"
         )
+    scope = f"to:{number}" if number else f"from:{sender}" if sender else ALL_SCOPE
+    return await stats.query(granularity, start, end, scope)
+
+@app.get("/sms/search", response_model=List[SMSSearchHit])
+async def search_sms(
+    q: str = Query(..., min_length=1, max_length=500, description='Words, "phrases" and prefix* terms'),
+    number: Optional[str] = Query(default=None, description="Sender or recipient number"),
+    from_number: Optional[str] = Query(default=None),
+    to_number: Optional[str] = Query(default=None),
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None),
+    order: Literal["recent", "relevance"] = Query(default="recent"),
+    limit: int = Query(default=50, ge=1, le=500)
+):
+    """Full-text search over stored SMS messages."""
+    index = get_sms_search_index()
+    if index is None:
+        raise HTTPException(status_code=404, detail="SMS search is disabled")
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            None,
+            lambda: index.search(q, number=number, from_number=from_number, to_number=to_number,
+                                 start=start, end=end, order=order, limit=limit)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/sms")
+async def list_sms(
+    limit: int = Query(default=100, ge=1, le=1000),
+    sms_service: SMSService = Depends(get_sms_service)
+):
+    """List SMS messages."""
+    sms_list = await sms_service.list_sms(limit=limit)
+    # Serialize directly with orjson; the rows come from our own table
+    return ORJSONResponse(content=[sms.model_dump() for sms in sms_list])
+
+@app.get("/sms/{sms_id}")
+async def get_sms(
+    sms_id: str,
+    sms_service: SMSService = Depends(get_sms_service)
+):
+    """Get a specific SMS."""
+    sms = await sms_service.get_sms(sms_id)
+    if not sms:
+        raise HTTPException(status_code=404, detail="SMS not found")
+    return ORJSONResponse(content=sms.model_dump())
+
+@app.post("/subscriptions", dependencies=[Depends(require_admin)])
+async def create_subscription(subscription: SubscriptionCreate):
+    """Register an outbound webhook subscriber (the response includes its signing secret)."""
+    created = await get_subscription_registry().create(subscription)
+    return created.model_dump(mode="json")
+
+@app.get("/subscriptions", dependencies=[Depends(require_admin)])
+async def list_subscriptions():
+    """List outbound webhook subscribers."""
+    subscriptions = await get_subscription_registry().list()
+    return [subscription.model_dump(mode="json", exclude={"secret"}) for subscription in subscriptions]
+
+@app.delete("/subscriptions/{subscription_id}", dependencies=[Depends(require_admin)])
+async def delete_subscription(subscription_id: str):
+    """Remove an outbound webhook subscriber."""
+    if not await get_subscription_registry().delete(subscription_id):
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    return {"message": "Subscription deleted successfully"}
+
+def _require_scheduler():
+    scheduler = get_sms_scheduler()
+    if scheduler is None:
+        raise HTTPException(status_code=404, detail="SMS scheduling is disabled")
+    return scheduler
+
+@app.post("/sms/schedule", status_code=201, response_model=ScheduledSMS, dependencies=[Depends(require_admin)])
+async def schedule_sms(request: ScheduledSMSCreate):
+    """Schedule an SMS to be sent later."""
+    scheduler = _require_scheduler()
+    send_at = request.send_at or datetime.now(timezone.utc) + timedelta(seconds=request.delay_seconds)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, lambda: scheduler.schedule(request.to_number, request.message, send_at, sms_id=request.sms_id)
+    )
+
+@app.get("/sms/schedule/{schedule_id}", response_model=ScheduledSMS, dependencies=[Depends(require_admin)])
+async def get_scheduled_sms(schedule_id: str):
+    """Get a pending scheduled SMS."""
+    scheduler = _require_scheduler()
+    scheduled = await asyncio.get_running_loop().run_in_executor(None, scheduler.get, schedule_id)
+    if scheduled is None:
+        raise HTTPException(status_code=404, detail="Scheduled SMS not found")
+    return scheduled
+
+@app.delete("/sms/schedule/{schedule_id}", dependencies=[Depends(require_admin)])
+async def cancel_scheduled_sms(schedule_id: str):
+    """Cancel a scheduled SMS that has not been dispatched yet."""
+    scheduler = _require_scheduler()
+    if not await asyncio.get_running_loop().run_in_executor(None, scheduler.cancel, schedule_id):
+        raise HTTPException(status_code=404, detail="Scheduled SMS not found or already sent")
+    return {"message": "Scheduled SMS cancelled"}
+
+def _campaign_state_error(e: CampaignStateError) -> HTTPException:
+    if e.status is None:
+        return HTTPException(status_code=404, detail="Campaign not found")
+    return HTTPException(status_code=409, detail=f"Campaign is {e.status}")
+
+@app.post("/campaigns", status_code=201, response_model=Campaign, dependencies=[Depends(require_admin)])
+async def create_campaign(campaign: CampaignCreate):
+    """Create a draft bulk SMS campaign."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, get_campaign_store().create, campaign)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/campaigns/{campaign_id}", response_model=Campaign, dependencies=[Depends(require_admin)])
+async def get_campaign(campaign_id: str):
+    """Get a campaign and its progress."""
+    campaign = await asyncio.get_running_loop().run_in_executor(None, get_campaign_store().get, campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+@app.post("/campaigns/{campaign_id}/recipients", response_model=CampaignUploadResponse,
+          dependencies=[Depends(require_admin)])
+async def upload_campaign_recipients(campaign_id: str, request: Request):
+    """Add recipients to a draft campaign as a JSON array or NDJSON (application/x-ndjson).
+    
+    Each recipient is `{"to": "+46...", "vars": {...}}`. Recipients are
+    stored in chunks while the body streams in; invalid lines are skipped
+    and reported. Uploads can be repeated until the campaign is started.
+    """
+    store = get_campaign_store()
+    campaign = await asyncio.get_running_loop().run_in_executor(None, store.get, campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    if campaign.status != "draft":
+        raise HTTPException(status_code=409, detail=f"Campaign is {campaign.status}")
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    parse = iter_ndjson if content_type in ("application/x-ndjson", "application/ndjson") else iter_json_array
+    uploader = RecipientUploader(store, campaign_id, chunk_size=settings.campaign_chunk_size)
+    
+    error, status_code, line = None, 200, 0
+    try:
+        async for value in parse(request.stream(), 64 * 1024):
+            line += 1
+            if line > settings.campaign_max_recipients:
+                error = f"Upload exceeds {settings.campaign_max_recipients} recipients"
+                status_code = 413
+                break
+            try:
+                recipient = CampaignRecipient.model_validate(value)
+            except ValidationError as e:
+                uploader.reject(line, "; ".join(
+                    f"{'.'.join(map(str, err['loc'])) or 'recipient'}: {err['msg']}" for err in e.errors()
+                ))
+            else:
+                await uploader.add(recipient)
+    except JSONStreamError as e:
+        error, status_code = str(e), 400
+    
+    response = await uploader.close()
+    if error is not None:
+        response.error = error
+    elif response.error is not None:
+        # Some chunks could not be stored (the campaign was started meanwhile, or DynamoDB failed)
+        status_code = 409 if uploader.conflict else 503
+    return ORJSONResponse(content=response.model_dump(), status_code=status_code)
+
+@app.post("/campaigns/{campaign_id}/start", response_model=Campaign, dependencies=[Depends(require_admin)])
+async def start_campaign(campaign_id: str):
+    """Start sending a draft campaign that has recipients."""
+    try:
+        campaign = await asyncio.get_running_loop().run_in_executor(None, get_campaign_store().start, campaign_id)
+    except CampaignStateError as e:
+        raise _campaign_state_error(e)
+    queue_chunks(campaign.id, campaign.chunks)
+    return campaign
+
+@app.post("/campaigns/{campaign_id}/pause", response_model=Campaign, dependencies=[Depends(require_admin)])
+async def pause_campaign(campaign_id: str):
+    """Pause a running campaign; sending stops within CAMPAIGN_CHECKPOINT_INTERVAL seconds."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, get_campaign_store().pause, campaign_id)
+    except CampaignStateError as e:
+        raise _campaign_state_error(e)
+
+@app.post("/campaigns/{campaign_id}/resume", response_model=Campaign, dependencies=[Depends(require_admin)])
+async def resume_campaign(campaign_id: str):
+    """Resume a paused campaign, or re-queue the unsent chunks of a running one."""
+    try:
+        campaign = await asyncio.get_running_loop().run_in_executor(None, get_campaign_store().resume, campaign_id)
+    except CampaignStateError as e:
+        raise _campaign_state_error(e)
+    if campaign.status == "running":
+        queue_chunks(campaign.id, campaign.chunks)
+    return campaign
+
+@app.post("/admin/profile", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def profile_process(
+    seconds: float = Query(default=10.0, gt=0),
+    interval_ms: float = Query(default=5.0, ge=1.0, le=1000.0)
+):
+    """Sample all threads of this process and return collapsed stacks for a flame graph."""
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {settings.profiler_max_seconds}"
+        )
+    
+    loop = asyncio.get_running_loop()
+    collapsed = await loop.run_in_executor(None, profiler.profile, seconds, interval_ms / 1000.0)
+    if collapsed is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    return Response(content=collapsed, media_type="text/plain")
+
+@app.post("/admin/memory", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def memory_report(
+    since: Literal["previous", "baseline"] = Query(default="previous"),
+    limit: int = Query(default=settings.memory_report_top, ge=1, le=100),
+    seconds: float = Query(default=settings.memory_sample_seconds, gt=0)
+):
+    """Report the allocation sites of this process that grew most since the last report or the baseline.
+    
+    If allocations are not being traced, traces them for `seconds` only and
+    reports the growth within that window.
+    """
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {settings.profiler_max_seconds}"
+        )
+    
+    tracker = get_memory_tracker()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: tracker.report(since, limit, seconds))
+
+@app.delete("/admin/memory", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def stop_memory_tracing():
+    """Stop tracing allocations in this process."""
+    await asyncio.get_running_loop().run_in_executor(None, get_memory_tracker().stop)
+    return {"message": "Memory tracing stopped"}
+
+def _log_search_rebuild(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Search index rebuild failed: {future.exception()}")
+
+@app.post("/admin/search/rebuild", status_code=202, dependencies=[Depends(require_admin)])
+async def rebuild_search_index(
+    segments: int = Query(default=settings.sms_search_rebuild_segments, ge=1, le=64)
+):
+    """Rebuild the SMS search index from the SMS table in the background."""
+    global search_rebuild
+    index = get_sms_search_index()
+    if index is None:
+        raise HTTPException(status_code=404, detail="SMS search is disabled")
+    if search_rebuild is not None and not search_rebuild.done():
+        raise HTTPException(status_code=409, detail="A rebuild is already running")
+    
+    sms_service = SMSService()
+    table = sms_service.db_service.dynamodb.Table(sms_service.sms_table_name)
+    search_rebuild = asyncio.get_running_loop().run_in_executor(None, index.rebuild, table, segments)
+    search_rebuild.add_done_callback(_log_search_rebuild)
+    return {"message": "Search index rebuild started", "segments": segments}
 
 if __name__ == "__main__":
     import uvicorn
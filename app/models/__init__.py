@@ -1,3 +1,15 @@
-from .sms import SMSWebhook, SMSResponse, SMSReply
+from .sms import SMSWebhook, SMSResponse, SMSReply, SMSRecord
+from .reply_rule import ReplyRule
+from .webhook import (
+    WebhookCreate,
+    WebhookUpdate,
+    WebhookResponse,
+    WebhookBatchItemResult,
+    WebhookBatchResponse,
+)
 
-__all__ = ["SMSWebhook", "SMSResponse", "SMSReply"]
+__all__ = [
+    "SMSWebhook", "SMSResponse", "SMSReply", "SMSRecord", "ReplyRule",
+    "WebhookCreate", "WebhookUpdate", "WebhookResponse",
+    "WebhookBatchItemResult", "WebhookBatchResponse",
+]
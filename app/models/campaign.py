@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+CampaignState = Literal["draft", "running", "paused", "completed"]
+
+
+class CampaignCreate(BaseModel):
+    """Model for creating a bulk SMS campaign."""
+    name: str = Field(..., min_length=1, max_length=200, description="Campaign name")
+    template: str = Field(
+        ..., min_length=1, max_length=1600, description="Message text; {name} placeholders are filled per recipient"
+    )
+    from_number: Optional[str] = Field(default=None, description="Sender (defaults to ELKS_SMS_FROM_NUMBER)")
+
+
+class CampaignRecipient(BaseModel):
+    """One recipient line of a campaign upload."""
+    to: str = Field(..., pattern=r"^\+[1-9]\d{6,14}$", description="Recipient number in E.164 format")
+    vars: Dict[str, str] = Field(default_factory=dict, description="Values for the template placeholders")
+
+
+class Campaign(BaseModel):
+    """Model for a stored campaign and its progress."""
+    id: str = Field(..., description="Campaign ID")
+    name: str = Field(..., description="Campaign name")
+    template: str = Field(..., description="Message template")
+    from_number: Optional[str] = Field(default=None, description="Sender")
+    status: CampaignState = Field(..., description="draft, running, paused or completed")
+    recipients: int = Field(default=0, description="Recipients uploaded")
+    chunks: int = Field(default=0, description="Recipient chunks stored")
+    chunks_done: int = Field(default=0, description="Chunks fully sent")
+    sent: int = Field(default=0, description="Messages sent")
+    failed: int = Field(default=0, description="Messages that could not be sent")
+    created_at: datetime = Field(..., description="When the campaign was created")
+    started_at: Optional[datetime] = Field(default=None, description="When sending first started")
+    completed_at: Optional[datetime] = Field(default=None, description="When the last chunk was sent")
+
+
+class CampaignUploadResponse(BaseModel):
+    """Model for the result of a recipient upload."""
+    accepted: int = Field(..., description="Recipients stored")
+    invalid: int = Field(..., description="Lines rejected by validation")
+    chunks: int = Field(..., description="Total chunks stored for the campaign")
+    errors: List[str] = Field(default_factory=list, description="The first validation errors, by line")
+    error: Optional[str] = Field(default=None, description="Why reading the upload stopped early, if it did")
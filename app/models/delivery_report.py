@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+# Later states win when reports for one message arrive out of order
+STATUS_RANK = {"sent": 0, "delivered": 1, "failed": 1}
+
+
+class DeliveryReport(BaseModel):
+    """Model for a delivery report callback from 46elks."""
+    id: str = Field(..., description="ID of the outbound message in 46elks systems")
+    status: Literal["sent", "delivered", "failed"] = Field(..., description="Delivery status")
+    delivered: Optional[datetime] = Field(default=None, description="When the message was delivered")
+    sms_id: Optional[str] = Field(default=None, description="Incoming SMS the message replied to")
+
+    def supersedes(self, other: "DeliveryReport") -> bool:
+        """Return True if this report describes a later state than `other`."""
+        if STATUS_RANK[self.status] != STATUS_RANK[other.status]:
+            return STATUS_RANK[self.status] > STATUS_RANK[other.status]
+        # Same rank: a report with a delivery time beats one without; otherwise arrival order
+        if self.delivered and other.delivered:
+            return self.delivered >= other.delivered
+        return self.delivered is not None or other.delivered is None
+
+
+class DeliveryStatus(BaseModel):
+    """Model for the stored delivery status of an outbound message."""
+    id: str = Field(..., description="ID of the outbound message in 46elks systems")
+    status: str = Field(..., description="Latest delivery status")
+    delivered_at: Optional[datetime] = Field(default=None, description="When the message was delivered")
+    sms_id: Optional[str] = Field(default=None, description="Incoming SMS the message replied to")
+    updated_at: Optional[datetime] = Field(default=None, description="When the status was last written")
@@ -0,0 +1,17 @@
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class ReplyRule(BaseModel):
+    """Model for an auto-reply rule."""
+    id: str = Field(..., description="Unique rule ID")
+    type: Literal["keyword", "word", "regex"] = Field(
+        default="word", description="Match type (substring keyword, whole word or regex)"
+    )
+    pattern: str = Field(..., min_length=1, description="Keyword, word or regular expression to match")
+    reply: str = Field(..., description="Reply message sent when the rule matches")
+    priority: int = Field(default=0, description="Higher priority rules win when several match")
+    enabled: bool = Field(default=True, description="Whether the rule is active")
+    suppression_window: Optional[int] = Field(
+        default=None, ge=0, description="Per-sender reply suppression window in seconds (0 disables)"
+    )
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+
+class ScheduledSMSCreate(BaseModel):
+    """Model for scheduling an outbound SMS."""
+    to_number: str = Field(..., description="Recipient phone number")
+    message: str = Field(..., min_length=1, description="SMS message content")
+    send_at: Optional[datetime] = Field(default=None, description="When to send (UTC if no offset is given)")
+    delay_seconds: Optional[float] = Field(default=None, ge=0, description="Send this many seconds from now")
+    sms_id: Optional[str] = Field(default=None, description="Incoming SMS the message replies to")
+
+    @model_validator(mode="after")
+    def _check_time(self) -> "ScheduledSMSCreate":
+        if (self.send_at is None) == (self.delay_seconds is None):
+            raise ValueError("Give exactly one of send_at and delay_seconds")
+        return self
+
+
+class ScheduledSMS(BaseModel):
+    """Model for a pending scheduled SMS."""
+    id: str = Field(..., description="Schedule ID")
+    to_number: str = Field(..., description="Recipient phone number")
+    message: str = Field(..., description="SMS message content")
+    send_at: datetime = Field(..., description="When the SMS is due")
+    sms_id: Optional[str] = Field(default=None, description="Incoming SMS the message replies to")
+    status: Literal["scheduled", "dispatching"] = Field(..., description="Waiting, or claimed by the dispatcher")
@@ -0,0 +1,12 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class SMSSearchHit(BaseModel):
+    """Model for an SMS matching a full-text search."""
+    id: str = Field(..., description="Unique SMS ID")
+    from_number: str = Field(..., description="Sender phone number")
+    to_number: str = Field(..., description="Recipient phone number")
+    created: datetime = Field(..., description="Creation timestamp (UTC)")
+    message: str = Field(..., description="SMS message content")
+    snippet: str = Field(..., description="Matching part of the message, matches in [brackets]")
@@ -1,6 +1,25 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field
+from decimal import Decimal
+from typing import Any, Dict, NamedTuple, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.utils.helpers import parse_datetime
+
+_TIMESTAMP_FIELDS = ('created', 'processed_at')
+
+
+def item_from_storage(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a DynamoDB item to Python types (Decimal numbers, ISO timestamps)."""
+    fields = {}
+    for key, value in item.items():
+        if value.__class__ is Decimal:
+            value = int(value) if value == value.to_integral_value() else float(value)
+        fields[key] = value
+    for key in _TIMESTAMP_FIELDS:
+        value = fields.get(key)
+        if value.__class__ is str:
+            fields[key] = parse_datetime(value)
+    return fields
 
 
 class SMSWebhook(BaseModel):
@@ -12,8 +31,7 @@ class SMSWebhook(BaseModel):
     direction: str = Field(..., description="Message direction (incoming/outgoing)")
     created: str = Field(..., description="UTC timestamp when SMS was created")
     
-    class Config:
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class SMSResponse(BaseModel):
@@ -29,11 +47,58 @@ class SMSResponse(BaseModel):
     reply_sent: bool = Field(default=False, description="Whether a reply was sent")
     reply_message: Optional[str] = Field(default=None, description="Reply message content")
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+    
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "SMSResponse":
+        """Build a response from a row of our own table.
+        
+        Validating the raw item in pydantic-core (which also handles Decimal and
+        ISO timestamps) is faster than model_construct() in pydantic 2.5; use
+        SMSRecord for bulk reads that do not need a model.
+        """
+        return cls.model_validate(item)
+
+
+class SMSRecord(NamedTuple):
+    """Compact, read-only SMS row for bulk reads."""
+    id: str
+    from_number: str
+    to_number: str
+    message: str
+    direction: str
+    created: datetime
+    processed: bool = False
+    processed_at: Optional[datetime] = None
+    reply_sent: bool = False
+    reply_message: Optional[str] = None
+    
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "SMSRecord":
+        """Build a record from a DynamoDB item, converting types once."""
+        fields = item_from_storage(item)
+        return cls(*[fields.get(name, default) for name, default in _RECORD_DEFAULTS])
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+    
+    def to_response(self) -> SMSResponse:
+        return SMSResponse.model_construct(**self._asdict())
 
 
 class SMSReply(BaseModel):
     """Model for SMS reply data."""
     message: str = Field(..., description="Reply message content")
     to_number: Optional[str] = Field(default=None, description="Recipient number (defaults to sender)")
+
+
+class StoredReply(BaseModel):
+    """Model for a reply stored alongside the SMS it answered."""
+    sms_id: str = Field(..., description="SMS the reply answered")
+    id: str = Field(..., description="Reply ID, unique per SMS")
+    to_number: Optional[str] = Field(default=None, description="Recipient number")
+    message: str = Field(..., description="Reply message content")
+    created: datetime = Field(..., description="When the reply was recorded")
+
+
+_RECORD_DEFAULTS = tuple((name, SMSRecord._field_defaults.get(name)) for name in SMSRecord._fields)
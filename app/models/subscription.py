@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field, HttpUrl
+
+
+class SubscriptionCreate(BaseModel):
+    """Model for registering an outbound webhook subscriber."""
+    url: HttpUrl = Field(..., description="Endpoint events are POSTed to")
+    event_types: List[str] = Field(
+        default=["*"], min_length=1, description="Event types to deliver (e.g. sms.received), or * for all"
+    )
+    secret: Optional[str] = Field(
+        default=None, min_length=16, description="HMAC signing secret (generated when omitted)"
+    )
+    batch: bool = Field(default=False, description="Deliver JSON arrays of events instead of one per request")
+    max_batch_size: int = Field(default=100, ge=1, le=1000, description="Events per batch request")
+    max_concurrency: int = Field(default=4, ge=1, le=100, description="Concurrent requests to this subscriber")
+
+
+class Subscription(BaseModel):
+    """Model for an outbound webhook subscriber."""
+    id: str = Field(..., description="Unique subscription ID")
+    url: str = Field(..., description="Endpoint events are POSTed to")
+    event_types: List[str] = Field(default=["*"], description="Event types to deliver, or * for all")
+    secret: str = Field(..., description="HMAC signing secret")
+    batch: bool = Field(default=False, description="Deliver JSON arrays of events")
+    max_batch_size: int = Field(default=100, description="Events per batch request")
+    max_concurrency: int = Field(default=4, description="Concurrent requests to this subscriber")
+    enabled: bool = Field(default=True, description="Whether events are delivered")
+    created_at: Optional[datetime] = Field(default=None, description="Creation timestamp")
+
+    def accepts(self, event_type: str) -> bool:
+        """Return True if this subscriber wants events of the given type."""
+        return self.enabled and ("*" in self.event_types or event_type in self.event_types)
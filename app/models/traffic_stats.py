@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Dict, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class TrafficBucket(BaseModel):
+    """Model for one hourly or daily traffic rollup."""
+    scope: str = Field(..., description="'all', 'to:<number>' or 'from:<number>'")
+    granularity: Literal["hour", "day"] = Field(..., description="Bucket size")
+    start: datetime = Field(..., description="UTC start of the bucket")
+    received: int = Field(default=0, description="Incoming SMS stored")
+    processed: int = Field(default=0, description="Incoming SMS processed")
+    replied: int = Field(default=0, description="Automatic replies sent immediately")
+    reply_coalesced: int = Field(default=0, description="Automatic replies deferred and coalesced")
+    reply_suppressed: int = Field(default=0, description="Automatic replies suppressed")
+    reply_rate: Optional[float] = Field(default=None, description="Replies (sent or coalesced) per processed SMS")
+    avg_processing_lag: Optional[float] = Field(default=None, description="Mean seconds from creation to processing")
+    processing_lag: Dict[str, int] = Field(default_factory=dict, description="Processed SMS by lag bucket ('le_<seconds>' or 'gt_<seconds>')")
@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class WebhookCreate(BaseModel):
+    """Model for an incoming generic webhook event."""
+    event_type: str = Field(..., min_length=1, description="Type of the event")
+    payload: Dict[str, Any] = Field(..., description="Event payload")
+    source: str = Field(..., min_length=1, description="System that sent the event")
+    headers: Optional[Dict[str, str]] = Field(default=None, description="Original request headers")
+
+
+class WebhookUpdate(BaseModel):
+    """Model for updating a webhook; only fields that are set are changed."""
+    event_type: Optional[str] = None
+    payload: Optional[Dict[str, Any]] = None
+    source: Optional[str] = None
+    headers: Optional[Dict[str, str]] = None
+    processed: Optional[bool] = None
+    processed_at: Optional[datetime] = None
+
+
+class WebhookResponse(BaseModel):
+    """Model for webhook response data."""
+    id: str = Field(..., description="Unique webhook ID")
+    event_type: str = Field(..., description="Type of the event")
+    payload: Dict[str, Any] = Field(..., description="Event payload")
+    source: str = Field(..., description="System that sent the event")
+    headers: Optional[Dict[str, str]] = Field(default=None, description="Original request headers")
+    created_at: datetime = Field(..., description="Creation timestamp")
+    updated_at: datetime = Field(..., description="Last update timestamp")
+    processed: bool = Field(default=False, description="Processing status")
+    processed_at: Optional[datetime] = Field(default=None, description="Processing timestamp")
+
+
+class WebhookBatchItemResult(BaseModel):
+    """Outcome for one event of a batch, by its position in the request body."""
+    index: int
+    status: Literal["created", "invalid", "failed"]
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class WebhookBatchResponse(BaseModel):
+    """Model for the result of a batch ingest."""
+    created: int = 0
+    invalid: int = 0
+    failed: int = 0
+    error: Optional[str] = Field(default=None, description="Why reading the body stopped early, if it did")
+    results: List[WebhookBatchItemResult] = Field(default_factory=list)
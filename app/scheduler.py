@@ -0,0 +1,189 @@
+"""Dispatcher for scheduled SMS.
+
+    python -m app.scheduler
+
+Sends scheduled through /sms/schedule (or coalesced auto-replies) wait in
+Redis until they are due. The dispatcher keeps only the sends due within
+SCHEDULER_HORIZON seconds in a hierarchical timer wheel, so its memory is
+bounded by SCHEDULER_MAX_LOADED however many sends are pending. When a
+wheel slot expires its sends are claimed atomically in batches and each
+batch is handed to send_scheduled_sms_task. Cancelled sends are skipped at
+claim time. Several dispatchers can run side by side; each send is claimed
+by one of them, and sends whose dispatch was never acknowledged are
+dispatched again after SCHEDULER_LEASE seconds.
+"""
+import argparse
+import logging
+import signal
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.sms_scheduler import SMSScheduler, get_sms_scheduler, now_ms
+from app.utils.metrics import Gauge, Histogram, start_metrics_server
+from app.utils.timer_wheel import TimerWheel
+
+logger = logging.getLogger("skippy.scheduler")
+
+SCHEDULER_LOADED = Gauge(
+    "skippy_scheduler_loaded_sends",
+    "Scheduled SMS held in the dispatcher's timer wheel"
+)
+SCHEDULER_DISPATCH_LAG = Histogram(
+    "skippy_scheduler_dispatch_lag_seconds",
+    "Time between a scheduled SMS falling due and its dispatch"
+)
+
+
+def _queue_sends(items: List[Dict[str, Any]]):
+    from app.workers.sms_tasks import send_scheduled_sms_task
+
+    send_scheduled_sms_task.delay(items)
+
+
+class Dispatcher:
+    """Moves due scheduled SMS from Redis to the send task."""
+
+    def __init__(
+        self,
+        scheduler: SMSScheduler,
+        send_batch: Callable[[List[Dict[str, Any]]], None] = _queue_sends,
+        tick_ms: int = 100,
+        horizon: float = 300.0,
+        refill_interval: float = 1.0,
+        max_loaded: int = 100_000,
+        batch_size: int = 100,
+        lease: float = 60.0,
+    ):
+        self.scheduler = scheduler
+        self.send_batch = send_batch
+        self.tick_ms = tick_ms
+        self.horizon_ms = int(horizon * 1000)
+        self.refill_interval_ms = int(refill_interval * 1000)
+        self.max_loaded = max_loaded
+        self.batch_size = batch_size
+        self.lease_ms = int(lease * 1000)
+        self.stopping = False
+        # Enough 64-slot levels to cover the horizon
+        levels = 1
+        while 64 ** levels * tick_ms <= self.horizon_ms:
+            levels += 1
+        self.wheel = TimerWheel(now_ms(), tick_ms=tick_ms, slots=64, levels=levels)
+        self.loaded_until: Optional[int] = None
+        self._next_refill = 0
+        SCHEDULER_LOADED.set_function(lambda: len(self.wheel))
+
+    def _add(self, loaded: List[Tuple[str, int]]) -> Optional[int]:
+        """Add sends to the wheel; returns the earliest due time of those it rejected."""
+        rejected = None
+        for schedule_id, due in loaded:
+            if not self.wheel.add(schedule_id, due) and schedule_id not in self.wheel:
+                rejected = due if rejected is None else min(rejected, due)
+        return rejected
+
+    def refill(self, now: int):
+        """Load sends that came due or into the horizon since the last refill.
+
+        Sends the wheel rejects (beyond its horizon while it lags behind
+        `now`) are loaded again at the next refill: the loaded window is
+        moved back to just before the earliest of them.
+        """
+        self.scheduler.recover(now, self.batch_size * 10)
+
+        late_rejected = None
+        room = self.max_loaded - len(self.wheel)
+        if room > 0:
+            late_rejected = self._add(self.scheduler.drain_late(room))
+
+        room = self.max_loaded - len(self.wheel)
+        if room > 0:
+            until = now + min(self.horizon_ms, self.wheel.horizon_ms)
+            loaded = self.scheduler.load(self.loaded_until, until, room, ttl_ms=self.horizon_ms * 2)
+            rejected = self._add(loaded)
+            if rejected is not None:
+                self.loaded_until = rejected - 1
+            elif len(loaded) < room:
+                self.loaded_until = until
+            else:
+                # Full: continue after the last send loaded (ties with it are loaded again and skipped)
+                last_due = loaded[-1][1]
+                self.loaded_until = max(last_due - 1, self.loaded_until or last_due - 1)
+
+        if late_rejected is not None and self.loaded_until is not None:
+            self.loaded_until = min(self.loaded_until, late_rejected - 1)
+
+    def run_once(self, now: Optional[int] = None) -> int:
+        """Refill if due, expire the wheel and dispatch what fell due; returns the number sent."""
+        now = now_ms() if now is None else now
+        if now >= self._next_refill:
+            self.refill(now)
+            self._next_refill = now + self.refill_interval_ms
+
+        due = self.wheel.advance(now)
+        claimed = []
+        for start in range(0, len(due), self.batch_size):
+            claimed.extend(self.scheduler.claim(due[start:start + self.batch_size], now, self.lease_ms))
+
+        dispatched = 0
+        for start in range(0, len(claimed), self.batch_size):
+            items = claimed[start:start + self.batch_size]
+            try:
+                self.send_batch(items)
+            except Exception as e:
+                # Left in flight; dispatched again once the lease expires
+                logger.error(f"Queueing {len(items)} scheduled SMS failed: {e}")
+                continue
+            self.scheduler.ack([item["id"] for item in items])
+            for item in items:
+                SCHEDULER_DISPATCH_LAG.observe(max(now - item["due"], 0) / 1000)
+            dispatched += len(items)
+        return dispatched
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        while not self.stopping:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Dispatch failed: {e}")
+                time.sleep(1.0)
+            # Sleep until the next tick
+            time.sleep((self.tick_ms - now_ms() % self.tick_ms) / 1000)
+        logger.info("Scheduler stopped")
+
+
+def main(argv=None):
+    """Parse arguments and run the dispatcher."""
+    parser = argparse.ArgumentParser(description="Dispatch scheduled SMS when they fall due")
+    parser.add_argument("--tick-ms", type=int, default=settings.scheduler_tick_ms)
+    parser.add_argument("--horizon", type=float, default=settings.scheduler_horizon)
+    parser.add_argument("--max-loaded", type=int, default=settings.scheduler_max_loaded)
+    parser.add_argument("--batch-size", type=int, default=settings.scheduler_batch_size)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    scheduler = get_sms_scheduler()
+    if scheduler is None:
+        parser.error("scheduling is disabled; set SCHEDULER_ENABLED=true")
+    if settings.metrics_enabled and settings.scheduler_metrics_port:
+        start_metrics_server(settings.scheduler_metrics_port)
+
+    logger.info(f"Dispatching scheduled SMS ({scheduler.pending()} pending)")
+    Dispatcher(
+        scheduler,
+        tick_ms=args.tick_ms,
+        horizon=args.horizon,
+        refill_interval=settings.scheduler_refill_interval,
+        max_loaded=args.max_loaded,
+        batch_size=args.batch_size,
+        lease=settings.scheduler_lease
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
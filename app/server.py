@@ -0,0 +1,196 @@
+"""Production server entry point.
+
+Runs the API in several worker processes behind one listening socket:
+
+    python -m app.server
+
+A pre-fork master binds the socket, forks the workers (each running
+uvicorn on the shared socket), restarts workers that die, recycles workers
+whose memory grows past a threshold, and on SIGTERM lets every worker
+drain its in-flight requests and run its shutdown handlers before exiting.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional, Set
+
+from app.config import settings
+from app.utils.memory import rss_bytes
+
+logger = logging.getLogger("skippy.server")
+
+
+def create_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Bind the listening socket shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, graceful_timeout: int):
+    """Serve the app on the shared socket until told to exit (runs in a worker process)."""
+    import uvicorn
+
+    config = uvicorn.Config(
+        "app.main:app",
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        lifespan="on",
+        timeout_graceful_shutdown=graceful_timeout,
+        access_log=settings.debug,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Master:
+    """Pre-fork master process supervising the API workers."""
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        workers: int,
+        graceful_timeout: int = 30,
+        max_memory_mb: Optional[int] = None,
+        check_interval: float = 5.0,
+    ):
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.max_memory = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self.check_interval = check_interval
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started_at: Dict[int, float] = {}
+        self.retiring: Set[int] = set()
+        self.stopping = False
+
+    def spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # Worker: uvicorn installs its own SIGTERM/SIGINT handlers
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(self.sock, self.graceful_timeout)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        self.started_at[pid] = time.monotonic()
+        logger.info(f"Started worker {index} (pid {pid})")
+        return pid
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.children.pop(pid, None)
+            started_at = self.started_at.pop(pid, 0.0)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                logger.info(f"Recycled worker {index} (pid {pid}) exited")
+            elif index is not None and not self.stopping:
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+                if time.monotonic() - started_at < 1.0:
+                    # Avoid a tight crash loop when workers fail on startup
+                    time.sleep(1.0)
+                self.spawn(index)
+
+    def _check_memory(self):
+        if self.max_memory is None:
+            return
+        for pid, index in list(self.children.items()):
+            if pid in self.retiring:
+                continue
+            rss = rss_bytes(pid)
+            if rss is not None and rss > self.max_memory:
+                logger.warning(
+                    f"Worker {index} (pid {pid}) uses {rss // (1024 * 1024)} MB, recycling"
+                )
+                # Start the replacement first so capacity never drops
+                self.spawn(index)
+                self.retiring.add(pid)
+                os.kill(pid, signal.SIGTERM)
+
+    def _shutdown(self):
+        self.stopping = True
+        logger.info("Stopping workers, draining in-flight requests")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        # Workers get the graceful timeout plus time for their shutdown handlers
+        deadline = time.monotonic() + self.graceful_timeout + 10
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            logger.warning(f"Worker pid {pid} did not stop in time, killing")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        next_check = time.monotonic() + self.check_interval
+        while not self.stopping:
+            self._reap()
+            if time.monotonic() >= next_check:
+                self._check_memory()
+                next_check = time.monotonic() + self.check_interval
+            time.sleep(0.2)
+
+        self._shutdown()
+
+
+def main(argv=None):
+    """Parse arguments and run the pre-fork server."""
+    parser = argparse.ArgumentParser(description="Run the Skippy API with multiple worker processes")
+    parser.add_argument("--host", default=settings.web_host)
+    parser.add_argument("--port", type=int, default=settings.web_port)
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency or os.cpu_count() or 1)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.web_graceful_timeout)
+    parser.add_argument("--max-memory-mb", type=int, default=settings.web_max_memory_mb)
+    parser.add_argument("--backlog", type=int, default=settings.web_backlog)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sock = create_socket(args.host, args.port, args.backlog)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+    Master(
+        sock,
+        workers=args.workers,
+        graceful_timeout=args.graceful_timeout,
+        max_memory_mb=args.max_memory_mb
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
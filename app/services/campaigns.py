@@ -0,0 +1,544 @@
+"""Bulk SMS campaigns.
+
+Recipients are stored in chunks of CAMPAIGN_CHUNK_SIZE while the upload
+streams in. Starting a campaign queues one send task per chunk. A task
+claims its chunk under a lease, renders and sends the messages through the
+pooled 46elks client as the shared send budget allows, and checkpoints its
+position together with the campaign's counters every few seconds, so a
+paused, failed or taken-over chunk carries on where it left off. A crash
+can resend at most the messages sent since the last checkpoint.
+"""
+import asyncio
+import logging
+import string
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+from app.config import settings
+from app.models.campaign import Campaign, CampaignCreate, CampaignRecipient, CampaignUploadResponse
+from app.services.dynamodb_service import DynamoDBService, from_dynamodb, to_dynamodb
+from app.services.elks_client import ElksClient, ElksError, get_elks_client
+from app.services.rate_limiter import SendBudget, get_send_budget
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_SENDS = Counter(
+    "skippy_campaign_sends_total",
+    "Campaign messages by outcome (sent, failed)",
+    ["outcome"]
+)
+
+# DynamoDB items are limited to 400 KB; chunks are cut well below that
+MAX_CHUNK_BYTES = 300_000
+MAX_UPLOAD_ERRORS = 20
+
+_upload_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="campaign-upload")
+_serializer = TypeSerializer()
+
+
+class CampaignStateError(Exception):
+    """The campaign is missing (`status` is None) or not in a state that allows the operation."""
+
+    def __init__(self, campaign_id: str, status: Optional[str] = None):
+        super().__init__(f"Campaign {campaign_id} is {status or 'missing'}")
+        self.status = status
+
+
+class LeaseLostError(Exception):
+    """Another worker took over the chunk after this one's lease expired."""
+
+
+def compile_template(template: str) -> Callable[[Dict[str, str]], str]:
+    """Compile a message template into a render function.
+
+    Placeholders are plain names in braces (`{first_name}`); `{{` and `}}`
+    are literal braces and missing values render as empty strings. Raises
+    ValueError for anything else, such as attribute access or format specs.
+    """
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if field is not None and (not field.isidentifier() or spec or conversion):
+            raise ValueError(f"Unsupported placeholder {{{field}}}; use plain names such as {{name}}")
+        parts.append((literal, field))
+
+    def render(values: Dict[str, str]) -> str:
+        return "".join(literal + (values.get(field, "") if field else "") for literal, field in parts)
+
+    return render
+
+
+def _chunk_id(campaign_id: str, index: int) -> str:
+    return f"{campaign_id}#{index}"
+
+
+def _update(table_name: str, key: str, update: str, values: Dict[str, Any],
+            names: Optional[Dict[str, str]] = None, condition: Optional[str] = None,
+            return_old: bool = False) -> Dict[str, Any]:
+    """Build one Update action of a TransactWriteItems call."""
+    action = {
+        'TableName': table_name,
+        'Key': {'id': {'S': key}},
+        'UpdateExpression': update,
+        'ExpressionAttributeValues': {name: _serializer.serialize(value) for name, value in values.items()},
+    }
+    if names:
+        action['ExpressionAttributeNames'] = names
+    if condition:
+        action['ConditionExpression'] = condition
+    if return_old:
+        action['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+    return {'Update': action}
+
+
+def _put(table_name: str, item: Dict[str, Any], condition: Optional[str] = None) -> Dict[str, Any]:
+    """Build one Put action of a TransactWriteItems call."""
+    action = {
+        'TableName': table_name,
+        'Item': {name: _serializer.serialize(value) for name, value in item.items()},
+    }
+    if condition:
+        action['ConditionExpression'] = condition
+    return {'Put': action}
+
+
+class Chunk(NamedTuple):
+    """A claimed chunk of recipients."""
+    campaign_id: str
+    chunk_index: int
+    recipients: List[Dict[str, Any]]
+    position: int
+    lease_token: str
+
+
+class CampaignStore:
+    """Campaigns and their recipient chunks in DynamoDB."""
+
+    def __init__(self, campaigns_table: str, chunks_table: str, db_service: Optional[DynamoDBService] = None):
+        self.campaigns_table_name = campaigns_table
+        self.chunks_table_name = chunks_table
+        self.db_service = db_service or DynamoDBService()
+        self.campaigns = self.db_service.dynamodb.Table(campaigns_table)
+        self.chunks = self.db_service.dynamodb.Table(chunks_table)
+
+    async def initialize(self):
+        """Create the campaign and chunk tables if needed."""
+        await self.db_service.create_table_if_not_exists(self.campaigns_table_name)
+        await self.db_service.create_table_if_not_exists(self.chunks_table_name)
+
+    def create(self, campaign: CampaignCreate) -> Campaign:
+        """Store a new draft campaign."""
+        compile_template(campaign.template)
+        created = Campaign(
+            id=str(uuid.uuid4()),
+            name=campaign.name,
+            template=campaign.template,
+            from_number=campaign.from_number or settings.elks_sms_from_number,
+            status="draft",
+            created_at=datetime.utcnow()
+        )
+        self.campaigns.put_item(Item=created.model_dump(mode="json", exclude_none=True))
+        return created
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        response = self.campaigns.get_item(Key={'id': campaign_id})
+        item = response.get('Item')
+        return Campaign.model_validate(from_dynamodb(item)) if item else None
+
+    def status(self, campaign_id: str) -> Optional[str]:
+        response = self.campaigns.get_item(
+            Key={'id': campaign_id},
+            ProjectionExpression='#s',
+            ExpressionAttributeNames={'#s': 'status'}
+        )
+        return response.get('Item', {}).get('status')
+
+    def _transition(self, campaign_id: str, condition: str, values: Dict[str, Any], update: str) -> Campaign:
+        try:
+            response = self.campaigns.update_item(
+                Key={'id': campaign_id},
+                UpdateExpression=update,
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise CampaignStateError(campaign_id, e.response.get('Item', {}).get('status', {}).get('S'))
+            raise
+        return Campaign.model_validate(from_dynamodb(response['Attributes']))
+
+    def start(self, campaign_id: str) -> Campaign:
+        """Move a draft campaign with recipients to running."""
+        return self._transition(
+            campaign_id,
+            '#s = :draft AND chunks > :zero',
+            {':draft': 'draft', ':zero': 0, ':running': 'running', ':now': datetime.utcnow().isoformat()},
+            'SET #s = :running, started_at = :now'
+        )
+
+    def pause(self, campaign_id: str) -> Campaign:
+        """Stop a running campaign; chunk tasks stop at their next checkpoint."""
+        return self._transition(campaign_id, '#s = :running', {':running': 'running', ':paused': 'paused'},
+                                'SET #s = :paused')
+
+    def resume(self, campaign_id: str) -> Campaign:
+        """Move a paused (or already running) campaign to running."""
+        campaign = self._transition(
+            campaign_id, '#s IN (:paused, :running)', {':paused': 'paused', ':running': 'running'},
+            'SET #s = :running'
+        )
+        # The last chunk may have finished just before the pause
+        return self.complete_if_done(campaign_id) or campaign
+
+    def complete_if_done(self, campaign_id: str) -> Optional[Campaign]:
+        """Mark a running campaign completed once all its chunks are sent."""
+        try:
+            return self._transition(
+                campaign_id, '#s = :running AND chunks_done >= chunks',
+                {':running': 'running', ':completed': 'completed', ':now': datetime.utcnow().isoformat()},
+                'SET #s = :completed, completed_at = :now'
+            )
+        except CampaignStateError:
+            return None
+
+    def add_chunk(self, campaign_id: str, recipients: List[Dict[str, Any]]) -> int:
+        """Store a chunk of recipients for a draft campaign; returns its index."""
+        try:
+            response = self.campaigns.update_item(
+                Key={'id': campaign_id},
+                UpdateExpression='ADD chunks :one',
+                ConditionExpression='#s = :draft',
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues={':one': 1, ':draft': 'draft'},
+                ReturnValues='UPDATED_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise CampaignStateError(campaign_id, e.response.get('Item', {}).get('status', {}).get('S'))
+            raise
+        index = int(response['Attributes']['chunks']) - 1
+        # Until this write succeeds the chunk's index is reserved but empty, and
+        # a claim after /start counts it as sent. The write therefore only
+        # applies while the campaign is a draft and nothing has claimed the index.
+        try:
+            self.db_service.dynamodb.meta.client.transact_write_items(TransactItems=[
+                _put(self.chunks_table_name, to_dynamodb({
+                    'id': _chunk_id(campaign_id, index),
+                    'campaign_id': campaign_id,
+                    'index': index,
+                    'recipients': recipients,
+                    'position': 0,
+                    'status': 'pending',
+                }), condition='attribute_not_exists(id)'),
+                _update(self.campaigns_table_name, campaign_id, 'ADD recipients :count',
+                        {':count': len(recipients), ':draft': 'draft'}, names={'#s': 'status'},
+                        condition='#s = :draft', return_old=True),
+            ])
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'TransactionCanceledException':
+                reasons = e.response.get('CancellationReasons') or [{}, {}]
+                status = reasons[-1].get('Item', {}).get('status', {}).get('S')
+                raise CampaignStateError(campaign_id, status or 'started')
+            raise
+        return index
+
+    def claim_chunk(self, campaign_id: str, index: int, lease: float) -> Optional[Chunk]:
+        """Take the lease on a chunk; None if it is sent or another worker holds it."""
+        token = uuid.uuid4().hex
+        now = int(time.time())
+        try:
+            response = self.chunks.update_item(
+                Key={'id': _chunk_id(campaign_id, index)},
+                UpdateExpression='SET #s = :running, lease_token = :token, lease_until = :until',
+                ConditionExpression='attribute_exists(id) AND #s <> :done AND (#s <> :running OR lease_until < :now)',
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues={
+                    ':running': 'running', ':done': 'done', ':token': token,
+                    ':until': now + int(lease), ':now': now,
+                },
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if not e.response.get('Item'):
+                # The chunk's write failed during the upload; count it as sent
+                logger.warning(f"Campaign {campaign_id} chunk {index} is missing; skipping it")
+                try:
+                    self.save_progress(Chunk(campaign_id, index, [], 0, ""), 0, 0, 0, "done")
+                except LeaseLostError:
+                    pass
+            return None
+        item = from_dynamodb(response['Attributes'])
+        return Chunk(campaign_id, index, item['recipients'], item['position'], token)
+
+    def save_progress(self, chunk: Chunk, position: int, sent: int, failed: int, status: str,
+                      lease: float = 0.0):
+        """Record a chunk's position and add its new sends to the campaign, atomically.
+
+        `status` is "running" (checkpoint, renewing the lease), "pending"
+        (release) or "done". Raises LeaseLostError if the chunk was taken over.
+        """
+        values = {':position': position, ':status': status}
+        update = 'SET #s = :status, #p = :position'
+        if status == 'running':
+            update += ', lease_until = :until'
+            values[':until'] = int(time.time() + lease)
+        else:
+            update += ' REMOVE lease_token, lease_until'
+        if chunk.lease_token:
+            condition = 'lease_token = :token'
+            values[':token'] = chunk.lease_token
+        else:
+            condition = 'attribute_not_exists(id)'
+        counters = 'ADD sent :sent, failed :failed' + (', chunks_done :one' if status == 'done' else '')
+        counter_values = {':sent': sent, ':failed': failed}
+        if status == 'done':
+            counter_values[':one'] = 1
+
+        try:
+            self.db_service.dynamodb.meta.client.transact_write_items(TransactItems=[
+                _update(self.chunks_table_name, _chunk_id(chunk.campaign_id, chunk.chunk_index), update, values,
+                        names={'#s': 'status', '#p': 'position'}, condition=condition),
+                _update(self.campaigns_table_name, chunk.campaign_id, counters, counter_values),
+            ])
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'TransactionCanceledException':
+                raise LeaseLostError(_chunk_id(chunk.campaign_id, chunk.chunk_index))
+            raise
+        if status == 'done':
+            self.complete_if_done(chunk.campaign_id)
+
+
+class RecipientUploader:
+    """Store validated recipients in chunks while an upload is still being read.
+
+    Up to `concurrency` chunks are written at once; `add` waits for a free
+    slot, which pauses reading the request body instead of buffering it.
+    """
+
+    def __init__(self, store: CampaignStore, campaign_id: str, chunk_size: int = 500, concurrency: int = 4):
+        self.store = store
+        self.campaign_id = campaign_id
+        self.chunk_size = chunk_size
+        self.accepted = 0
+        self.invalid = 0
+        self.chunks = 0
+        self.errors: List[str] = []
+        self.write_error: Optional[str] = None
+        self.conflict = False
+        self._chunk: List[Dict[str, Any]] = []
+        self._chunk_bytes = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set = set()
+
+    def reject(self, line: int, error: str):
+        """Record a recipient that failed validation."""
+        self.invalid += 1
+        if len(self.errors) < MAX_UPLOAD_ERRORS:
+            self.errors.append(f"line {line}: {error}")
+
+    async def add(self, recipient: CampaignRecipient):
+        """Queue a recipient, writing a chunk once it is full."""
+        item = recipient.model_dump()
+        self._chunk.append(item)
+        self._chunk_bytes += len(orjson.dumps(item))
+        if len(self._chunk) >= self.chunk_size or self._chunk_bytes >= MAX_CHUNK_BYTES:
+            await self._flush()
+
+    async def _flush(self):
+        chunk, self._chunk, self._chunk_bytes = self._chunk, [], 0
+        await self._semaphore.acquire()
+        task = asyncio.ensure_future(self._write(chunk))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, chunk: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(_upload_executor, self.store.add_chunk, self.campaign_id, chunk)
+        except CampaignStateError as e:
+            self.write_error = str(e)
+            self.conflict = True
+        except Exception as e:
+            self.write_error = f"{type(e).__name__}: {e}"
+        else:
+            self.accepted += len(chunk)
+            self.chunks += 1
+        finally:
+            self._semaphore.release()
+
+    async def close(self) -> CampaignUploadResponse:
+        """Write the last partial chunk and wait for all writes."""
+        if self._chunk:
+            await self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        return CampaignUploadResponse(
+            accepted=self.accepted,
+            invalid=self.invalid,
+            chunks=self.chunks,
+            errors=self.errors,
+            error=self.write_error
+        )
+
+
+class ChunkResult(NamedTuple):
+    status: str  # "done", "paused", "throttled", "skipped" or "lost"
+    sent: int = 0
+    failed: int = 0
+    requeue: bool = False
+
+
+class CampaignSender:
+    """Sends the messages of one chunk at a time under the shared send budget."""
+
+    def __init__(
+        self,
+        store: CampaignStore,
+        client: ElksClient,
+        budget: SendBudget,
+        concurrency: int = 20,
+        checkpoint_interval: float = 2.0,
+        lease: float = 300.0,
+        budget_timeout: float = 60.0,
+    ):
+        self.store = store
+        self.client = client
+        self.budget = budget
+        self.concurrency = concurrency
+        self.checkpoint_interval = checkpoint_interval
+        self.lease = lease
+        # Never wait for budget long enough to lose the lease mid-window
+        self.budget_timeout = min(budget_timeout, lease / 2)
+
+    async def _send_one(self, campaign: Campaign, render: Callable[[Dict[str, str]], str],
+                        recipient: Dict[str, Any]) -> bool:
+        try:
+            await self.client.send(recipient['to'], render(recipient.get('vars') or {}), campaign.from_number)
+        except ElksError as e:
+            logger.warning(f"Campaign {campaign.id} send to {recipient['to']} failed: {e}")
+            CAMPAIGN_SENDS.labels("failed").inc()
+            return False
+        except Exception as e:
+            # Counted as failed so the window completes and its position is saved
+            logger.exception(f"Campaign {campaign.id} send to {recipient['to']} failed unexpectedly: {e}")
+            CAMPAIGN_SENDS.labels("failed").inc()
+            return False
+        CAMPAIGN_SENDS.labels("sent").inc()
+        return True
+
+    async def _send_window(self, campaign: Campaign, render: Callable[[Dict[str, str]], str],
+                           recipients: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Send to `recipients` concurrently as budget tokens are granted.
+        
+        Returns the number of sends started and the number sent; fewer are
+        started if no budget was granted within `budget_timeout`.
+        """
+        sends = []
+        position = 0
+        while position < len(recipients):
+            granted = await self.budget.acquire(len(recipients) - position, timeout=self.budget_timeout)
+            if not granted:
+                break
+            for recipient in recipients[position:position + granted]:
+                sends.append(asyncio.ensure_future(self._send_one(campaign, render, recipient)))
+            position += granted
+        return position, sum(await asyncio.gather(*sends))
+
+    async def send_chunk(self, campaign_id: str, index: int) -> ChunkResult:
+        """Send the unsent part of a chunk if the campaign is running and the chunk is free."""
+        campaign = self.store.get(campaign_id)
+        if campaign is None or campaign.status != "running":
+            return ChunkResult("skipped")
+        chunk = self.store.claim_chunk(campaign_id, index, self.lease)
+        if chunk is None:
+            return ChunkResult("skipped")
+
+        render = compile_template(campaign.template)
+        position = chunk.position
+        total_sent = total_failed = sent = failed = 0
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+        try:
+            while position < len(chunk.recipients):
+                window = chunk.recipients[position:position + self.concurrency]
+                started, window_sent = await self._send_window(campaign, render, window)
+                position += started
+                sent += window_sent
+                failed += started - window_sent
+                if started < len(window):
+                    # No send budget (Redis down?): hand the chunk back before its lease runs out
+                    logger.warning(f"Campaign {campaign_id} chunk {index} got no send budget; releasing it")
+                    self.store.save_progress(chunk, position, sent, failed, "pending")
+                    return ChunkResult("throttled", total_sent + sent, total_failed + failed, requeue=True)
+
+                if time.monotonic() >= next_checkpoint and position < len(chunk.recipients):
+                    if self.store.status(campaign_id) != "running":
+                        self.store.save_progress(chunk, position, sent, failed, "pending")
+                        total_sent, total_failed = total_sent + sent, total_failed + failed
+                        # A resume that raced the pause found the chunk still leased
+                        requeue = self.store.status(campaign_id) == "running"
+                        return ChunkResult("paused", total_sent, total_failed, requeue)
+                    self.store.save_progress(chunk, position, sent, failed, "running", self.lease)
+                    total_sent, total_failed, sent, failed = total_sent + sent, total_failed + failed, 0, 0
+                    next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+            self.store.save_progress(chunk, position, sent, failed, "done")
+        except LeaseLostError:
+            logger.warning(f"Campaign {campaign_id} chunk {index} was taken over by another worker")
+            return ChunkResult("lost", total_sent, total_failed)
+        except Exception:
+            # Hand the chunk back so a retry can claim it straight away
+            try:
+                self.store.save_progress(chunk, position, sent, failed, "pending")
+            except Exception as e:
+                logger.error(f"Failed to release campaign {campaign_id} chunk {index}: {e}")
+            raise
+        return ChunkResult("done", total_sent + sent, total_failed + failed)
+
+
+_store: Optional[CampaignStore] = None
+_sender: Optional[CampaignSender] = None
+_lock = threading.Lock()
+
+
+def get_campaign_store() -> CampaignStore:
+    """Return the process-wide campaign store, configured from settings."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = CampaignStore(settings.campaigns_table_name, settings.campaign_chunks_table_name)
+    return _store
+
+
+def get_campaign_sender() -> CampaignSender:
+    """Return the process-wide campaign sender, configured from settings."""
+    global _sender
+    if _sender is None:
+        store = get_campaign_store()
+        with _lock:
+            if _sender is None:
+                _sender = CampaignSender(
+                    store,
+                    get_elks_client(),
+                    get_send_budget(),
+                    concurrency=settings.campaign_concurrency,
+                    checkpoint_interval=settings.campaign_checkpoint_interval,
+                    lease=settings.campaign_chunk_lease,
+                    budget_timeout=settings.campaign_budget_timeout
+                )
+    return _sender
@@ -0,0 +1,309 @@
+"""46elks delivery reports with coalesced, buffered status writes.
+
+Reports are kept in memory keyed by message ID, so a message that gets
+several reports within one flush interval (sent, then delivered) costs a
+single write. Each write is conditional on the stored state being older,
+so flushes from several API processes never move a message backwards.
+Callbacks are acknowledged only once the flush containing their report has
+written it, so a crashed process never loses a report 46elks considers
+delivered.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.config import settings
+from app.models.delivery_report import STATUS_RANK, DeliveryReport, DeliveryStatus
+from app.services.dynamodb_service import DynamoDBService
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_REPORTS = Counter(
+    "skippy_delivery_reports_total",
+    "46elks delivery reports by outcome (received, coalesced, written, stale, failed)",
+    ["outcome"]
+)
+DELIVERY_REPORTS_PENDING = Gauge(
+    "skippy_delivery_reports_pending",
+    "Coalesced delivery reports waiting to be flushed"
+)
+
+_SMS_ID_INDEX = "sms_id-index"
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Normalize to naive UTC ISO format so stored timestamps compare as strings."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+class DeliveryStatusStore:
+    """Delivery status items in DynamoDB, keyed by 46elks message ID."""
+
+    def __init__(self, table_name: str, db_service: Optional[DynamoDBService] = None):
+        self.table_name = table_name
+        self.db_service = db_service or DynamoDBService()
+        self.table = self.db_service.dynamodb.Table(table_name)
+
+    async def initialize(self):
+        """Create the table (with an index on the replied-to SMS) if it doesn't exist."""
+        try:
+            self.table.load()
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            self.db_service.dynamodb.create_table(
+                TableName=self.table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[
+                    {'AttributeName': 'id', 'AttributeType': 'S'},
+                    {'AttributeName': 'sms_id', 'AttributeType': 'S'},
+                ],
+                GlobalSecondaryIndexes=[{
+                    'IndexName': _SMS_ID_INDEX,
+                    'KeySchema': [{'AttributeName': 'sms_id', 'KeyType': 'HASH'}],
+                    'Projection': {'ProjectionType': 'ALL'},
+                }],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            self.db_service.dynamodb.meta.client.get_waiter('table_exists').wait(
+                TableName=self.table_name
+            )
+
+    def write(self, report: DeliveryReport) -> bool:
+        """Store a report unless a later state is already stored; returns False if it was stale."""
+        names = {'#status': 'status'}
+        values: Dict[str, Any] = {
+            ':status': report.status,
+            ':rank': STATUS_RANK[report.status],
+            ':now': _timestamp(datetime.utcnow()),
+        }
+        assignments = ['#status = :status', 'status_rank = :rank', 'updated_at = :now']
+        if report.delivered is not None:
+            values[':delivered_at'] = _timestamp(report.delivered)
+            assignments.append('delivered_at = :delivered_at')
+            same_rank = 'attribute_not_exists(delivered_at) OR delivered_at <= :delivered_at'
+        else:
+            same_rank = 'attribute_not_exists(delivered_at)'
+        if report.sms_id:
+            values[':sms_id'] = report.sms_id
+            assignments.append('sms_id = if_not_exists(sms_id, :sms_id)')
+
+        try:
+            self.table.update_item(
+                Key={'id': report.id},
+                UpdateExpression='SET ' + ', '.join(assignments),
+                ConditionExpression=(
+                    'attribute_not_exists(id) OR status_rank < :rank '
+                    f'OR (status_rank = :rank AND ({same_rank}))'
+                ),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    async def get(self, message_id: str) -> Optional[DeliveryStatus]:
+        """Get the delivery status of an outbound message."""
+        item = self.table.get_item(Key={'id': message_id}).get('Item')
+        return DeliveryStatus.model_validate(item) if item else None
+
+    async def for_sms(self, sms_id: str) -> List[DeliveryStatus]:
+        """Get the delivery status of every message sent in reply to an SMS."""
+        items: List[Dict[str, Any]] = []
+        kwargs: Dict[str, Any] = {
+            'IndexName': _SMS_ID_INDEX,
+            'KeyConditionExpression': 'sms_id = :sms_id',
+            'ExpressionAttributeValues': {':sms_id': sms_id},
+        }
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+        return [DeliveryStatus.model_validate(item) for item in items]
+
+
+class DeliveryReportBuffer:
+    """Coalesce delivery reports per message and flush them in bulk.
+
+    Only the latest state of each message is kept. The buffer is flushed
+    every `flush_interval` seconds, or early once `max_pending` messages are
+    waiting, with up to `concurrency` writes in flight. Reports whose write
+    fails are merged back and retried on the next flush. Use submit() to
+    wait until a report is stored.
+    """
+
+    def __init__(
+        self,
+        store: DeliveryStatusStore,
+        flush_interval: float = 1.0,
+        max_pending: int = 5000,
+        concurrency: int = 8,
+    ):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, DeliveryReport] = {}
+        # Callers of submit() waiting for the next flush, by message ID
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="delivery-reports")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def add(self, report: DeliveryReport):
+        """Buffer a report, replacing an older pending state of the same message."""
+        DELIVERY_REPORTS.labels("received").inc()
+        self._merge(report, count=True)
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def submit(self, report: DeliveryReport):
+        """Buffer a report and wait until the flush containing it has written it.
+
+        Raises the write error if that flush failed to write it. Without a
+        running flusher the report is written right away.
+        """
+        self.add(report)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(report.id, []).append(waiter)
+        if self._task is None or self._task.done():
+            await self.flush()
+        await waiter
+
+    def _merge(self, report: DeliveryReport, count: bool = False):
+        pending = self._pending.get(report.id)
+        if pending is None:
+            self._pending[report.id] = report
+            return
+        if count:
+            DELIVERY_REPORTS.labels("coalesced").inc()
+        newer, older = (report, pending) if report.supersedes(pending) else (pending, report)
+        if newer.sms_id is None and older.sms_id is not None:
+            newer = newer.model_copy(update={"sms_id": older.sms_id})
+        self._pending[report.id] = newer
+
+    def pending(self, message_id: str) -> Optional[DeliveryReport]:
+        """Return a report that has not been written yet."""
+        return self._pending.get(message_id)
+
+    async def status(self, message_id: str) -> Optional[DeliveryStatus]:
+        """Return the latest status of a message, including a report not written yet."""
+        stored = await self.store.get(message_id)
+        pending = self._pending.get(message_id)
+        if pending is None:
+            return stored
+        if stored is not None and not pending.supersedes(
+            DeliveryReport(id=stored.id, status=stored.status, delivered=stored.delivered_at)
+        ):
+            return stored
+        return DeliveryStatus(
+            id=pending.id,
+            status=pending.status,
+            delivered_at=pending.delivered,
+            sms_id=pending.sms_id or (stored.sms_id if stored else None),
+            updated_at=stored.updated_at if stored else None
+        )
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        """Write every pending report; returns the number written."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, {}
+            if not batch:
+                return 0
+            loop = asyncio.get_running_loop()
+            reports = list(batch.values())
+            outcomes = await asyncio.gather(
+                *(loop.run_in_executor(self._executor, self.store.write, report) for report in reports),
+                return_exceptions=True
+            )
+            written = 0
+            for report, outcome in zip(reports, outcomes):
+                for waiter in waiters.get(report.id, ()):
+                    if waiter.done():
+                        continue
+                    if isinstance(outcome, Exception):
+                        waiter.set_exception(outcome)
+                    else:
+                        waiter.set_result(None)
+                if isinstance(outcome, Exception):
+                    DELIVERY_REPORTS.labels("failed").inc()
+                    logger.warning(f"Writing delivery report for {report.id} failed: {outcome}")
+                    # Retry on the next flush unless a newer report arrived meanwhile
+                    self._merge(report)
+                elif outcome:
+                    written += 1
+                    DELIVERY_REPORTS.labels("written").inc()
+                else:
+                    DELIVERY_REPORTS.labels("stale").inc()
+            return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Delivery report flush failed: {e}")
+
+    def start(self):
+        """Start flushing in the background on the running event loop."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+_buffer: Optional[DeliveryReportBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_delivery_report_buffer() -> DeliveryReportBuffer:
+    """Return the process-wide delivery report buffer, configured from settings."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = DeliveryReportBuffer(
+                    DeliveryStatusStore(settings.delivery_reports_table_name),
+                    flush_interval=settings.delivery_reports_flush_interval,
+                    max_pending=settings.delivery_reports_max_pending,
+                    concurrency=settings.delivery_reports_concurrency
+                )
+                DELIVERY_REPORTS_PENDING.set_function(_buffer.pending_count)
+    return _buffer
@@ -1,10 +1,142 @@
 import boto3
+import time
 import uuid
 from datetime import datetime
+from decimal import Decimal
 from typing import Dict, List, Optional, Any
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
 
 from app.config import settings
+from app.utils.metrics import Counter, Histogram
+from app.utils.tracing import start_span, KIND_CLIENT
+
+DYNAMODB_OPERATION_DURATION = Histogram(
+    "skippy_dynamodb_operation_duration_seconds",
+    "DynamoDB call latency by table and operation",
+    ["table", "operation"]
+)
+DYNAMODB_CONSUMED_CAPACITY = Counter(
+    "skippy_dynamodb_consumed_capacity_units_total",
+    "DynamoDB capacity units consumed by table and operation",
+    ["table", "operation"]
+)
+DYNAMODB_ERRORS = Counter(
+    "skippy_dynamodb_errors_total",
+    "Failed DynamoDB calls by table and operation",
+    ["table", "operation"]
+)
+
+# Operations that accept ReturnConsumedCapacity
+_CAPACITY_OPERATIONS = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems',
+    'ExecuteStatement', 'BatchExecuteStatement', 'ExecuteTransaction',
+}
+
+# Error codes meaning DynamoDB is unreachable or shedding load rather than
+# rejecting the request itself
+_UNAVAILABLE_ERROR_CODES = {
+    'InternalServerError', 'ServiceUnavailable', 'ThrottlingException',
+    'ProvisionedThroughputExceededException', 'RequestLimitExceeded',
+}
+
+
+def is_unavailable_error(exc: Exception) -> bool:
+    """Return True if a DynamoDB call failed because the service is unavailable."""
+    if isinstance(exc, ClientError):
+        return exc.response.get('Error', {}).get('Code') in _UNAVAILABLE_ERROR_CODES
+    return isinstance(exc, (BotoConnectionError, HTTPClientError))
+
+# BatchWriteItem accepts at most 25 put requests
+BATCH_WRITE_MAX_ITEMS = 25
+
+
+def to_dynamodb(value: Any) -> Any:
+    """Convert floats (which DynamoDB rejects) to Decimal, recursively."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: to_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_dynamodb(item) for item in value]
+    return value
+
+
+def from_dynamodb(value: Any) -> Any:
+    """Convert Decimal numbers read from DynamoDB to int or float, recursively."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {key: from_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_dynamodb(item) for item in value]
+    return value
+
+
+def _on_provide_params(params, model, context, **kwargs):
+    if model.name in _CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+    table = params.get('TableName', 'multi')
+    context['skippy_table'] = table
+    context['skippy_operation'] = model.name
+    context['skippy_span'] = start_span(
+        f"DynamoDB.{model.name}",
+        kind=KIND_CLIENT,
+        attributes={
+            'db.system': 'dynamodb',
+            'db.operation': model.name,
+            'aws.dynamodb.table_names': [table],
+        }
+    )
+    context['skippy_start'] = time.perf_counter()
+
+
+def _on_after_call(http_response, parsed, model, context, **kwargs):
+    start = context.get('skippy_start')
+    if start is None:
+        return
+    table = context['skippy_table']
+    span = context['skippy_span']
+    DYNAMODB_OPERATION_DURATION.labels(table, model.name).observe(time.perf_counter() - start)
+    if http_response.status_code >= 300:
+        DYNAMODB_ERRORS.labels(table, model.name).inc()
+        span.set_attribute('error.type', parsed.get('Error', {}).get('Code', 'unknown'))
+    span.set_attribute('http.status_code', http_response.status_code)
+
+    consumed = parsed.get('ConsumedCapacity')
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    total = 0.0
+    for entry in consumed or ():
+        units = float(entry.get('CapacityUnits', 0))
+        total += units
+        DYNAMODB_CONSUMED_CAPACITY.labels(
+            entry.get('TableName', table), model.name
+        ).inc(units)
+    if consumed:
+        span.set_attribute('aws.dynamodb.consumed_capacity', total)
+    span.end()
+
+
+def _on_after_call_error(exception, context, **kwargs):
+    if 'skippy_start' in context:
+        DYNAMODB_ERRORS.labels(context['skippy_table'], context['skippy_operation']).inc()
+        span = context['skippy_span']
+        span.record_exception(exception)
+        span.end()
+
+
+def instrument_dynamodb_client(client):
+    """Record latency, consumed capacity, errors and trace spans for every call made by a DynamoDB client."""
+    if getattr(client, '_skippy_instrumented', False):
+        return
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb.*', _on_provide_params)
+    events.register('after-call.dynamodb.*', _on_after_call)
+    events.register('after-call-error.dynamodb.*', _on_after_call_error)
+    client._skippy_instrumented = True
 
 
 class DynamoDBService:
@@ -16,19 +148,27 @@ class DynamoDBService:
             region_name=settings.aws_region,
             aws_access_key_id=settings.aws_access_key_id,
             aws_secret_access_key=settings.aws_secret_access_key,
-            endpoint_url=settings.dynamodb_endpoint_url
+            endpoint_url=settings.dynamodb_endpoint_url,
+            config=Config(
+                connect_timeout=settings.dynamodb_connect_timeout,
+                read_timeout=settings.dynamodb_read_timeout,
+                retries={'max_attempts': settings.dynamodb_max_attempts, 'mode': 'standard'}
+            )
         )
         self.table = self.dynamodb.Table(settings.dynamodb_table_name)
+        if settings.metrics_enabled or settings.tracing_enabled:
+            instrument_dynamodb_client(self.dynamodb.meta.client)
     
-    async def create_table_if_not_exists(self):
-        """Create the DynamoDB table if it doesn't exist."""
+    async def create_table_if_not_exists(self, table_name: Optional[str] = None):
+        """Create a table keyed by `id` (the webhook table by default) if it doesn't exist."""
+        table_name = table_name or settings.dynamodb_table_name
         try:
-            self.table.load()
+            self.dynamodb.Table(table_name).load()
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 # Table doesn't exist, create it
                 self.dynamodb.create_table(
-                    TableName=settings.dynamodb_table_name,
+                    TableName=table_name,
                     KeySchema=[
                         {
                             'AttributeName': 'id',
@@ -44,17 +184,15 @@ class DynamoDBService:
                     BillingMode='PAY_PER_REQUEST'
                 )
                 # Wait for table to be created
-                self.table.meta.client.get_waiter('table_exists').wait(
-                    TableName=settings.dynamodb_table_name
+                self.dynamodb.meta.client.get_waiter('table_exists').wait(
+                    TableName=table_name
                 )
     
-    async def create_webhook(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new webhook record."""
-        webhook_id = str(uuid.uuid4())
+    def build_webhook_item(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a new webhook record with a fresh ID and timestamps."""
         now = datetime.utcnow().isoformat()
-        
-        item = {
-            'id': webhook_id,
+        return {
+            'id': str(uuid.uuid4()),
             'event_type': webhook_data['event_type'],
             'payload': webhook_data['payload'],
             'source': webhook_data['source'],
@@ -63,15 +201,63 @@ class DynamoDBService:
             'created_at': now,
             'updated_at': now
         }
-        
-        self.table.put_item(Item=item)
+    
+    async def create_webhook(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new webhook record."""
+        item = self.build_webhook_item(webhook_data)
+        self.table.put_item(Item=to_dynamodb(item))
         return item
     
+    def write_webhook_items(self, items: List[Dict[str, Any]], max_attempts: int = 5) -> List[Optional[str]]:
+        """Write up to 25 webhook records with one BatchWriteItem call.
+        
+        Unprocessed items are retried with exponential back-off. Returns one
+        entry per item: None if it was written, otherwise the error. Safe to
+        call from several threads at once.
+        """
+        client = self.dynamodb.meta.client
+        table_name = settings.dynamodb_table_name
+        pending = {item['id']: to_dynamodb(item) for item in items}
+        errors: Dict[str, Optional[str]] = {item['id']: None for item in items}
+        
+        for attempt in range(max_attempts):
+            if attempt:
+                time.sleep(min(0.05 * (2 ** attempt), 2.0))
+            try:
+                response = client.batch_write_item(RequestItems={
+                    table_name: [{'PutRequest': {'Item': item}} for item in pending.values()]
+                })
+            except ClientError as e:
+                error = e.response['Error']
+                message = f"{error.get('Code')}: {error.get('Message')}"
+                for item_id in pending:
+                    errors[item_id] = message
+                # Throttled requests are worth retrying; rejected ones are not
+                if error.get('Code') not in _UNAVAILABLE_ERROR_CODES:
+                    break
+                continue
+            unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+            pending = {
+                request['PutRequest']['Item']['id']: request['PutRequest']['Item']
+                for request in unprocessed
+            }
+            for item_id in errors:
+                if item_id not in pending:
+                    errors[item_id] = None
+            if not pending:
+                break
+        else:
+            for item_id in pending:
+                errors[item_id] = errors[item_id] or "Unprocessed after retries"
+        
+        return [errors[item['id']] for item in items]
+    
     async def get_webhook(self, webhook_id: str) -> Optional[Dict[str, Any]]:
         """Get a webhook by ID."""
         try:
             response = self.table.get_item(Key={'id': webhook_id})
-            return response.get('Item')
+            item = response.get('Item')
+            return from_dynamodb(item) if item else None
         except ClientError:
             return None
     
@@ -79,7 +265,7 @@ class DynamoDBService:
         """List all webhooks."""
         try:
             response = self.table.scan(Limit=limit)
-            return response.get('Items', [])
+            return [from_dynamodb(item) for item in response.get('Items', [])]
         except ClientError:
             return []
     
@@ -95,7 +281,7 @@ class DynamoDBService:
                 attr_value = f":{key}"
                 update_expression += f"{attr_name} = {attr_value}, "
                 expression_attribute_names[attr_name] = key
-                expression_attribute_values[attr_value] = value
+                expression_attribute_values[attr_value] = to_dynamodb(value)
         
         # Always update the updated_at timestamp
         update_expression += "#updated_at = :updated_at"
@@ -106,18 +292,19 @@ class DynamoDBService:
             response = self.table.update_item(
                 Key={'id': webhook_id},
                 UpdateExpression=update_expression,
+                ConditionExpression="attribute_exists(id)",
                 ExpressionAttributeNames=expression_attribute_names,
                 ExpressionAttributeValues=expression_attribute_values,
                 ReturnValues="ALL_NEW"
             )
-            return response.get('Attributes')
+            return from_dynamodb(response.get('Attributes'))
         except ClientError:
             return None
     
     async def delete_webhook(self, webhook_id: str) -> bool:
         """Delete a webhook."""
         try:
-            self.table.delete_item(Key={'id': webhook_id})
-            return True
+            response = self.table.delete_item(Key={'id': webhook_id}, ReturnValues="ALL_OLD")
+            return 'Attributes' in response
         except ClientError:
             return False
@@ -0,0 +1,171 @@
+"""Pooled client for the 46elks SMS API."""
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+import httpx
+
+from app.config import settings
+from app.utils.helpers import LoopLocal
+from app.utils.metrics import Counter, Histogram
+from app.utils.tracing import start_span, KIND_CLIENT
+
+logger = logging.getLogger(__name__)
+
+ELKS_REQUESTS = Counter(
+    "skippy_elks_requests_total",
+    "46elks send requests by outcome",
+    ["outcome"]
+)
+ELKS_REQUEST_DURATION = Histogram(
+    "skippy_elks_request_duration_seconds",
+    "46elks send request latency"
+)
+
+
+# Errors raised before the request reached 46elks, so resending cannot duplicate a message
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class ElksError(Exception):
+    """A send failed; `retryable` is True only when 46elks cannot have accepted the message."""
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class ElksClient:
+    """Send SMS through 46elks over one keep-alive connection pool per event loop.
+
+    Connection errors and 429 responses, where the message was never
+    accepted, are retried `retries` times with exponential back-off. Errors
+    after the request was sent (read timeouts, dropped connections, 5xx) are
+    not retried: 46elks may already have accepted the message, and sending
+    it again could deliver it twice. Without API credentials sends are only
+    logged.
+
+    With a `delivery_report_url` (the public URL of /elks/delivery) every
+    message asks 46elks for delivery reports, tagged with the SMS it replies
+    to, if any.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        username: Optional[str],
+        password: Optional[str],
+        from_number: Optional[str] = None,
+        timeout: float = 10.0,
+        max_connections: int = 100,
+        retries: int = 2,
+        backoff: float = 0.5,
+        delivery_report_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.auth = (username, password) if username and password else None
+        self.from_number = from_number
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.delivery_report_url = delivery_report_url
+        self.transport = transport
+        # The HTTP pool belongs to the event loop that created it
+        self._clients = LoopLocal(self._new_client)
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            auth=self.auth,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            transport=self.transport
+        )
+
+    def _when_delivered(self, sms_id: Optional[str]) -> Optional[str]:
+        if not self.delivery_report_url or not sms_id:
+            return self.delivery_report_url
+        separator = "&" if "?" in self.delivery_report_url else "?"
+        return f"{self.delivery_report_url}{separator}{urlencode({'sms_id': sms_id})}"
+
+    async def send(
+        self,
+        to_number: str,
+        message: str,
+        from_number: Optional[str] = None,
+        sms_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Send one SMS, in reply to `sms_id` if given; returns the 46elks message ID (None when only logging)."""
+        if self.auth is None:
+            logger.info(f"SMS sent (46elks not configured, logged only) - To: {to_number}, Message: {message}")
+            ELKS_REQUESTS.labels("logged").inc()
+            return None
+
+        client = self._clients.get()
+        data = {"from": from_number or self.from_number, "to": to_number, "message": message}
+        when_delivered = self._when_delivered(sms_id)
+        if when_delivered:
+            data["whendelivered"] = when_delivered
+        attributes = {"sms.id": sms_id} if sms_id else None
+        detail = ""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+            start = time.perf_counter()
+            try:
+                with start_span("elks.send_sms", kind=KIND_CLIENT, attributes=attributes) as span:
+                    response = await client.post(f"{self.api_url}/sms", data=data)
+                    span.set_attribute("http.status_code", response.status_code)
+            except _NOT_SENT_ERRORS as e:
+                ELKS_REQUESTS.labels("error").inc()
+                detail = f"{type(e).__name__}: {e}"
+                continue
+            except httpx.HTTPError as e:
+                ELKS_REQUESTS.labels("error").inc()
+                raise ElksError(f"{type(e).__name__}: {e}", retryable=False) from e
+            finally:
+                ELKS_REQUEST_DURATION.observe(time.perf_counter() - start)
+
+            if response.status_code < 300:
+                ELKS_REQUESTS.labels("sent").inc()
+                try:
+                    return response.json().get("id")
+                except (ValueError, AttributeError) as e:
+                    # Accepted, but without a usable message ID; never resend it
+                    raise ElksError(f"Unexpected response {response.text[:200]!r}: {e}", retryable=False) from e
+            detail = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code != 429:
+                ELKS_REQUESTS.labels("rejected" if response.status_code < 500 else "error").inc()
+                raise ElksError(detail, retryable=False)
+            ELKS_REQUESTS.labels("error").inc()
+
+        raise ElksError(detail, retryable=True)
+
+
+_client: Optional[ElksClient] = None
+_client_lock = threading.Lock()
+
+
+def get_elks_client() -> ElksClient:
+    """Return the process-wide 46elks client, configured from settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ElksClient(
+                    settings.elks_api_url,
+                    settings.elks_api_username,
+                    settings.elks_api_password,
+                    from_number=settings.elks_sms_from_number,
+                    timeout=settings.elks_timeout,
+                    max_connections=settings.elks_max_connections,
+                    delivery_report_url=settings.delivery_report_url
+                )
+    return _client
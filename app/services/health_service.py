@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+import boto3
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProber:
+    """Background prober that keeps a cached readiness snapshot.
+
+    Dependency checks run on an interval in the background, so readiness
+    probes only read the latest snapshot and never touch DynamoDB or Redis.
+    """
+
+    def __init__(
+        self,
+        table_names=("skippy_sms",),
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        max_in_flight: int = 500,
+        max_loop_lag: float = 0.5,
+        dynamodb_client=None,
+        redis_client: Optional[redis.Redis] = None,
+    ):
+        self.table_names = tuple(table_names)
+        self.interval = interval
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.dynamodb_client = dynamodb_client
+        self.redis_client = redis_client
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop_lag = 0.0
+        # Counted by InFlightMiddleware, independently of the metrics settings
+        self.in_flight = 0
+
+    def _get_dynamodb_client(self):
+        if self.dynamodb_client is None:
+            self.dynamodb_client = boto3.client(
+                'dynamodb',
+                region_name=settings.aws_region,
+                aws_access_key_id=settings.aws_access_key_id,
+                aws_secret_access_key=settings.aws_secret_access_key,
+                endpoint_url=settings.dynamodb_endpoint_url
+            )
+        return self.dynamodb_client
+
+    def _get_redis_client(self) -> redis.Redis:
+        if self.redis_client is None:
+            self.redis_client = redis.Redis.from_url(
+                settings.redis_url,
+                socket_timeout=self.timeout,
+                socket_connect_timeout=self.timeout
+            )
+        return self.redis_client
+
+    def _check_dynamodb(self) -> Dict[str, Any]:
+        client = self._get_dynamodb_client()
+        for table_name in self.table_names:
+            status = client.describe_table(TableName=table_name)['Table']['TableStatus']
+            if status not in ('ACTIVE', 'UPDATING'):
+                return {"healthy": False, "detail": f"{table_name} is {status}"}
+        return {"healthy": True}
+
+    def _check_redis(self) -> Dict[str, Any]:
+        self._get_redis_client().ping()
+        return {"healthy": True}
+
+    def _check_saturation(self) -> Dict[str, Any]:
+        in_flight = self.in_flight
+        healthy = in_flight <= self.max_in_flight and self._loop_lag <= self.max_loop_lag
+        return {
+            "healthy": healthy,
+            "in_flight": in_flight,
+            "loop_lag_ms": round(self._loop_lag * 1000, 2)
+        }
+
+    async def _run_check(self, check: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(loop.run_in_executor(None, check), self.timeout)
+        except asyncio.TimeoutError:
+            result = {"healthy": False, "detail": "timed out"}
+        except Exception as e:
+            result = {"healthy": False, "detail": f"{type(e).__name__}: {e}"}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    async def _sleep(self, interval: float):
+        """Sleep between probes, measuring loop lag as how late the wake-up comes."""
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        self._loop_lag = max(time.perf_counter() - start - interval, 0.0)
+
+    async def probe(self) -> Dict[str, Any]:
+        """Run all checks once and publish a new snapshot."""
+        dynamodb, redis_status = await asyncio.gather(
+            self._run_check(self._check_dynamodb),
+            self._run_check(self._check_redis)
+        )
+        checks = {
+            "dynamodb": dynamodb,
+            "redis": redis_status,
+            "saturation": self._check_saturation(),
+        }
+        snapshot = {
+            "ready": all(check["healthy"] for check in checks.values()),
+            "checks": checks,
+            "checked_at": time.time(),
+        }
+        if self._snapshot is not None and snapshot["ready"] != self._snapshot["ready"]:
+            logger.warning(f"Readiness changed to {snapshot['ready']}: {checks}")
+        # Replace the snapshot in one assignment so readers never see a partial update
+        self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the cached readiness snapshot without probing dependencies."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"ready": False, "checks": {}, "detail": "not probed yet"}
+        age = time.time() - snapshot["checked_at"]
+        if age > self.interval * 3 + self.timeout:
+            return dict(snapshot, ready=False, detail=f"snapshot is stale ({age:.0f}s old)")
+        return snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.error(f"Health probe failed: {e}")
+            await self._sleep(self.interval)
+
+    def start(self):
+        """Start probing in the background on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class InFlightMiddleware:
+    """ASGI middleware counting the HTTP requests a prober's saturation check sees."""
+
+    def __init__(self, app, prober: HealthProber):
+        self.app = app
+        self.prober = prober
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.prober.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.prober.in_flight -= 1
+
+
+health_prober = HealthProber(
+    interval=settings.health_probe_interval,
+    timeout=settings.health_probe_timeout,
+    max_in_flight=settings.health_max_in_flight
+)
@@ -0,0 +1,366 @@
+"""Local durable spool for incoming SMS while DynamoDB is unavailable.
+
+Items are appended to segment files in a per-process slot directory as
+length + CRC32 framed JSON records. Appends from concurrent requests share
+one fsync (group commit), so an append returns only once the record is on
+disk. A background replayer drains sealed segments to DynamoDB at a capped
+rate once writes succeed again, checkpointing its position so a restart
+resumes where it stopped.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DEPTH = Gauge(
+    "skippy_spool_depth",
+    "SMS records waiting in the local spool"
+)
+SPOOL_OLDEST_AGE = Gauge(
+    "skippy_spool_oldest_age_seconds",
+    "Age of the oldest SMS record waiting in the local spool"
+)
+SPOOL_RECORDS = Counter(
+    "skippy_spool_records_total",
+    "SMS records written to and drained from the local spool by outcome",
+    ["outcome"]
+)
+
+# Record header: payload length, CRC32 of the payload
+_HEADER = struct.Struct("<II")
+_SEGMENT_SUFFIX = ".seg"
+_CHECKPOINT = "checkpoint"
+
+
+class IngestSpool:
+    """Append-only, checksummed, segment-rotated spool owned by one process.
+
+    Each process claims a `slot-N` directory under `directory` with an
+    exclusive lock, so the workers of the pre-fork server never share
+    segment files; a restarted worker takes over a free slot and drains
+    whatever its predecessor left behind.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024):
+        self.root = directory
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.directory, self._lock_file = self._claim_slot()
+
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        self._synced = threading.Condition(self._lock)
+        self._appended = 0
+        self._synced_count = 0
+        self._closed = False
+
+        self.depth, self.oldest_spooled_at = self._scan()
+
+        # Never append after a possibly torn tail: always start a new segment
+        self._segment_seq = self._last_sequence() + 1
+        self._fd = self._open_segment(self._segment_seq)
+        self._size = 0
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="ingest-spool-fsync", daemon=True)
+        self._flusher.start()
+
+    def _claim_slot(self) -> Tuple[str, Any]:
+        index = 0
+        while True:
+            path = os.path.join(self.root, f"slot-{index}")
+            os.makedirs(path, exist_ok=True)
+            lock_file = open(os.path.join(path, ".lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return path, lock_file
+            except BlockingIOError:
+                lock_file.close()
+                index += 1
+
+    def _segment_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"{sequence:016d}{_SEGMENT_SUFFIX}")
+
+    def _last_sequence(self) -> int:
+        segments = self.segments()
+        return int(os.path.basename(segments[-1])[:-len(_SEGMENT_SUFFIX)]) if segments else 0
+
+    def _open_segment(self, sequence: int) -> int:
+        fd = os.open(self._segment_path(sequence), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        # Make the new directory entry durable too
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        return fd
+
+    def _scan(self) -> Tuple[int, Optional[float]]:
+        """Count pending records left by an earlier process."""
+        depth, oldest = 0, None
+        for segment in self.segments():
+            for _, spooled_at, _ in self.read(segment, self.checkpoint_offset(segment), count_corrupt=False):
+                depth += 1
+                if oldest is None:
+                    oldest = spooled_at
+        return depth, oldest
+
+    def segments(self) -> List[str]:
+        """Return the segment files in this slot, oldest first."""
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(_SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def append(self, item: Dict[str, Any]):
+        """Durably append an item; returns once the record has been fsynced."""
+        now = time.time()
+        payload = json.dumps({"t": now, "item": item}, separators=(",", ":")).encode()
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Spool is closed")
+            if self._size and self._size + len(record) > self.segment_max_bytes:
+                self._rotate_locked()
+            # One write() per record on an O_APPEND descriptor
+            os.write(self._fd, record)
+            self._size += len(record)
+            self._appended += 1
+            target = self._appended
+            if self.depth == 0:
+                self.oldest_spooled_at = now
+            self.depth += 1
+            self._pending.notify()
+            while self._synced_count < target:
+                self._synced.wait()
+        SPOOL_RECORDS.labels("spooled").inc()
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while self._synced_count == self._appended and not self._closed:
+                    self._pending.wait()
+                if self._closed and self._synced_count == self._appended:
+                    return
+                target = self._appended
+                fd = self._fd
+            # fsync outside the lock so new appends queue up for the next one
+            try:
+                os.fsync(fd)
+            except OSError:
+                # The segment was rotated (and fsynced) while we were waiting
+                pass
+            with self._lock:
+                self._synced_count = max(self._synced_count, target)
+                self._synced.notify_all()
+
+    def _rotate_locked(self):
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._synced_count = self._appended
+        self._synced.notify_all()
+        self._segment_seq += 1
+        self._fd = self._open_segment(self._segment_seq)
+        self._size = 0
+
+    def seal(self):
+        """Close the active segment if it has records so the replayer can read it."""
+        with self._lock:
+            if self._size and not self._closed:
+                self._rotate_locked()
+
+    def sealed_segments(self) -> List[str]:
+        active = self._segment_path(self._segment_seq)
+        return [segment for segment in self.segments() if segment != active]
+
+    def read(self, segment: str, offset: int = 0,
+             count_corrupt: bool = True) -> Iterator[Tuple[Dict[str, Any], float, int]]:
+        """Yield (item, spooled_at, next_offset) from a segment, stopping at a torn or corrupt record."""
+        with open(segment, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if not header:
+                    return
+                if len(header) == _HEADER.size:
+                    length, checksum = _HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) == length and zlib.crc32(payload) == checksum:
+                        offset += _HEADER.size + length
+                        record = json.loads(payload)
+                        yield record["item"], record["t"], offset
+                        continue
+                if count_corrupt:
+                    logger.error(f"Corrupt or torn record in {segment} at offset {offset}, skipping rest of segment")
+                    SPOOL_RECORDS.labels("corrupt").inc()
+                return
+
+    def checkpoint_offset(self, segment: str) -> int:
+        """Return the replay position within a segment."""
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT)) as f:
+                name, offset = f.read().split()
+        except (OSError, ValueError):
+            return 0
+        return int(offset) if name == os.path.basename(segment) else 0
+
+    def commit(self, segment: str, offset: int, replayed: int,
+               last_spooled_at: Optional[float], finished: bool = False):
+        """Record replay progress; a finished segment is deleted."""
+        checkpoint = os.path.join(self.directory, _CHECKPOINT)
+        if finished:
+            os.remove(segment)
+            try:
+                os.remove(checkpoint)
+            except FileNotFoundError:
+                pass
+        else:
+            tmp = checkpoint + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(f"{os.path.basename(segment)} {offset}")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, checkpoint)
+
+        with self._lock:
+            self.depth = max(0, self.depth - replayed)
+            if self.depth == 0:
+                self.oldest_spooled_at = None
+            elif last_spooled_at is not None:
+                # Records are in arrival order, so the next one is at least this old
+                self.oldest_spooled_at = last_spooled_at
+
+    def oldest_age(self) -> float:
+        oldest = self.oldest_spooled_at
+        return max(0.0, time.time() - oldest) if oldest is not None else 0.0
+
+    def close(self):
+        """Flush outstanding appends and release the slot."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify()
+        self._flusher.join()
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._lock_file.close()
+
+
+class SpoolReplayer:
+    """Drain an ingest spool to DynamoDB at a capped rate.
+
+    `write(item)` stores one item and returns True if it was written (False
+    if it already existed); it raises while DynamoDB is still unavailable,
+    in which case progress so far is checkpointed and replay is retried
+    after `interval`. `on_replayed(item)` is called for every item written.
+    """
+
+    def __init__(
+        self,
+        spool: IngestSpool,
+        write: Callable[[Dict[str, Any]], bool],
+        on_replayed: Optional[Callable[[Dict[str, Any]], None]] = None,
+        rate: float = 50.0,
+        batch_size: int = 100,
+        interval: float = 5.0,
+    ):
+        self.spool = spool
+        self.write = write
+        self.on_replayed = on_replayed
+        self.rate = rate
+        self.batch_size = batch_size
+        self.interval = interval
+        self._next_write_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _pace(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        if self._next_write_at > now:
+            time.sleep(self._next_write_at - now)
+        self._next_write_at = max(self._next_write_at, now) + 1.0 / self.rate
+
+    def replay_once(self) -> int:
+        """Replay every sealed segment; returns the number of records drained."""
+        self.spool.seal()
+        total = 0
+        for segment in self.spool.sealed_segments():
+            offset = self.spool.checkpoint_offset(segment)
+            batch, last_spooled_at = 0, None
+            try:
+                for item, spooled_at, next_offset in self.spool.read(segment, offset):
+                    self._pace()
+                    if self.write(item):
+                        SPOOL_RECORDS.labels("replayed").inc()
+                        if self.on_replayed is not None:
+                            self.on_replayed(item)
+                    else:
+                        SPOOL_RECORDS.labels("duplicate").inc()
+                    offset, last_spooled_at = next_offset, spooled_at
+                    batch += 1
+                    total += 1
+                    if batch >= self.batch_size:
+                        self.spool.commit(segment, offset, batch, last_spooled_at)
+                        batch = 0
+            except Exception:
+                self.spool.commit(segment, offset, batch, last_spooled_at)
+                raise
+            self.spool.commit(segment, offset, batch, last_spooled_at, finished=True)
+        return total
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.spool.depth:
+                try:
+                    replayed = await loop.run_in_executor(None, self.replay_once)
+                    logger.info(f"Replayed {replayed} spooled SMS to DynamoDB")
+                except Exception as e:
+                    logger.warning(f"Spool replay paused, DynamoDB still failing: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start draining in the background on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_spool: Optional[IngestSpool] = None
+_spool_lock = threading.Lock()
+
+
+def get_ingest_spool() -> Optional[IngestSpool]:
+    """Return this process's ingest spool, or None when spooling is disabled."""
+    global _spool
+    if not settings.spool_enabled:
+        return None
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = IngestSpool(
+                    settings.spool_dir,
+                    segment_max_bytes=settings.spool_segment_max_mb * 1024 * 1024
+                )
+                SPOOL_DEPTH.set_function(lambda: _spool.depth)
+                SPOOL_OLDEST_AGE.set_function(_spool.oldest_age)
+    return _spool
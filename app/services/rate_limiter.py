@@ -0,0 +1,385 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import redis
+
+from app.config import settings
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+REJECT = "reject"
+DROP = "drop"
+
+RATE_LIMIT_DECISIONS = Counter(
+    "skippy_rate_limit_decisions_total",
+    "Inbound rate limit decisions by policy, outcome and backend",
+    ["policy", "decision", "backend"]
+)
+
+# GCRA (generic cell rate algorithm) over one key holding the theoretical
+# arrival time (TAT) in ms. Requests already admitted by a process's local
+# pre-filter are charged first; then the current request is checked.
+#
+# KEYS[1] TAT
+# ARGV: now_ms, emission_interval_ms, tolerance_ms, pending, cost
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now) + tonumber(ARGV[4]) * interval
+local new_tat = tat + tonumber(ARGV[5]) * interval
+local allowed = 0
+local retry_after = 0
+if new_tat - now <= tolerance then
+    tat = new_tat
+    allowed = 1
+else
+    retry_after = new_tat - tolerance - now
+end
+if tat > now then
+    redis.call('SET', KEYS[1], string.format('%.0f', tat), 'PX', math.ceil(tat - now))
+end
+return {allowed, math.ceil(retry_after)}
+"""
+
+
+class RateLimitPolicy(NamedTuple):
+    """`limit` requests per `period` seconds, with bursts of up to `burst` requests."""
+    name: str
+    limit: int
+    period: float
+    burst: int
+    action: str = REJECT  # "reject" (429) or "drop" (acknowledge without storing)
+
+    @property
+    def emission_interval(self) -> float:
+        return self.period / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        return self.emission_interval * self.burst
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+    backend: str = "local"
+
+
+class LocalGCRA:
+    """In-process GCRA used when Redis is unavailable.
+
+    Only limits requests handled by the same process, but keeps floods in
+    check with bounded memory while Redis is down.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._tat: Dict[str, float] = {}
+
+    def check(self, key: str, now: float, policy: RateLimitPolicy, cost: int = 1) -> Tuple[bool, float]:
+        with self._lock:
+            tat = self._tat.get(key)
+            if tat is None and len(self._tat) >= self.max_keys:
+                self._prune(now)
+            tat = max(tat or now, now)
+            new_tat = tat + cost * policy.emission_interval
+            if new_tat - now <= policy.tolerance:
+                self._tat[key] = new_tat
+                return True, 0.0
+            return False, new_tat - policy.tolerance - now
+
+    def _prune(self, now: float):
+        for key in [k for k, tat in self._tat.items() if tat <= now]:
+            del self._tat[key]
+        while len(self._tat) >= self.max_keys:
+            del self._tat[next(iter(self._tat))]
+
+
+class _LocalState:
+    __slots__ = ("pending", "first_pending_at", "blocked_until")
+
+    def __init__(self):
+        self.pending = 0
+        self.first_pending_at = 0.0
+        self.blocked_until = 0.0
+
+
+class RateLimiter:
+    """Cluster-wide inbound rate limits with a local pre-filter.
+
+    Each check runs one GCRA script in Redis. To save the round-trip, a
+    process admits up to `local_fraction` of a policy's burst per key on its
+    own and charges those requests to Redis with the key's next check, and
+    keys Redis has limited are rejected locally until their retry-after
+    time. Falls back to an in-process GCRA if Redis cannot be reached.
+    """
+
+    def __init__(
+        self,
+        policies: Iterable[RateLimitPolicy],
+        redis_client: Optional[redis.Redis] = None,
+        local_fraction: float = 0.1,
+        key_prefix: str = "skippy:ratelimit",
+        retry_after: float = 30.0,
+        max_keys: int = 100_000,
+        exempt_ips: str = "",
+    ):
+        self.policies = {policy.name: policy for policy in policies if policy.limit > 0}
+        self.redis = redis_client
+        self.local_fraction = local_fraction
+        self.key_prefix = key_prefix
+        self.retry_after = retry_after
+        self.max_keys = max_keys
+        self.exempt_networks = parse_networks(exempt_ips)
+        self.local = LocalGCRA(max_keys)
+        self._script = redis_client.register_script(_GCRA_SCRIPT) if redis_client else None
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self._state: Dict[Tuple[str, str], _LocalState] = {}
+
+    def _local_state(self, policy: RateLimitPolicy, key: str, now: float) -> _LocalState:
+        state = self._state.get((policy.name, key))
+        if state is None:
+            if len(self._state) >= self.max_keys:
+                self._prune(now)
+            state = self._state[(policy.name, key)] = _LocalState()
+        return state
+
+    def _prune(self, now: float):
+        """Drop keys with nothing pending and no block; evict the oldest if still full."""
+        for name_key in [k for k, s in self._state.items() if not s.pending and s.blocked_until <= now]:
+            del self._state[name_key]
+        while len(self._state) >= self.max_keys:
+            del self._state[next(iter(self._state))]
+
+    def _decide_locally(self, policy: RateLimitPolicy, key: str, now: float) -> Tuple[Optional[RateLimitDecision], int]:
+        """Return a local decision, or None and the pending count to charge in Redis."""
+        with self._lock:
+            state = self._local_state(policy, key, now)
+            if state.blocked_until > now:
+                return RateLimitDecision(False, state.blocked_until - now, "local"), 0
+            if state.pending and now - state.first_pending_at > policy.period:
+                # Charges older than the period would have expired in Redis already
+                state.pending = 0
+            if state.pending < int(policy.burst * self.local_fraction):
+                if not state.pending:
+                    state.first_pending_at = now
+                state.pending += 1
+                return RateLimitDecision(True, 0.0, "local"), 0
+            pending, state.pending = state.pending, 0
+            return None, pending
+
+    def _check_redis(self, policy: RateLimitPolicy, key: str, now: float, pending: int) -> RateLimitDecision:
+        allowed, retry_after_ms = self._script(
+            keys=[f"{self.key_prefix}:{policy.name}:{key}"],
+            args=[int(now * 1000), policy.emission_interval * 1000, policy.tolerance * 1000, pending, 1]
+        )
+        retry_after = int(retry_after_ms) / 1000.0
+        if not int(allowed):
+            with self._lock:
+                self._local_state(policy, key, now).blocked_until = now + retry_after
+        return RateLimitDecision(bool(int(allowed)), retry_after, "redis")
+
+    def is_exempt(self, ip: str) -> bool:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.exempt_networks)
+
+    async def check(self, policy_name: str, key: str) -> RateLimitDecision:
+        """Count a request for `key` against a policy; unknown or disabled policies allow everything."""
+        policy = self.policies.get(policy_name)
+        if policy is None:
+            return RateLimitDecision(True)
+
+        now = time.time()
+        decision, pending = self._decide_locally(policy, key, now)
+        if decision is None and self._script is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                loop = asyncio.get_running_loop()
+                decision = await loop.run_in_executor(None, self._check_redis, policy, key, now, pending)
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiting falling back to local limits: {e}")
+                self._redis_down_until = time.monotonic() + self.retry_after
+        if decision is None:
+            allowed, retry_after = self.local.check(f"{policy.name}:{key}", now, policy, cost=pending + 1)
+            decision = RateLimitDecision(allowed, retry_after, "fallback")
+
+        RATE_LIMIT_DECISIONS.labels(policy.name, "allowed" if decision.allowed else "limited", decision.backend).inc()
+        return decision
+
+
+# Multi-token GCRA for a shared send budget: grants as many of the requested
+# tokens as the budget has, or none and the ms to wait for the next one.
+#
+# KEYS[1] TAT
+# ARGV: now_ms, emission_interval_ms, tolerance_ms, requested
+_BUDGET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+local granted = math.min(math.floor((now + tolerance - tat) / interval), tonumber(ARGV[4]))
+if granted < 1 then
+    return {0, math.ceil(tat + interval - tolerance - now)}
+end
+tat = tat + granted * interval
+redis.call('SET', KEYS[1], string.format('%.0f', tat), 'PX', math.ceil(tat - now))
+return {granted, 0}
+"""
+
+
+class SendBudget:
+    """A sends-per-second budget shared by every worker through Redis.
+
+    `rate` tokens are issued per second and up to `burst` can be taken at
+    once. Without a Redis client the budget only covers this process. While
+    Redis is unreachable nothing is granted, so outages never overshoot the
+    budget.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        redis_client: Optional[redis.Redis] = None,
+        key: str = "skippy:budget:sends",
+        retry_after: float = 1.0,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.key = key
+        self.retry_after = retry_after
+        self.interval = 1.0 / rate
+        self._script = redis_client.register_script(_BUDGET_SCRIPT) if redis_client else None
+        self._lock = threading.Lock()
+        self._tat = 0.0
+
+    def take(self, count: int, now: Optional[float] = None) -> Tuple[int, float]:
+        """Take up to `count` tokens; returns the number granted and, if none, seconds to wait."""
+        now = time.time() if now is None else now
+        tolerance = self.interval * self.burst
+        if self._script is not None:
+            try:
+                granted, wait_ms = self._script(
+                    keys=[self.key],
+                    args=[int(now * 1000), self.interval * 1000, tolerance * 1000, count]
+                )
+            except redis.RedisError as e:
+                logger.warning(f"Send budget unavailable: {e}")
+                return 0, self.retry_after
+            return int(granted), int(wait_ms) / 1000.0
+
+        with self._lock:
+            tat = max(self._tat, now)
+            granted = min(int((now + tolerance - tat) / self.interval), count)
+            if granted < 1:
+                return 0, tat + self.interval - tolerance - now
+            self._tat = tat + granted * self.interval
+            return granted, 0.0
+
+    async def acquire(self, count: int, timeout: Optional[float] = None) -> int:
+        """Wait until at least one token is free and take up to `count`.
+        
+        Returns 0 if nothing was granted within `timeout` seconds (e.g. while
+        Redis is unreachable).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            granted, wait = self.take(count)
+            if granted:
+                return granted
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 0
+                wait = min(wait, remaining)
+            await asyncio.sleep(max(wait, 0.001))
+
+
+def parse_networks(value: str) -> List[ipaddress._BaseNetwork]:
+    """Parse a comma-separated list of addresses and CIDR ranges."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str], trusted_proxies: int = 0) -> str:
+    """Return the address to key the IP policy by.
+    
+    Proxies append to X-Forwarded-For and anything left of their entries is
+    whatever the client sent, so with `trusted_proxies` proxies in front the
+    client is the Nth address from the right.
+    """
+    if trusted_proxies > 0 and forwarded_for:
+        addresses = [part.strip() for part in forwarded_for.split(",")]
+        return addresses[-min(trusted_proxies, len(addresses))] or peer or "unknown"
+    return peer or "unknown"
+
+
+def retry_after_header(decision: RateLimitDecision) -> str:
+    return str(max(1, math.ceil(decision.retry_after)))
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the process-wide inbound rate limiter, or None when rate limiting is disabled."""
+    global _limiter
+    if not settings.rate_limit_enabled:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    [
+                        RateLimitPolicy(
+                            "sender",
+                            settings.rate_limit_sender_limit,
+                            settings.rate_limit_sender_period,
+                            settings.rate_limit_sender_burst,
+                            settings.rate_limit_sender_action
+                        ),
+                        RateLimitPolicy(
+                            "ip",
+                            settings.rate_limit_ip_limit,
+                            settings.rate_limit_ip_period,
+                            settings.rate_limit_ip_burst,
+                            settings.rate_limit_ip_action
+                        ),
+                    ],
+                    redis_client=redis.Redis.from_url(
+                        settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+                    ),
+                    local_fraction=settings.rate_limit_local_fraction,
+                    exempt_ips=settings.rate_limit_exempt_ips
+                )
+    return _limiter
+
+
+_budget: Optional[SendBudget] = None
+
+
+def get_send_budget() -> SendBudget:
+    """Return the process-wide outbound send budget, configured from settings."""
+    global _budget
+    if _budget is None:
+        with _limiter_lock:
+            if _budget is None:
+                _budget = SendBudget(
+                    settings.campaign_sends_per_second,
+                    settings.campaign_send_burst,
+                    redis_client=redis.Redis.from_url(
+                        settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+                    )
+                )
+    return _budget
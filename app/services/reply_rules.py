@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+
+from app.config import settings
+from app.models.reply_rule import ReplyRule
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLY = "Thank you for your message. We've received it and will respond shortly."
+
+# Built-in rules used when no rule source is configured. They mirror the
+# original hard-coded replies, except that "hi" only matches the whole word.
+DEFAULT_RULES = [
+    ReplyRule(id="greeting-hello", type="keyword", pattern="hello", priority=30,
+              reply="Hello! Thanks for your message. We'll get back to you soon."),
+    ReplyRule(id="greeting-hi", type="word", pattern="hi", priority=30,
+              reply="Hello! Thanks for your message. We'll get back to you soon."),
+    ReplyRule(id="help", type="keyword", pattern="help", priority=20,
+              reply="Need help? Contact our support team at support@example.com"),
+    ReplyRule(id="status", type="keyword", pattern="status", priority=10,
+              reply="Your request is being processed. We'll update you shortly."),
+]
+
+
+RULE_RELOADS = Counter(
+    "skippy_reply_rule_reloads_total",
+    "Reply rule reload attempts by outcome",
+    ["outcome"]
+)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class CompiledRuleSet:
+    """Immutable, pre-compiled set of reply rules.
+
+    Keyword and word rules are merged into a single Aho-Corasick automaton so a
+    message is scanned once regardless of the number of rules. Regex rules are
+    tried afterwards in priority order, and only while they can still beat the
+    best literal match.
+    """
+
+    def __init__(self, rules: List[ReplyRule]):
+        active = [rule for rule in rules if rule.enabled]
+        # Rank 0 is the best rule; ties keep definition order (sort is stable)
+        self.rules: List[ReplyRule] = sorted(active, key=lambda rule: -rule.priority)
+
+        literals: Dict[str, List[Tuple[int, bool]]] = {}
+        self._regexes: List[Tuple[int, re.Pattern]] = []
+        for rank, rule in enumerate(self.rules):
+            if rule.type == "regex":
+                self._regexes.append((rank, re.compile(rule.pattern, re.IGNORECASE)))
+            else:
+                literals.setdefault(rule.pattern.lower(), []).append((rank, rule.type == "word"))
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[int, Tuple[Tuple[int, bool], ...]], ...]] = [()]
+        self._build_automaton(literals)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _build_automaton(self, literals: Dict[str, List[Tuple[int, bool]]]):
+        goto, fail, out = self._goto, self._fail, self._out
+
+        for pattern, entries in literals.items():
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                node = nxt
+            out[node] = out[node] + ((len(pattern), tuple(entries)),)
+
+        # Breadth-first pass to compute failure links and merge outputs
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                out[child] = out[child] + out[fail[child]]
+
+    def match(self, message: str) -> Optional[ReplyRule]:
+        """Return the highest priority rule matching the message, if any."""
+        if not self.rules:
+            return None
+
+        goto, fail, out = self._goto, self._fail, self._out
+        text = message.lower()
+        text_len = len(text)
+        best = len(self.rules)
+        node = 0
+
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            for length, entries in out[node]:
+                for rank, word_only in entries:
+                    if rank >= best:
+                        continue
+                    if word_only:
+                        start = i - length + 1
+                        if start > 0 and _is_word_char(text[start - 1]):
+                            continue
+                        if i + 1 < text_len and _is_word_char(text[i + 1]):
+                            continue
+                    best = rank
+            if best == 0:
+                break
+
+        for rank, regex in self._regexes:
+            if rank >= best:
+                break
+            if regex.search(message):
+                best = rank
+                break
+
+        return self.rules[best] if best < len(self.rules) else None
+
+
+class FileRuleSource:
+    """Load reply rules from a JSON file containing a list of rule objects."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def version(self) -> Optional[Any]:
+        """Return a cheap change marker for the file."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self) -> List[ReplyRule]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return [ReplyRule(**item) for item in data]
+
+
+class DynamoDBRuleSource:
+    """Load reply rules from a DynamoDB table keyed by rule ID."""
+
+    def __init__(self, table_name: str, dynamodb=None):
+        self.table_name = table_name
+        self.dynamodb = dynamodb or boto3.resource(
+            'dynamodb',
+            region_name=settings.aws_region,
+            aws_access_key_id=settings.aws_access_key_id,
+            aws_secret_access_key=settings.aws_secret_access_key,
+            endpoint_url=settings.dynamodb_endpoint_url
+        )
+
+    def version(self) -> Optional[Any]:
+        """DynamoDB has no cheap change marker, so every poll reloads."""
+        return None
+
+    def load(self) -> List[ReplyRule]:
+        table = self.dynamodb.Table(self.table_name)
+        items: List[Dict[str, Any]] = []
+        kwargs: Dict[str, Any] = {}
+        while True:
+            response = table.scan(**kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+        for item in items:
+            # DynamoDB returns numbers as Decimal
+            for key in ('priority', 'suppression_window'):
+                if item.get(key) is not None:
+                    item[key] = int(item[key])
+        return [ReplyRule(**item) for item in items]
+
+
+class ReplyRuleEngine:
+    """Auto-reply rule engine with atomic hot reloading.
+
+    The compiled rule set is swapped in as a single reference assignment, so
+    matching never blocks on a reload and always sees a consistent snapshot.
+    """
+
+    def __init__(
+        self,
+        source=None,
+        default_reply: str = DEFAULT_REPLY,
+        reload_interval: float = 30.0,
+    ):
+        self.source = source
+        self.default_reply = default_reply
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._version: Optional[Any] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._next_check = 0.0
+        self._rules = CompiledRuleSet(DEFAULT_RULES)
+        if source is not None:
+            self.reload(force=True)
+
+    @property
+    def rules(self) -> CompiledRuleSet:
+        return self._rules
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload rules from the source; return True if the rule set changed."""
+        if self.source is None:
+            return False
+        if not self._lock.acquire(blocking=force):
+            # Another thread is already reloading; keep serving the old rules
+            return False
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            version = self.source.version()
+            if not force and version is not None and version == self._version:
+                return False
+
+            try:
+                rules = self.source.load()
+                fingerprint = tuple(tuple(rule.model_dump().values()) for rule in rules)
+                # Compile before accepting the version, so a bad pattern is retried
+                compiled = None if fingerprint == self._fingerprint else CompiledRuleSet(rules)
+            except Exception as e:
+                logger.warning(f"Failed to load reply rules, keeping previous set: {e}")
+                RULE_RELOADS.labels("error").inc()
+                return False
+
+            self._version = version
+            if compiled is None:
+                RULE_RELOADS.labels("unchanged").inc()
+                return False
+
+            self._rules = compiled
+            self._fingerprint = fingerprint
+            RULE_RELOADS.labels("changed").inc()
+            logger.info(f"Loaded {len(compiled)} reply rules")
+            return True
+        finally:
+            self._lock.release()
+
+    def match(self, message: str) -> Optional[ReplyRule]:
+        """Return the best matching rule, reloading first if the interval elapsed."""
+        if self.source is not None and time.monotonic() >= self._next_check:
+            self.reload()
+        return self._rules.match(message)
+
+    def select(self, message: str) -> Tuple[str, Optional[ReplyRule]]:
+        """Return the reply message and the rule that produced it (None for the default)."""
+        rule = self.match(message)
+        return (rule.reply, rule) if rule else (self.default_reply, None)
+
+    def reply_for(self, message: str) -> str:
+        """Return the reply message for an incoming SMS."""
+        return self.select(message)[0]
+
+
+_engine: Optional[ReplyRuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_reply_rule_engine() -> ReplyRuleEngine:
+    """Return the process-wide rule engine, configured from settings."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                source = None
+                if settings.reply_rules_path:
+                    source = FileRuleSource(settings.reply_rules_path)
+                elif settings.reply_rules_table_name:
+                    source = DynamoDBRuleSource(settings.reply_rules_table_name)
+                _engine = ReplyRuleEngine(
+                    source=source,
+                    reload_interval=settings.reply_rules_reload_interval
+                )
+    return _engine
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import redis
+
+from app.config import settings
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+SEND = "send"
+COALESCE = "coalesce"
+SKIP = "skip"
+
+_DECISIONS = {1: SEND, 2: COALESCE, 3: SKIP}
+
+SUPPRESSION_DECISIONS = Counter(
+    "skippy_reply_suppression_decisions_total",
+    "Auto-reply suppression decisions by outcome and backend",
+    ["decision", "backend"]
+)
+
+# Sliding window over a sorted set of reply timestamps. Returns the decision
+# code and, for coalesced replies, the delay until the window frees up. Each
+# window length has its own keys, so a short window never trims or expires
+# the timestamps a longer one still counts.
+#
+# KEYS[1] reply timestamps, KEYS[2] pending coalesced reply marker
+# ARGV: now_ms, window_ms, max_replies, coalesce (0/1), member
+_SUPPRESSION_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], now, ARGV[5])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, 0}
+end
+if ARGV[4] == '1' then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    local delay = math.max(tonumber(oldest[2]) + window - now, 1)
+    if redis.call('SET', KEYS[2], ARGV[5], 'NX', 'PX', delay) then
+        return {2, delay}
+    end
+end
+return {3, 0}
+"""
+
+
+class LocalSuppressionWindow:
+    """In-process sliding window used when Redis is unavailable.
+
+    Only suppresses bursts handled by the same worker process, but keeps
+    replies flowing with bounded memory while Redis is down. Keys should
+    include the window length, as the Redis keys do.
+    """
+
+    def __init__(self, max_senders: int = 100_000):
+        self.max_senders = max_senders
+        self._lock = threading.Lock()
+        self._sent: Dict[str, Deque[float]] = {}
+        self._pending: Dict[str, float] = {}
+        # Senders are only pruned once idle for the longest window in use
+        self._longest_window = 0.0
+
+    def check(
+        self, key: str, now: float, window: float, max_replies: int, coalesce: bool
+    ) -> Tuple[str, float]:
+        with self._lock:
+            self._longest_window = max(self._longest_window, window)
+            sent = self._sent.get(key)
+            if sent is None:
+                if len(self._sent) >= self.max_senders:
+                    self._prune(now, self._longest_window)
+                sent = self._sent[key] = deque()
+            while sent and sent[0] <= now - window:
+                sent.popleft()
+
+            if len(sent) < max_replies:
+                sent.append(now)
+                return SEND, 0.0
+
+            if coalesce and self._pending.get(key, 0.0) <= now:
+                delay = max(sent[0] + window - now, 0.001)
+                self._pending[key] = now + delay
+                return COALESCE, delay
+
+            return SKIP, 0.0
+
+    def _prune(self, now: float, window: float):
+        """Drop idle senders; evict the oldest ones if still over the limit."""
+        for key in [k for k, sent in self._sent.items() if not sent or sent[-1] <= now - window]:
+            del self._sent[key]
+            self._pending.pop(key, None)
+        while len(self._sent) >= self.max_senders:
+            key = next(iter(self._sent))
+            del self._sent[key]
+            self._pending.pop(key, None)
+
+
+class ReplySuppressor:
+    """Per-sender auto-reply suppression window.
+
+    Decides in a single Redis round-trip whether a reply should be sent now,
+    coalesced into one delayed reply at the end of the window, or skipped.
+    Falls back to an in-process window if Redis cannot be reached.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        window: int = 300,
+        max_replies: int = 1,
+        coalesce: bool = False,
+        key_prefix: str = "skippy:suppress",
+        retry_after: float = 30.0,
+    ):
+        self.redis = redis_client
+        self.window = window
+        self.max_replies = max_replies
+        self.coalesce = coalesce
+        self.key_prefix = key_prefix
+        self.retry_after = retry_after
+        self.local = LocalSuppressionWindow()
+        self._script = redis_client.register_script(_SUPPRESSION_SCRIPT) if redis_client else None
+        self._redis_down_until = 0.0
+
+    def check(
+        self, from_number: str, member: str, window: Optional[int] = None
+    ) -> Tuple[str, float]:
+        """Return (decision, delay_seconds) for a reply to from_number.
+
+        `member` identifies the message (e.g. the SMS ID) and `window`
+        overrides the default window in seconds; 0 disables suppression.
+        """
+        window = self.window if window is None else window
+        if window <= 0:
+            return SEND, 0.0
+
+        now = time.time()
+        key = f"{from_number}:{window}"
+        if self._script is not None and time.monotonic() >= self._redis_down_until:
+            redis_key = f"{self.key_prefix}:{key}"
+            try:
+                code, delay_ms = self._script(
+                    keys=[redis_key, f"{redis_key}:pending"],
+                    args=[int(now * 1000), window * 1000, self.max_replies,
+                          1 if self.coalesce else 0, member]
+                )
+                decision = _DECISIONS[int(code)]
+                SUPPRESSION_DECISIONS.labels(decision, "redis").inc()
+                return decision, int(delay_ms) / 1000.0
+            except redis.RedisError as e:
+                logger.warning(f"Reply suppression falling back to local window: {e}")
+                self._redis_down_until = time.monotonic() + self.retry_after
+
+        decision, delay = self.local.check(key, now, window, self.max_replies, self.coalesce)
+        SUPPRESSION_DECISIONS.labels(decision, "local").inc()
+        return decision, delay
+
+
+_suppressor: Optional[ReplySuppressor] = None
+_suppressor_lock = threading.Lock()
+
+
+def get_reply_suppressor() -> ReplySuppressor:
+    """Return the process-wide reply suppressor, configured from settings."""
+    global _suppressor
+    if _suppressor is None:
+        with _suppressor_lock:
+            if _suppressor is None:
+                _suppressor = ReplySuppressor(
+                    redis_client=redis.Redis.from_url(
+                        settings.redis_url, socket_timeout=1.0, socket_connect_timeout=1.0
+                    ),
+                    window=settings.reply_suppression_window,
+                    max_replies=settings.reply_suppression_max_replies,
+                    coalesce=settings.reply_suppression_coalesce
+                )
+    return _suppressor
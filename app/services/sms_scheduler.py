@@ -0,0 +1,261 @@
+"""Scheduled SMS sends kept in Redis.
+
+Pending sends are a sorted set of schedule IDs scored by due time (ms) plus
+a hash of their payloads, so millions of schedules cost Redis memory only.
+The dispatcher (`python -m app.scheduler`) loads the sends due within its
+horizon into a timer wheel and claims them when they fall due; a claim
+moves a send to an in-flight set until it has been queued for sending, and
+claims that are never acknowledged (e.g. the dispatcher died) are returned
+to the due set after their lease.
+
+Sends scheduled inside the window a dispatcher has already loaded are also
+pushed to a "late" list that dispatchers drain, so short delays are not
+missed. All keys share one hash tag so the scripts work on Redis Cluster.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from app.config import settings
+from app.models.schedule import ScheduledSMS
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_SMS = Counter(
+    "skippy_scheduled_sms_total",
+    "Scheduled SMS by event (scheduled, cancelled, claimed, recovered)",
+    ["event"]
+)
+
+# KEYS: due, items, loaded_until, late  ARGV: id, due_ms, payload
+_SCHEDULE_SCRIPT = """
+if redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[3]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+local loaded = redis.call('GET', KEYS[3])
+if loaded and tonumber(ARGV[2]) <= tonumber(loaded) then
+    redis.call('RPUSH', KEYS[4], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: due, items  ARGV: id
+_CANCEL_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Marks the window as loaded before reading it, so anything scheduled into it
+# afterwards goes to the late list.
+# KEYS: due, loaded_until  ARGV: since ("-inf" or "(<ms>"), until_ms, limit, ttl_ms
+_LOAD_SCRIPT = """
+local loaded = redis.call('GET', KEYS[2])
+if not loaded or tonumber(ARGV[2]) > tonumber(loaded) then
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[4])
+else
+    redis.call('PEXPIRE', KEYS[2], ARGV[4])
+end
+return redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2], 'WITHSCORES', 'LIMIT', 0, ARGV[3])
+"""
+
+# KEYS: late, due  ARGV: count
+_DRAIN_LATE_SCRIPT = """
+local ids = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+redis.call('LTRIM', KEYS[1], #ids, -1)
+local due = {}
+for _, id in ipairs(ids) do
+    local score = redis.call('ZSCORE', KEYS[2], id)
+    if score then
+        due[#due + 1] = id
+        due[#due + 1] = score
+    end
+end
+return due
+"""
+
+# KEYS: due, inflight, items  ARGV: now_ms, lease_until_ms, ids...
+_CLAIM_SCRIPT = """
+local claimed = {}
+local now = tonumber(ARGV[1])
+for i = 3, #ARGV do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) <= now then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        redis.call('ZADD', KEYS[2], ARGV[2], ARGV[i])
+        local payload = redis.call('HGET', KEYS[3], ARGV[i])
+        if payload then
+            claimed[#claimed + 1] = payload
+        end
+    end
+end
+return claimed
+"""
+
+# KEYS: inflight, due, late  ARGV: now_ms, limit
+_RECOVER_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[1], id)
+    redis.call('RPUSH', KEYS[3], id)
+end
+return #ids
+"""
+
+
+def to_ms(value: datetime) -> int:
+    """Epoch milliseconds of a datetime (naive values are UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def from_ms(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+
+
+class SMSScheduler:
+    """Pending scheduled SMS in Redis."""
+
+    def __init__(self, redis_client: redis.Redis, key_prefix: str = "skippy:schedule"):
+        self.redis = redis_client
+        tag = "{" + key_prefix + "}"
+        self.due_key = f"{tag}:due"
+        self.inflight_key = f"{tag}:inflight"
+        self.items_key = f"{tag}:items"
+        self.late_key = f"{tag}:late"
+        self.loaded_key = f"{tag}:loaded_until"
+        self._schedule = redis_client.register_script(_SCHEDULE_SCRIPT)
+        self._cancel = redis_client.register_script(_CANCEL_SCRIPT)
+        self._load = redis_client.register_script(_LOAD_SCRIPT)
+        self._drain_late = redis_client.register_script(_DRAIN_LATE_SCRIPT)
+        self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+        self._recover = redis_client.register_script(_RECOVER_SCRIPT)
+
+    def schedule(
+        self,
+        to_number: str,
+        message: str,
+        send_at: datetime,
+        sms_id: Optional[str] = None,
+        schedule_id: Optional[str] = None,
+    ) -> Optional[ScheduledSMS]:
+        """Schedule an SMS; returns None if `schedule_id` is already pending."""
+        schedule_id = schedule_id or str(uuid.uuid4())
+        due_ms = to_ms(send_at)
+        payload = json.dumps({"id": schedule_id, "to": to_number, "message": message, "sms_id": sms_id, "due": due_ms})
+        added = self._schedule(
+            keys=[self.due_key, self.items_key, self.loaded_key, self.late_key],
+            args=[schedule_id, due_ms, payload]
+        )
+        if not int(added):
+            return None
+        SCHEDULED_SMS.labels("scheduled").inc()
+        return ScheduledSMS(
+            id=schedule_id, to_number=to_number, message=message,
+            send_at=from_ms(due_ms), sms_id=sms_id, status="scheduled"
+        )
+
+    def cancel(self, schedule_id: str) -> bool:
+        """Cancel a pending SMS; returns False if it is unknown or already being sent."""
+        cancelled = bool(int(self._cancel(keys=[self.due_key, self.items_key], args=[schedule_id])))
+        if cancelled:
+            SCHEDULED_SMS.labels("cancelled").inc()
+        return cancelled
+
+    def get(self, schedule_id: str) -> Optional[ScheduledSMS]:
+        """Return a pending SMS, or None once it has been sent or cancelled."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hget(self.items_key, schedule_id)
+        pipe.zscore(self.inflight_key, schedule_id)
+        payload, inflight = pipe.execute()
+        if payload is None:
+            return None
+        data = json.loads(payload)
+        return ScheduledSMS(
+            id=data["id"], to_number=data["to"], message=data["message"], send_at=from_ms(data["due"]),
+            sms_id=data["sms_id"], status="dispatching" if inflight is not None else "scheduled"
+        )
+
+    def pending(self) -> int:
+        """Number of scheduled SMS not yet sent (including those being dispatched)."""
+        return self.redis.hlen(self.items_key)
+
+    # Dispatcher side
+
+    def load(self, since_ms: Optional[int], until_ms: int, limit: int, ttl_ms: int) -> List[Tuple[str, int]]:
+        """Return up to `limit` (id, due_ms) due after `since_ms` and at or before `until_ms`."""
+        since = "-inf" if since_ms is None else f"({since_ms}"
+        rows = self._load(keys=[self.due_key, self.loaded_key], args=[since, until_ms, limit, ttl_ms])
+        return [(_text(rows[i]), int(float(rows[i + 1]))) for i in range(0, len(rows), 2)]
+
+    def drain_late(self, limit: int) -> List[Tuple[str, int]]:
+        """Pop (id, due_ms) of sends scheduled into an already loaded window."""
+        rows = self._drain_late(keys=[self.late_key, self.due_key], args=[limit])
+        return [(_text(rows[i]), int(float(rows[i + 1]))) for i in range(0, len(rows), 2)]
+
+    def claim(self, schedule_ids: List[str], now_ms: int, lease_ms: int) -> List[Dict[str, Any]]:
+        """Claim due sends for dispatch; cancelled or already claimed IDs are skipped."""
+        if not schedule_ids:
+            return []
+        payloads = self._claim(
+            keys=[self.due_key, self.inflight_key, self.items_key],
+            args=[now_ms, now_ms + lease_ms, *schedule_ids]
+        )
+        if payloads:
+            SCHEDULED_SMS.labels("claimed").inc(len(payloads))
+        return [json.loads(payload) for payload in payloads]
+
+    def ack(self, schedule_ids: List[str]):
+        """Forget claimed sends once they have been queued for sending."""
+        if not schedule_ids:
+            return
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrem(self.inflight_key, *schedule_ids)
+        pipe.hdel(self.items_key, *schedule_ids)
+        pipe.execute()
+
+    def recover(self, now_ms: int, limit: int) -> int:
+        """Return claims whose lease expired to the due set; returns how many."""
+        recovered = int(self._recover(keys=[self.inflight_key, self.due_key, self.late_key], args=[now_ms, limit]))
+        if recovered:
+            logger.warning(f"Recovered {recovered} scheduled SMS whose dispatch was not acknowledged")
+            SCHEDULED_SMS.labels("recovered").inc(recovered)
+        return recovered
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+_scheduler: Optional[SMSScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_sms_scheduler() -> Optional[SMSScheduler]:
+    """Return the process-wide SMS scheduler, or None when scheduling is disabled."""
+    global _scheduler
+    if not settings.scheduler_enabled:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SMSScheduler(
+                    redis.Redis.from_url(settings.redis_url, socket_timeout=1.0, socket_connect_timeout=1.0)
+                )
+    return _scheduler
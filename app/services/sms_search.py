@@ -0,0 +1,444 @@
+"""Full-text search over stored SMS with a local SQLite FTS5 index.
+
+Messages are added as they are stored (see SMSService.store_sms) through a
+writer thread that commits queued changes in batches, so ingest never waits
+on the index. Searches support words, "quoted phrases" and prefix* terms,
+filtered by number and time range. The index is derived data: it can be
+rebuilt from the SMS table at any time with a parallel scan.
+"""
+import argparse
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.models.search import SMSSearchHit
+from app.utils.helpers import parse_datetime
+from app.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_WRITES = Counter(
+    "skippy_search_index_writes_total",
+    "SMS search index changes by operation (upsert, delete, failed)",
+    ["operation"]
+)
+SEARCH_DURATION = Histogram(
+    "skippy_search_query_duration_seconds",
+    "SMS full-text search query latency",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms (
+    pk INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    from_number TEXT NOT NULL,
+    to_number TEXT NOT NULL,
+    created TEXT NOT NULL,
+    message TEXT NOT NULL,
+    generation INTEGER NOT NULL DEFAULT 0
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS sms_fts USING fts5(
+    message,
+    from_number,
+    to_number,
+    content='sms',
+    content_rowid='pk',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS sms_fts_insert AFTER INSERT ON sms BEGIN
+    INSERT INTO sms_fts (rowid, message, from_number, to_number)
+    VALUES (new.pk, new.message, new.from_number, new.to_number);
+END;
+CREATE TRIGGER IF NOT EXISTS sms_fts_delete AFTER DELETE ON sms BEGIN
+    INSERT INTO sms_fts (sms_fts, rowid, message, from_number, to_number)
+    VALUES ('delete', old.pk, old.message, old.from_number, old.to_number);
+END;
+CREATE TRIGGER IF NOT EXISTS sms_fts_update AFTER UPDATE OF pk, message, from_number, to_number ON sms
+WHEN old.pk != new.pk OR old.message IS NOT new.message
+    OR old.from_number != new.from_number OR old.to_number != new.to_number BEGIN
+    INSERT INTO sms_fts (sms_fts, rowid, message, from_number, to_number)
+    VALUES ('delete', old.pk, old.message, old.from_number, old.to_number);
+    INSERT INTO sms_fts (rowid, message, from_number, to_number)
+    VALUES (new.pk, new.message, new.from_number, new.to_number);
+END;
+CREATE TABLE IF NOT EXISTS index_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+# Rows written while a rebuild runs get its generation, so they are kept
+_UPSERT = """
+INSERT INTO sms (pk, id, from_number, to_number, created, message, generation)
+VALUES (?, ?, ?, ?, ?, ?, COALESCE((SELECT value FROM index_state WHERE key = 'generation'), 0))
+ON CONFLICT (id) DO UPDATE SET
+    pk = excluded.pk,
+    from_number = excluded.from_number,
+    to_number = excluded.to_number,
+    created = excluded.created,
+    message = excluded.message,
+    generation = excluded.generation
+"""
+
+_QUERY_TERM = re.compile(r'"([^"]*)"?|(\S+)')
+_WORD = re.compile(r"\w+")
+
+ORDER_RECENT = "recent"
+ORDER_RELEVANCE = "relevance"
+
+# Row keys are creation time in milliseconds shifted left by this many bits,
+# plus a hash of the ID, so FTS5 returns matches newest first by rowid
+_PK_HASH_BITS = 10
+_PK_HASH_MASK = (1 << _PK_HASH_BITS) - 1
+
+Row = Tuple[int, str, str, str, str, str]
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Normalize to naive UTC ISO format so timestamps compare as strings."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _pk_time(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp() * 1000) << _PK_HASH_BITS
+
+
+def build_match_query(query: str) -> str:
+    """Translate a user query into an FTS5 MATCH expression.
+
+    Words and "quoted phrases" must all match; a word ending in * matches
+    as a prefix. Everything else is quoted, so user input can never be
+    parsed as FTS5 operators. Raises ValueError if nothing searchable is left.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM.findall(query):
+        tokens = _WORD.findall(phrase or word)
+        if not tokens:
+            continue
+        term = '"' + " ".join(tokens) + '"'
+        if word.endswith("*"):
+            term += " *"
+        terms.append(term)
+    if not terms:
+        raise ValueError("Search query has no words")
+    return " AND ".join(terms)
+
+
+def _number_phrase(number: str) -> str:
+    tokens = _WORD.findall(number)
+    if not tokens:
+        raise ValueError(f"Invalid number: {number}")
+    return '"' + " ".join(tokens) + '"'
+
+
+def row_from_item(item: Dict[str, Any]) -> Row:
+    """Build an index row from a stored SMS item."""
+    created = item['created']
+    if not isinstance(created, datetime):
+        created = parse_datetime(created)
+    created = _timestamp(created)
+    pk = _pk_time(datetime.fromisoformat(created)) | (zlib.crc32(item['id'].encode()) & _PK_HASH_MASK)
+    return (
+        pk,
+        item['id'],
+        item['from_number'],
+        item['to_number'],
+        created,
+        item.get('message') or '',
+    )
+
+
+class SMSSearchIndex:
+    """SQLite FTS5 index of SMS messages, shared by the processes of one host.
+
+    SQLite allows one writer at a time; the index runs in WAL mode so
+    searches never wait on writes, and each process funnels its own writes
+    through one thread.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._queue: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # The index can be rebuilt from DynamoDB, so it does not need an fsync per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # Writes
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            with self._writer_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name="sms-search-index", daemon=True)
+                    self._writer.start()
+
+    def add(self, item: Dict[str, Any]):
+        """Queue a stored SMS for indexing (returns immediately)."""
+        self._ensure_writer()
+        self._queue.put(("upsert", row_from_item(item)))
+
+    def remove(self, sms_id: str):
+        """Queue an SMS for removal from the index."""
+        self._ensure_writer()
+        self._queue.put(("delete", sms_id))
+
+    def _write_loop(self):
+        while True:
+            op = self._queue.get()
+            ops = [op]
+            # Commit everything that queued up meanwhile in one transaction
+            while op is not None and len(ops) < self.batch_size:
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                ops.append(op)
+            try:
+                self.apply([op for op in ops if op is not None])
+            except Exception as e:
+                SEARCH_INDEX_WRITES.labels("failed").inc(len(ops))
+                logger.error(f"Writing {len(ops)} changes to the search index failed: {e}")
+            finally:
+                for _ in ops:
+                    self._queue.task_done()
+            if ops[-1] is None:
+                return
+
+    def apply(self, ops: List[Tuple[str, Any]]):
+        """Apply index changes in one transaction."""
+        if not ops:
+            return
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for operation, value in ops:
+                if operation == "upsert":
+                    self._upsert(conn, value)
+                else:
+                    conn.execute("DELETE FROM sms WHERE id = ?", (value,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for operation, _ in ops:
+            SEARCH_INDEX_WRITES.labels(operation).inc()
+
+    def _upsert(self, conn: sqlite3.Connection, row: Row):
+        pk = row[0]
+        for _ in range(_PK_HASH_MASK + 1):
+            try:
+                conn.execute(_UPSERT, (pk,) + row[1:])
+                return
+            except sqlite3.IntegrityError as e:
+                if "sms.pk" not in str(e):
+                    raise
+                # Another message has the same creation millisecond and hash
+                pk += 1
+        raise sqlite3.IntegrityError(f"No free row key for SMS {row[1]}")
+
+    def flush(self):
+        """Wait until every queued change is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write queued changes and stop the writer thread."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
+
+    # Rebuild
+
+    def rebuild(self, table, segments: int = 8, page_size: int = 1000) -> int:
+        """Re-index every SMS in `table` with a parallel scan; returns the number indexed.
+
+        Searches keep working while the rebuild runs. Rows that were not
+        seen by the scan (deleted from the table) are dropped at the end.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO index_state (key, value) VALUES ('generation', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+        generation = conn.execute("SELECT value FROM index_state WHERE key = 'generation'").fetchone()[0]
+        conn.execute("COMMIT")
+
+        with ThreadPoolExecutor(max_workers=segments, thread_name_prefix="sms-search-rebuild") as pool:
+            total = sum(pool.map(
+                lambda segment: self._rebuild_segment(table, segment, segments, page_size),
+                range(segments)
+            ))
+
+        conn.execute("DELETE FROM sms WHERE generation < ?", (generation,))
+        conn.execute("INSERT INTO sms_fts (sms_fts) VALUES ('optimize')")
+        logger.info(f"Rebuilt SMS search index with {total} messages from {segments} scan segments")
+        return total
+
+    def _rebuild_segment(self, table, segment: int, total_segments: int, page_size: int) -> int:
+        kwargs: Dict[str, Any] = {
+            'Segment': segment,
+            'TotalSegments': total_segments,
+            'Limit': page_size,
+            'ProjectionExpression': '#id, #from, #to, #created, #message',
+            'ExpressionAttributeNames': {
+                '#id': 'id', '#from': 'from_number', '#to': 'to_number',
+                '#created': 'created', '#message': 'message',
+            },
+        }
+        count = 0
+        while True:
+            response = table.scan(**kwargs)
+            items = response.get('Items', [])
+            self.apply([("upsert", row_from_item(item)) for item in items])
+            count += len(items)
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return count
+            kwargs['ExclusiveStartKey'] = last_key
+
+    # Queries
+
+    def search(
+        self,
+        query: str,
+        number: Optional[str] = None,
+        from_number: Optional[str] = None,
+        to_number: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        order: str = ORDER_RECENT,
+        limit: int = 50,
+    ) -> List[SMSSearchHit]:
+        """Find messages matching `query`, newest (or most relevant) first.
+
+        `number` matches either side of the conversation; `from_number` and
+        `to_number` match one side. Raises ValueError for an empty query.
+        """
+        # Numbers are indexed too, so FTS5 intersects a customer's few
+        # messages with the matches instead of the database filtering them
+        match = [f"message : ({build_match_query(query)})"]
+        sql = [
+            "SELECT s.id, s.from_number, s.to_number, s.created, s.message,",
+            "snippet(sms_fts, 0, '[', ']', '…', 16)",
+            "FROM sms_fts CROSS JOIN sms s ON s.pk = sms_fts.rowid",
+            "WHERE sms_fts MATCH ?",
+        ]
+        params: List[Any] = [None]
+        if number:
+            match.append(f"{{from_number to_number}} : {_number_phrase(number)}")
+            sql.append("AND (s.from_number = ? OR s.to_number = ?)")
+            params += [number, number]
+        if from_number:
+            match.append(f"from_number : {_number_phrase(from_number)}")
+            sql.append("AND s.from_number = ?")
+            params.append(from_number)
+        if to_number:
+            match.append(f"to_number : {_number_phrase(to_number)}")
+            sql.append("AND s.to_number = ?")
+            params.append(to_number)
+        params[0] = " AND ".join(match)
+        # Row keys start with the creation time, so time ranges are rowid ranges
+        if start:
+            sql.append("AND sms_fts.rowid >= ? AND s.created >= ?")
+            params += [_pk_time(datetime.fromisoformat(_timestamp(start))), _timestamp(start)]
+        if end:
+            sql.append("AND sms_fts.rowid <= ? AND s.created <= ?")
+            params += [_pk_time(datetime.fromisoformat(_timestamp(end))) | _PK_HASH_MASK, _timestamp(end)]
+        # Matches come out of FTS5 in rowid order, so newest-first stops at the limit
+        sql.append("ORDER BY sms_fts.rank" if order == ORDER_RELEVANCE else "ORDER BY sms_fts.rowid DESC")
+        sql.append("LIMIT ?")
+        params.append(limit)
+
+        with SEARCH_DURATION.time():
+            rows = self._connection().execute(" ".join(sql), params).fetchall()
+        return [
+            SMSSearchHit(
+                id=row[0], from_number=row[1], to_number=row[2],
+                created=datetime.fromisoformat(row[3]), message=row[4], snippet=row[5]
+            )
+            for row in rows
+        ]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM sms").fetchone()[0]
+
+
+_index: Optional[SMSSearchIndex] = None
+_index_pid: Optional[int] = None
+_index_lock = threading.Lock()
+
+
+def get_sms_search_index() -> Optional[SMSSearchIndex]:
+    """Return this process's handle on the search index, or None when search is disabled."""
+    global _index, _index_pid
+    if not settings.sms_search_enabled:
+        return None
+    if _index is None or _index_pid != os.getpid():
+        with _index_lock:
+            if _index is None or _index_pid != os.getpid():
+                _index = SMSSearchIndex(
+                    settings.sms_search_index_path,
+                    batch_size=settings.sms_search_batch_size
+                )
+                _index_pid = os.getpid()
+    return _index
+
+
+def close_sms_search_index():
+    """Write queued index changes, if this process has opened the index."""
+    if _index is not None and _index_pid == os.getpid():
+        _index.close()
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    """Rebuild the search index from the SMS table."""
+    from app.services.sms_service import SMSService
+
+    parser = argparse.ArgumentParser(description="Rebuild the SMS full-text search index from DynamoDB")
+    parser.add_argument("--segments", type=int, default=settings.sms_search_rebuild_segments,
+                        help="Parallel scan segments")
+    parser.add_argument("--path", default=settings.sms_search_index_path)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sms_service = SMSService()
+    table = sms_service.db_service.dynamodb.Table(sms_service.sms_table_name)
+    index = SMSSearchIndex(args.path, batch_size=settings.sms_search_batch_size)
+    total = index.rebuild(table, segments=args.segments)
+    print(f"Indexed {total} messages into {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,61 @@
+import asyncio
+import logging
 import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from app.services.dynamodb_service import DynamoDBService
-from app.models.sms import SMSWebhook, SMSResponse, SMSReply
+from typing import List, NamedTuple, Optional, Dict, Any, Tuple
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from app.config import settings
+from app.services.dynamodb_service import DynamoDBService, is_unavailable_error
+from app.services.ingest_spool import get_ingest_spool
+from app.models.sms import SMSWebhook, SMSResponse, SMSReply, SMSRecord, StoredReply
+from app.models.reply_rule import ReplyRule
+from app.services.reply_rules import get_reply_rule_engine
+from app.services.sms_search import SEARCH_INDEX_WRITES, get_sms_search_index
+from app.services.traffic_stats import get_traffic_stats
+from app.utils.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Stored SMS items carry a version that every update increments, so a copy
+# of the message (e.g. in a task payload) can be checked against the table
+INITIAL_VERSION = 1
+
+# Outcomes of recording a reply
+RECORDED = "recorded"
+DUPLICATE = "duplicate"  # A reply with the same ID is already stored
+STALE = "stale"  # The SMS is no longer at the expected version
+MISSING = "missing"  # The SMS does not exist
+
+# TransactWriteItems takes at most 100 actions, and each reply needs two
+MAX_REPLIES_PER_TRANSACTION = 50
+
+_serializer = TypeSerializer()
+
+# Shared by all SMSService instances: once SMS writes keep failing, new
+# messages go straight to the local spool instead of waiting on DynamoDB
+_store_breaker = CircuitBreaker(
+    failure_threshold=settings.spool_failure_threshold,
+    reset_timeout=settings.spool_fallback_timeout
+)
+
+
+class StaleSMSError(Exception):
+    """Raised when a stored SMS no longer has the version a caller expected."""
+
+
+class NewReply(NamedTuple):
+    """A reply to record for an SMS.
+    
+    `reply_id` makes recording idempotent (e.g. the schedule or task ID, so a
+    retry does not store the reply twice); with `expected_version` the reply
+    is only recorded if the SMS is still at that version.
+    """
+    sms_id: str
+    message: str
+    to_number: Optional[str] = None
+    reply_id: Optional[str] = None
+    expected_version: Optional[int] = None
 
 
 class SMSService:
@@ -11,10 +64,12 @@ class SMSService:
     def __init__(self):
         self.db_service = DynamoDBService()
         self.sms_table_name = "skippy_sms"
+        self.replies_table_name = settings.sms_replies_table_name
     
     async def initialize(self):
-        """Initialize the service (create table if needed)."""
+        """Initialize the service (create tables if needed)."""
         await self._create_sms_table_if_not_exists()
+        await self._create_replies_table_if_not_exists()
     
     async def _create_sms_table_if_not_exists(self):
         """Create the SMS DynamoDB table if it doesn't exist."""
@@ -46,6 +101,29 @@ class SMSService:
                     TableName=self.sms_table_name
                 )
     
+    async def _create_replies_table_if_not_exists(self):
+        """Create the replies table (one partition per SMS) if it doesn't exist."""
+        try:
+            self.db_service.dynamodb.Table(self.replies_table_name).load()
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            self.db_service.dynamodb.create_table(
+                TableName=self.replies_table_name,
+                KeySchema=[
+                    {'AttributeName': 'sms_id', 'KeyType': 'HASH'},
+                    {'AttributeName': 'id', 'KeyType': 'RANGE'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'sms_id', 'AttributeType': 'S'},
+                    {'AttributeName': 'id', 'AttributeType': 'S'}
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            self.db_service.dynamodb.meta.client.get_waiter('table_exists').wait(
+                TableName=self.replies_table_name
+            )
+    
     async def store_sms(self, sms_webhook: SMSWebhook) -> SMSResponse:
         """Store an incoming SMS in DynamoDB."""
         # Parse the created timestamp
@@ -61,14 +139,58 @@ class SMSService:
             'processed': False,
             'processed_at': None,
             'reply_sent': False,
-            'reply_message': None
+            'reply_message': None,
+            'version': INITIAL_VERSION
         }
         
-        # Store in DynamoDB
-        table = self.db_service.dynamodb.Table(self.sms_table_name)
-        table.put_item(Item=sms_data)
+        # Store in DynamoDB, falling back to the local spool while it is unavailable
+        spool = get_ingest_spool()
+        if spool is not None and not _store_breaker.allow():
+            await self._spool_sms(spool, sms_data)
+        else:
+            table = self.db_service.dynamodb.Table(self.sms_table_name)
+            try:
+                table.put_item(Item=sms_data)
+                _store_breaker.record_success()
+            except Exception as e:
+                if spool is None or not is_unavailable_error(e):
+                    raise
+                _store_breaker.record_failure()
+                logger.warning(f"Storing SMS {sms_webhook.id} failed, spooling locally: {e}")
+                await self._spool_sms(spool, sms_data)
         
-        return SMSResponse(**sms_data)
+        # The index is derived data: never fail an SMS that is already stored
+        try:
+            search_index = get_sms_search_index()
+            if search_index is not None:
+                search_index.add(sms_data)
+        except Exception as e:
+            SEARCH_INDEX_WRITES.labels("failed").inc()
+            logger.error(f"Indexing SMS {sms_webhook.id} for search failed: {e}")
+        
+        stats = get_traffic_stats()
+        if stats is not None:
+            stats.record_received(sms_webhook.to_number, sms_webhook.from_number, created_dt)
+        
+        return SMSResponse.from_item(sms_data)
+    
+    async def _spool_sms(self, spool, sms_data: Dict[str, Any]):
+        # Off the event loop so concurrent requests can share one fsync
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, spool.append, sms_data)
+    
+    async def replay_spooled_sms(self, sms_data: Dict[str, Any]) -> bool:
+        """Write a spooled SMS; returns False if it is already stored."""
+        table = self.db_service.dynamodb.Table(self.sms_table_name)
+        try:
+            # Never overwrite a message that reached DynamoDB after all (and may be processed)
+            table.put_item(Item=sms_data, ConditionExpression='attribute_not_exists(id)')
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        _store_breaker.record_success()
+        return True
     
     async def get_sms(self, sms_id: str) -> Optional[SMSResponse]:
         """Get an SMS by ID."""
@@ -77,7 +199,7 @@ class SMSService:
             response = table.get_item(Key={'id': sms_id})
             item = response.get('Item')
             if item:
-                return SMSResponse(**item)
+                return SMSResponse.from_item(item)
             return None
         except Exception:
             return None
@@ -88,63 +210,223 @@ class SMSService:
             table = self.db_service.dynamodb.Table(self.sms_table_name)
             response = table.scan(Limit=limit)
             items = response.get('Items', [])
-            return [SMSResponse(**item) for item in items]
+            return [SMSResponse.from_item(item) for item in items]
         except Exception:
             return []
     
-    async def mark_sms_processed(self, sms_id: str) -> Optional[SMSResponse]:
-        """Mark an SMS as processed."""
+    async def list_sms_records(self, limit: int = 1000) -> List[SMSRecord]:
+        """List SMS messages as compact records for bulk processing."""
         try:
             table = self.db_service.dynamodb.Table(self.sms_table_name)
-            response = table.update_item(
-                Key={'id': sms_id},
-                UpdateExpression="SET processed = :processed, processed_at = :processed_at",
-                ExpressionAttributeValues={
-                    ':processed': True,
-                    ':processed_at': datetime.utcnow().isoformat()
-                },
-                ReturnValues="ALL_NEW"
-            )
-            return SMSResponse(**response.get('Attributes'))
+            response = table.scan(Limit=limit)
+            return [SMSRecord.from_item(item) for item in response.get('Items', [])]
         except Exception:
-            return None
+            return []
     
-    async def mark_reply_sent(self, sms_id: str, reply_message: str) -> Optional[SMSResponse]:
-        """Mark that a reply was sent for an SMS."""
+    async def mark_sms_processed(
+        self,
+        sms_id: str,
+        expected_version: Optional[int] = None,
+        reply_rule: Optional[str] = None,
+        selected_reply: Optional[str] = None
+    ) -> Optional[SMSResponse]:
+        """Mark an SMS as processed, with the reply rule and reply selected for it.
+        
+        With `expected_version` the update only applies if the stored SMS is
+        still at that version, and StaleSMSError is raised otherwise; other
+        errors are raised too, so the caller retries instead of going on with
+        an SMS that was never marked. Without it failures return None.
+        """
         try:
             table = self.db_service.dynamodb.Table(self.sms_table_name)
+            kwargs: Dict[str, Any] = {}
+            values: Dict[str, Any] = {
+                ':processed': True,
+                ':processed_at': datetime.utcnow().isoformat(),
+                ':one': 1
+            }
+            assignments = ['processed = :processed', 'processed_at = :processed_at']
+            if reply_rule is not None:
+                assignments.append('reply_rule = :reply_rule')
+                values[':reply_rule'] = reply_rule
+            if selected_reply is not None:
+                assignments.append('selected_reply = :selected_reply')
+                values[':selected_reply'] = selected_reply
+            if expected_version is not None:
+                kwargs['ConditionExpression'] = 'version = :expected_version'
+                values[':expected_version'] = expected_version
             response = table.update_item(
                 Key={'id': sms_id},
-                UpdateExpression="SET reply_sent = :reply_sent, reply_message = :reply_message",
-                ExpressionAttributeValues={
-                    ':reply_sent': True,
-                    ':reply_message': reply_message
-                },
-                ReturnValues="ALL_NEW"
+                UpdateExpression='SET ' + ', '.join(assignments) + ' ADD version :one',
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW",
+                **kwargs
             )
-            return SMSResponse(**response.get('Attributes'))
+            return SMSResponse.from_item(response.get('Attributes'))
+        except ClientError as e:
+            if expected_version is None:
+                return None
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise StaleSMSError(f"SMS {sms_id} changed since version {expected_version}") from e
+            raise
         except Exception:
+            if expected_version is None:
+                return None
+            raise
+    
+    async def mark_reply_sent(
+        self,
+        sms_id: str,
+        reply_message: str,
+        to_number: Optional[str] = None,
+        reply_id: Optional[str] = None,
+        expected_version: Optional[int] = None
+    ) -> Optional[str]:
+        """Record a reply sent for an SMS; returns the outcome, or None if the write failed.
+        
+        Raises StaleSMSError if `expected_version` is given and the stored SMS
+        is no longer at that version.
+        """
+        try:
+            outcome = (await self.record_replies(
+                [NewReply(sms_id, reply_message, to_number, reply_id, expected_version)]
+            ))[0]
+        except Exception as e:
+            logger.error(f"Recording reply to SMS {sms_id} failed: {e}")
             return None
+        if outcome == STALE:
+            raise StaleSMSError(f"SMS {sms_id} changed since version {expected_version}")
+        return outcome
+    
+    async def record_replies(self, replies: List[NewReply]) -> List[str]:
+        """Store replies as their own items, each with its SMS's reply state, in transactions.
+        
+        Each reply is a Put to the replies table plus an Update of the SMS
+        (reply_sent, reply_message and version), and up to
+        MAX_REPLIES_PER_TRANSACTION replies share one TransactWriteItems call.
+        Returns an outcome per reply (RECORDED, DUPLICATE, STALE or MISSING).
+        When a condition fails the whole transaction is cancelled, so the
+        other replies in it are written again without the failed ones.
+        """
+        created = datetime.utcnow().isoformat()
+        actions = [self._reply_actions(reply, created) for reply in replies]
+        outcomes: List[Optional[str]] = [None] * len(replies)
+        pending = list(range(len(replies)))
+        client = self.db_service.dynamodb.meta.client
+        while pending:
+            # A transaction may touch each item only once, so a second reply
+            # to the same SMS waits for the next transaction
+            group, later, sms_ids = [], [], set()
+            for i in pending:
+                if len(group) < MAX_REPLIES_PER_TRANSACTION and replies[i].sms_id not in sms_ids:
+                    group.append(i)
+                    sms_ids.add(replies[i].sms_id)
+                else:
+                    later.append(i)
+            try:
+                client.transact_write_items(
+                    TransactItems=[action for i in group for action in actions[i]]
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                failed = self._failed_replies(group, replies, e.response.get('CancellationReasons') or [])
+                if not failed:
+                    # Cancelled for another reason (conflict, throttling): nothing to drop
+                    raise
+                for i, outcome in failed.items():
+                    outcomes[i] = outcome
+                later = [i for i in group if i not in failed] + later
+            else:
+                for i in group:
+                    outcomes[i] = RECORDED
+            pending = later
+        return outcomes
+    
+    def _reply_actions(self, reply: NewReply, created: str) -> List[Dict[str, Any]]:
+        """Build the Put of the reply and the Update of its SMS."""
+        item = {
+            'sms_id': reply.sms_id,
+            'id': reply.reply_id or uuid.uuid4().hex,
+            'message': reply.message,
+            'created': created
+        }
+        if reply.to_number:
+            item['to_number'] = reply.to_number
+        values: Dict[str, Any] = {':reply_sent': True, ':reply_message': reply.message, ':one': 1}
+        if reply.expected_version is not None:
+            condition = 'version = :expected_version'
+            values[':expected_version'] = reply.expected_version
+        else:
+            condition = 'attribute_exists(id)'
+        return [
+            {'Put': {
+                'TableName': self.replies_table_name,
+                'Item': {name: _serializer.serialize(value) for name, value in item.items()},
+                'ConditionExpression': 'attribute_not_exists(id)'
+            }},
+            {'Update': {
+                'TableName': self.sms_table_name,
+                'Key': {'id': {'S': reply.sms_id}},
+                'UpdateExpression': 'SET reply_sent = :reply_sent, reply_message = :reply_message ADD version :one',
+                'ConditionExpression': condition,
+                'ExpressionAttributeValues': {name: _serializer.serialize(value) for name, value in values.items()},
+                # Tells a changed SMS from a missing one without reading it
+                'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+            }}
+        ]
+    
+    @staticmethod
+    def _failed_replies(group: List[int], replies: List[NewReply], reasons: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Map the replies whose conditions failed to their outcome."""
+        failed = {}
+        for position, i in enumerate(group):
+            put, update = reasons[2 * position:2 * position + 2] or [{}, {}]
+            if put.get('Code') == 'ConditionalCheckFailed':
+                failed[i] = DUPLICATE
+            elif update.get('Code') == 'ConditionalCheckFailed':
+                failed[i] = STALE if update.get('Item') else MISSING
+        return failed
+    
+    async def list_replies(self, sms_id: str) -> List[StoredReply]:
+        """Get the replies recorded for an SMS, oldest first."""
+        table = self.db_service.dynamodb.Table(self.replies_table_name)
+        items: List[Dict[str, Any]] = []
+        kwargs: Dict[str, Any] = {
+            'KeyConditionExpression': 'sms_id = :sms_id',
+            'ExpressionAttributeValues': {':sms_id': sms_id},
+        }
+        while True:
+            response = table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+        replies = [StoredReply.model_validate(item) for item in items]
+        replies.sort(key=lambda reply: reply.created)
+        return replies
     
     async def delete_sms(self, sms_id: str) -> bool:
         """Delete an SMS."""
         try:
             table = self.db_service.dynamodb.Table(self.sms_table_name)
             table.delete_item(Key={'id': sms_id})
-            return True
         except Exception:
             return False
+        try:
+            search_index = get_sms_search_index()
+            if search_index is not None:
+                search_index.remove(sms_id)
+        except Exception as e:
+            SEARCH_INDEX_WRITES.labels("failed").inc()
+            logger.error(f"Removing SMS {sms_id} from the search index failed: {e}")
+        return True
     
     def generate_reply_message(self, original_message: str) -> str:
         """Generate an automatic reply message based on the original SMS."""
-        # Simple auto-reply logic - you can customize this
-        message_lower = original_message.lower()
-        
-        if "hello" in message_lower or "hi" in message_lower:
-            return "Hello! Thanks for your message. We'll get back to you soon."
-        elif "help" in message_lower:
-            return "Need help? Contact our support team at support@example.com"
-        elif "status" in message_lower:
-            return "Your request is being processed. We'll update you shortly."
-        else:
-            return "Thank you for your message. We've received it and will respond shortly."
+        return get_reply_rule_engine().reply_for(original_message)
+    
+    def select_reply(self, original_message: str) -> Tuple[str, Optional[ReplyRule]]:
+        """Return the automatic reply message and the rule that matched (None for the default)."""
+        return get_reply_rule_engine().select(original_message)
@@ -0,0 +1,303 @@
+"""Incrementally maintained SMS traffic rollups.
+
+Ingest and processing add to in-memory counters keyed by scope (all
+traffic, a receiving number or a sender) and hourly/daily bucket. A
+background thread flushes them every `flush_interval` seconds as atomic
+ADD updates, so counters from every API and worker process sum up in one
+item per scope and bucket. Dashboards read O(buckets) items instead of
+scanning the SMS table.
+"""
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.config import settings
+from app.models.traffic_stats import TrafficBucket
+from app.services.dynamodb_service import DynamoDBService
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_STATS_WRITES = Counter(
+    "skippy_traffic_stats_writes_total",
+    "Traffic rollup updates by outcome",
+    ["outcome"]
+)
+
+HOUR = "hour"
+DAY = "day"
+ALL_SCOPE = "all"
+
+# Upper bounds (seconds) of the processing lag buckets
+LAG_BUCKETS = (1, 10, 60, 300)
+
+# Longest range one query may cover
+MAX_RANGE = {HOUR: timedelta(days=31), DAY: timedelta(days=366)}
+
+_COUNTERS = ("received", "processed", "replied", "reply_coalesced", "reply_suppressed")
+_BUCKET_FORMATS = {HOUR: "%Y-%m-%dT%H", DAY: "%Y-%m-%d"}
+_REPLY_COUNTERS = {"send": "replied", "coalesce": "reply_coalesced", "skip": "reply_suppressed"}
+
+
+def _utc(value: Optional[datetime]) -> datetime:
+    if value is None:
+        return datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_key(granularity: str, when: datetime) -> str:
+    """Sort key of the bucket containing `when`, e.g. 'hour#2024-05-01T13'."""
+    return f"{granularity}#{_utc(when).strftime(_BUCKET_FORMATS[granularity])}"
+
+
+def lag_counter(seconds: float) -> str:
+    """Name of the lag bucket counter for a processing lag."""
+    for bound in LAG_BUCKETS:
+        if seconds <= bound:
+            return f"lag_le_{bound}"
+    return f"lag_gt_{LAG_BUCKETS[-1]}"
+
+
+def _bucket_from_item(item: Dict[str, Any]) -> TrafficBucket:
+    granularity, _, start = item['bucket'].partition('#')
+    counts = {name: int(item.get(name, 0)) for name in _COUNTERS}
+    lags = {
+        name[len("lag_"):]: int(value)
+        for name, value in item.items()
+        if name.startswith(("lag_le_", "lag_gt_"))
+    }
+    processed = counts["processed"]
+    return TrafficBucket(
+        scope=item['scope'],
+        granularity=granularity,
+        start=datetime.strptime(start, _BUCKET_FORMATS[granularity]),
+        processing_lag=lags,
+        reply_rate=(counts["replied"] + counts["reply_coalesced"]) / processed if processed else None,
+        avg_processing_lag=int(item.get('lag_ms', 0)) / 1000 / processed if processed else None,
+        **counts
+    )
+
+
+class TrafficStats:
+    """Aggregate traffic counters in memory and flush them as atomic ADD updates."""
+
+    def __init__(
+        self,
+        table_name: str,
+        flush_interval: float = 10.0,
+        per_sender: bool = False,
+        db_service: Optional[DynamoDBService] = None,
+    ):
+        self.table_name = table_name
+        self.flush_interval = flush_interval
+        self.per_sender = per_sender
+        self._db_service = db_service
+        self._pending: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def db_service(self) -> DynamoDBService:
+        if self._db_service is None:
+            self._db_service = DynamoDBService()
+        return self._db_service
+
+    @property
+    def table(self):
+        return self.db_service.dynamodb.Table(self.table_name)
+
+    async def initialize(self):
+        """Create the rollup table (scope + bucket key) if it doesn't exist."""
+        try:
+            self.table.load()
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            self.db_service.dynamodb.create_table(
+                TableName=self.table_name,
+                KeySchema=[
+                    {'AttributeName': 'scope', 'KeyType': 'HASH'},
+                    {'AttributeName': 'bucket', 'KeyType': 'RANGE'},
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'scope', 'AttributeType': 'S'},
+                    {'AttributeName': 'bucket', 'AttributeType': 'S'},
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            self.db_service.dynamodb.meta.client.get_waiter('table_exists').wait(
+                TableName=self.table_name
+            )
+
+    def _scopes(self, to_number: str, from_number: str) -> List[str]:
+        scopes = [ALL_SCOPE, f"to:{to_number}"]
+        if self.per_sender:
+            scopes.append(f"from:{from_number}")
+        return scopes
+
+    def _add(self, scopes: List[str], when: datetime, counts: Dict[str, int]):
+        buckets = [bucket_key(HOUR, when), bucket_key(DAY, when)]
+        with self._lock:
+            for scope in scopes:
+                for bucket in buckets:
+                    pending = self._pending[(scope, bucket)]
+                    for name, value in counts.items():
+                        pending[name] += value
+
+    def record_received(self, to_number: str, from_number: str, created: Optional[datetime] = None):
+        """Count a stored incoming SMS in the buckets of its creation time."""
+        self._add(self._scopes(to_number, from_number), created, {"received": 1})
+
+    def record_processed(
+        self,
+        to_number: str,
+        from_number: str,
+        created: Optional[datetime],
+        reply_decision: Optional[str] = None,
+        processed_at: Optional[datetime] = None,
+    ):
+        """Count a processed SMS, its processing lag and what happened to its reply."""
+        lag = max((_utc(processed_at) - _utc(created)).total_seconds(), 0.0)
+        counts = {"processed": 1, "lag_ms": int(lag * 1000), lag_counter(lag): 1}
+        if reply_decision in _REPLY_COUNTERS:
+            counts[_REPLY_COUNTERS[reply_decision]] = 1
+        self._add(self._scopes(to_number, from_number), created, counts)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write pending counters; returns the number of items updated."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+            written = 0
+            table = self.table if batch else None
+            for (scope, bucket), counts in batch.items():
+                names = {f"#c{i}": name for i, name in enumerate(counts)}
+                try:
+                    table.update_item(
+                        Key={'scope': scope, 'bucket': bucket},
+                        UpdateExpression='ADD ' + ', '.join(f"#c{i} :c{i}" for i in range(len(counts))),
+                        ExpressionAttributeNames=names,
+                        ExpressionAttributeValues={f":c{i}": value for i, value in enumerate(counts.values())}
+                    )
+                    written += 1
+                    TRAFFIC_STATS_WRITES.labels("written").inc()
+                except Exception as e:
+                    TRAFFIC_STATS_WRITES.labels("failed").inc()
+                    logger.warning(f"Flushing traffic stats for {scope} {bucket} failed: {e}")
+                    # Keep the counts for the next flush
+                    with self._lock:
+                        pending = self._pending[(scope, bucket)]
+                        for name, value in counts.items():
+                            pending[name] += value
+            return written
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Traffic stats flush failed: {e}")
+
+    def start(self):
+        """Start flushing in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="traffic-stats", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write what is still pending."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    async def query(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        scope: str = ALL_SCOPE,
+    ) -> List[TrafficBucket]:
+        """Read the rollups of one scope between two times (inclusive), oldest first.
+
+        Buckets without traffic have no item and are left out.
+        """
+        kwargs: Dict[str, Any] = {
+            'KeyConditionExpression': '#scope = :scope AND #bucket BETWEEN :start AND :end',
+            'ExpressionAttributeNames': {'#scope': 'scope', '#bucket': 'bucket'},
+            'ExpressionAttributeValues': {
+                ':scope': scope,
+                ':start': bucket_key(granularity, start),
+                ':end': bucket_key(granularity, end),
+            },
+        }
+        items: List[Dict[str, Any]] = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+        return [_bucket_from_item(item) for item in items]
+
+
+_stats: Optional[TrafficStats] = None
+_stats_pid: Optional[int] = None
+_stats_lock = threading.Lock()
+
+
+def get_traffic_stats() -> Optional[TrafficStats]:
+    """Return this process's traffic aggregator, or None when disabled.
+
+    The flusher thread is started on first use. A forked child (e.g. a
+    prefork Celery worker) gets its own aggregator so counts recorded in
+    the parent before the fork are not flushed twice.
+    """
+    global _stats, _stats_pid
+    if not settings.traffic_stats_enabled:
+        return None
+    if _stats is None or _stats_pid != os.getpid():
+        with _stats_lock:
+            if _stats is None or _stats_pid != os.getpid():
+                _stats = TrafficStats(
+                    settings.traffic_stats_table_name,
+                    flush_interval=settings.traffic_stats_flush_interval,
+                    per_sender=settings.traffic_stats_per_sender
+                )
+                _stats.start()
+                _stats_pid = os.getpid()
+    return _stats
+
+
+def stop_traffic_stats():
+    """Write the counters of this process's aggregator, if this process has started one."""
+    if _stats is not None and _stats_pid == os.getpid():
+        _stats.stop()
+
+
+def query_range(
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[datetime, datetime]:
+    """Normalize a query window to naive UTC; defaults to the last 24 hours or 30 days."""
+    end = _utc(end)
+    if start is None:
+        return end - (timedelta(hours=23) if granularity == HOUR else timedelta(days=29)), end
+    return _utc(start), end
@@ -0,0 +1,315 @@
+"""Outbound webhook fan-out: subscription registry and delivery engine.
+
+Events are POSTed to subscribed URLs through one shared async HTTP pool per
+process. Each subscriber has its own concurrency limit and circuit breaker,
+subscribers that accept arrays get batched deliveries, and every request is
+signed with the subscriber's secret (see sign_webhook_payload).
+"""
+import asyncio
+import logging
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+import orjson
+
+from app.config import settings
+from app.models.subscription import Subscription, SubscriptionCreate
+from app.services.dynamodb_service import DynamoDBService
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.helpers import LoopLocal, sign_webhook_payload
+from app.utils.metrics import Counter, Histogram
+from app.utils.tracing import start_span, KIND_CLIENT
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_ATTEMPTS = Counter(
+    "skippy_webhook_delivery_attempts_total",
+    "Outbound webhook delivery attempts by outcome",
+    ["outcome"]
+)
+DELIVERY_DURATION = Histogram(
+    "skippy_webhook_delivery_duration_seconds",
+    "Outbound webhook request latency"
+)
+
+SIGNATURE_HEADER = "X-Skippy-Signature"
+USER_AGENT = "Skippy-Webhooks/1.0"
+
+
+def make_event(event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap a stored record as an outbound event."""
+    return {
+        "id": data["id"],
+        "type": event_type,
+        "created_at": datetime.utcnow().isoformat(),
+        "data": data,
+    }
+
+
+class SubscriptionRegistry:
+    """Subscribers stored in DynamoDB, cached in-process and refreshed periodically."""
+
+    def __init__(self, table_name: str, reload_interval: float = 30.0, db_service: Optional[DynamoDBService] = None):
+        self.table_name = table_name
+        self.reload_interval = reload_interval
+        self._db_service = db_service
+        self._subscriptions: Optional[List[Subscription]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def db_service(self) -> DynamoDBService:
+        if self._db_service is None:
+            self._db_service = DynamoDBService()
+        return self._db_service
+
+    @property
+    def table(self):
+        return self.db_service.dynamodb.Table(self.table_name)
+
+    async def initialize(self):
+        """Create the subscriptions table if needed."""
+        await self.db_service.create_table_if_not_exists(self.table_name)
+
+    def _load(self) -> List[Subscription]:
+        items: List[Dict[str, Any]] = []
+        kwargs: Dict[str, Any] = {}
+        while True:
+            response = self.table.scan(**kwargs)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+        return [Subscription.model_validate(item) for item in items]
+
+    def subscriptions(self) -> List[Subscription]:
+        """Return the cached subscribers, reloading them when the cache is stale."""
+        if self._subscriptions is None or time.monotonic() - self._loaded_at >= self.reload_interval:
+            with self._lock:
+                if self._subscriptions is None or time.monotonic() - self._loaded_at >= self.reload_interval:
+                    try:
+                        self._subscriptions = self._load()
+                    except Exception as e:
+                        # Keep delivering to the last known subscribers
+                        logger.error(f"Failed to load webhook subscriptions: {e}")
+                        if self._subscriptions is None:
+                            self._subscriptions = []
+                    self._loaded_at = time.monotonic()
+        return self._subscriptions
+
+    def matching(self, event_type: str) -> List[Subscription]:
+        """Return the enabled subscribers for an event type."""
+        return [subscription for subscription in self.subscriptions() if subscription.accepts(event_type)]
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+    async def create(self, subscription: SubscriptionCreate) -> Subscription:
+        """Register a subscriber; a signing secret is generated if none is given."""
+        created = Subscription(
+            id=str(uuid.uuid4()),
+            url=str(subscription.url),
+            event_types=subscription.event_types,
+            secret=subscription.secret or secrets.token_urlsafe(32),
+            batch=subscription.batch,
+            max_batch_size=subscription.max_batch_size,
+            max_concurrency=subscription.max_concurrency,
+            created_at=datetime.utcnow()
+        )
+        item = created.model_dump()
+        item['created_at'] = created.created_at.isoformat()
+        self.table.put_item(Item=item)
+        self.invalidate()
+        return created
+
+    async def list(self) -> List[Subscription]:
+        """List all subscribers (read through, not cached)."""
+        return self._load()
+
+    async def delete(self, subscription_id: str) -> bool:
+        """Remove a subscriber."""
+        response = self.table.delete_item(Key={'id': subscription_id}, ReturnValues="ALL_OLD")
+        self.invalidate()
+        return 'Attributes' in response
+
+
+class DeliveryResult(NamedTuple):
+    """Outcome of delivering a group of events to one subscriber."""
+    subscription_id: str
+    event_ids: List[str]
+    delivered: bool
+    retryable: bool
+    detail: str
+
+
+class _LoopPool(NamedTuple):
+    """The HTTP pool and per-subscriber semaphores of one event loop."""
+    client: httpx.AsyncClient
+    limits: Dict[str, asyncio.Semaphore]
+
+
+class WebhookDeliveryEngine:
+    """Deliver events to subscribers over a shared async HTTP pool.
+
+    A delivery that fails with a network error, 429 or 5xx is retried
+    `retries` times with exponential back-off and then reported as
+    retryable, so the caller can re-queue it. Other 4xx responses are
+    permanent failures. Consecutive failures open the subscriber's circuit,
+    after which deliveries are reported as retryable without being sent.
+    Circuits are shared by the whole process; the HTTP pool and concurrency
+    limits are kept per event loop, so threads running their own loops never
+    share them.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        max_connections: int = 100,
+        retries: int = 2,
+        backoff: float = 0.5,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # The HTTP pool and semaphores belong to the event loop that created them
+        self._pools = LoopLocal(self._new_pool)
+
+    def _new_pool(self) -> _LoopPool:
+        client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            headers={"User-Agent": USER_AGENT}
+        )
+        return _LoopPool(client, {})
+
+    def breaker(self, subscription: Subscription) -> CircuitBreaker:
+        breaker = self._breakers.get(subscription.id)
+        if breaker is None:
+            breaker = self._breakers[subscription.id] = CircuitBreaker(
+                self.breaker_threshold, self.breaker_reset
+            )
+        return breaker
+
+    @staticmethod
+    def _limit(pool: _LoopPool, subscription: Subscription) -> asyncio.Semaphore:
+        limit = pool.limits.get(subscription.id)
+        if limit is None:
+            limit = pool.limits[subscription.id] = asyncio.Semaphore(subscription.max_concurrency)
+        return limit
+
+    async def deliver(self, events: List[Dict[str, Any]], subscriptions: List[Subscription]) -> List[DeliveryResult]:
+        """Deliver events to every subscriber that accepts them."""
+        pool = self._pools.get()
+        deliveries = []
+        for subscription in subscriptions:
+            accepted = [event for event in events if subscription.accepts(event["type"])]
+            if subscription.batch:
+                size = subscription.max_batch_size
+                groups = [accepted[i:i + size] for i in range(0, len(accepted), size)]
+            else:
+                groups = [[event] for event in accepted]
+            deliveries.extend(self._deliver_group(pool, subscription, group) for group in groups)
+        return list(await asyncio.gather(*deliveries))
+
+    async def _deliver_group(self, pool: _LoopPool, subscription: Subscription,
+                             events: List[Dict[str, Any]]) -> DeliveryResult:
+        event_ids = [event["id"] for event in events]
+        body = orjson.dumps(events if subscription.batch else events[0])
+        breaker = self.breaker(subscription)
+        detail = ""
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+
+            headers = {
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: sign_webhook_payload(body, subscription.secret),
+                "X-Skippy-Delivery": str(uuid.uuid4()),
+                "X-Skippy-Event-Type": events[0]["type"] if len(events) == 1 else "batch",
+            }
+            span = start_span(
+                "webhook.deliver",
+                kind=KIND_CLIENT,
+                attributes={"subscription.id": subscription.id, "webhook.events": len(events)}
+            )
+            async with self._limit(pool, subscription):
+                # Checked after waiting for a slot: earlier requests may have opened the circuit
+                if not breaker.allow():
+                    DELIVERY_ATTEMPTS.labels("circuit_open").inc()
+                    return DeliveryResult(subscription.id, event_ids, False, True, "circuit open")
+                start = time.perf_counter()
+                try:
+                    with span:
+                        response = await pool.client.post(subscription.url, content=body, headers=headers)
+                        span.set_attribute("http.status_code", response.status_code)
+                except httpx.HTTPError as e:
+                    breaker.record_failure()
+                    DELIVERY_ATTEMPTS.labels("error").inc()
+                    detail = f"{type(e).__name__}: {e}"
+                    continue
+                finally:
+                    DELIVERY_DURATION.observe(time.perf_counter() - start)
+
+            if response.status_code < 300:
+                breaker.record_success()
+                DELIVERY_ATTEMPTS.labels("delivered").inc()
+                return DeliveryResult(subscription.id, event_ids, True, False, f"HTTP {response.status_code}")
+            detail = f"HTTP {response.status_code}"
+            if response.status_code != 429 and response.status_code < 500:
+                # The subscriber is up but rejects the event; retrying will not help
+                DELIVERY_ATTEMPTS.labels("rejected").inc()
+                return DeliveryResult(subscription.id, event_ids, False, False, detail)
+            breaker.record_failure()
+            DELIVERY_ATTEMPTS.labels("error").inc()
+
+        return DeliveryResult(subscription.id, event_ids, False, True, detail)
+
+
+_registry: Optional[SubscriptionRegistry] = None
+_engine: Optional[WebhookDeliveryEngine] = None
+_lock = threading.Lock()
+
+
+def get_subscription_registry() -> SubscriptionRegistry:
+    """Return the process-wide subscription registry, configured from settings."""
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = SubscriptionRegistry(
+                    settings.subscriptions_table_name,
+                    reload_interval=settings.subscriptions_reload_interval
+                )
+    return _registry
+
+
+def get_delivery_engine() -> WebhookDeliveryEngine:
+    """Return the process-wide delivery engine, configured from settings."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = WebhookDeliveryEngine(
+                    timeout=settings.webhook_delivery_timeout,
+                    max_connections=settings.webhook_delivery_max_connections,
+                    retries=settings.webhook_delivery_retries,
+                    breaker_threshold=settings.webhook_delivery_breaker_threshold,
+                    breaker_reset=settings.webhook_delivery_breaker_reset
+                )
+    return _engine
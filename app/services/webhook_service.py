@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+from app.config import settings
+from app.models.webhook import WebhookCreate, WebhookUpdate, WebhookResponse, WebhookBatchItemResult
+from app.services.dynamodb_service import DynamoDBService, BATCH_WRITE_MAX_ITEMS
+
+logger = logging.getLogger(__name__)
+
+# Shared by all batch requests in the process, bounding concurrent BatchWriteItem calls
+_write_executor = ThreadPoolExecutor(
+    max_workers=settings.webhook_batch_concurrency,
+    thread_name_prefix="webhook-batch"
+)
+
+
+class WebhookBatchWriter:
+    """Write validated webhooks in BatchWriteItem chunks while the body is still being read.
+
+    Full chunks are written in parallel on a thread pool. At most
+    `concurrency` chunks are in flight per batch; `add` waits for a free
+    slot, which pauses reading the request body instead of buffering it.
+    """
+
+    def __init__(
+        self,
+        db_service: DynamoDBService,
+        chunk_size: int = BATCH_WRITE_MAX_ITEMS,
+        concurrency: int = 4,
+        on_written: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.db_service = db_service
+        self.chunk_size = chunk_size
+        self.on_written = on_written
+        self.results: List[WebhookBatchItemResult] = []
+        self._chunk: List[Tuple[int, Dict[str, Any]]] = []
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set = set()
+
+    def reject(self, index: int, error: str):
+        """Record an event that failed validation."""
+        self.results.append(WebhookBatchItemResult(index=index, status="invalid", error=error))
+
+    async def add(self, index: int, webhook: WebhookCreate):
+        """Queue a validated event, writing a chunk once it is full."""
+        self._chunk.append((index, self.db_service.build_webhook_item(webhook.model_dump())))
+        if len(self._chunk) >= self.chunk_size:
+            await self._flush()
+
+    async def _flush(self):
+        chunk, self._chunk = self._chunk, []
+        await self._semaphore.acquire()
+        task = asyncio.ensure_future(self._write(chunk))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, chunk: List[Tuple[int, Dict[str, Any]]]):
+        loop = asyncio.get_running_loop()
+        try:
+            errors = await loop.run_in_executor(
+                _write_executor, self.db_service.write_webhook_items, [item for _, item in chunk]
+            )
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"] * len(chunk)
+        finally:
+            self._semaphore.release()
+
+        written = []
+        for (index, item), error in zip(chunk, errors):
+            if error is None:
+                written.append(item['id'])
+                self.results.append(WebhookBatchItemResult(index=index, status="created", id=item['id']))
+            else:
+                self.results.append(WebhookBatchItemResult(index=index, status="failed", error=error))
+        if written and self.on_written is not None:
+            try:
+                self.on_written(written)
+            except Exception as e:
+                # The events are stored; processing can be triggered again later
+                logger.error(f"Failed to queue {len(written)} written webhooks for processing: {e}")
+
+    async def close(self) -> List[WebhookBatchItemResult]:
+        """Write the last partial chunk, wait for all writes and return results in request order."""
+        if self._chunk:
+            await self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        return sorted(self.results, key=lambda result: result.index)
+
+
+class WebhookService:
+    """Service for generic webhook business logic."""
+
+    def __init__(self):
+        self.db_service = DynamoDBService()
+
+    async def initialize(self):
+        """Initialize the service (create table if needed)."""
+        await self.db_service.create_table_if_not_exists()
+
+    async def create_webhook(self, webhook: WebhookCreate) -> WebhookResponse:
+        """Store a single webhook event."""
+        item = await self.db_service.create_webhook(webhook.model_dump())
+        return WebhookResponse(**item)
+
+    def batch_writer(self, on_written: Optional[Callable[[List[str]], None]] = None) -> WebhookBatchWriter:
+        """Return a writer for storing a stream of webhook events in parallel chunks."""
+        return WebhookBatchWriter(
+            self.db_service,
+            concurrency=settings.webhook_batch_concurrency,
+            on_written=on_written
+        )
+
+    async def get_webhook(self, webhook_id: str) -> Optional[WebhookResponse]:
+        """Get a webhook by ID."""
+        item = await self.db_service.get_webhook(webhook_id)
+        return WebhookResponse(**item) if item else None
+
+    async def list_webhooks(self, limit: int = 100) -> List[WebhookResponse]:
+        """List webhooks."""
+        items = await self.db_service.list_webhooks(limit=limit)
+        return [WebhookResponse(**item) for item in items]
+
+    async def update_webhook(self, webhook_id: str, update: WebhookUpdate) -> Optional[WebhookResponse]:
+        """Update the fields of a webhook that are set."""
+        update_data = update.model_dump(exclude_unset=True)
+        if isinstance(update_data.get('processed_at'), datetime):
+            update_data['processed_at'] = update_data['processed_at'].isoformat()
+        item = await self.db_service.update_webhook(webhook_id, update_data)
+        return WebhookResponse(**item) if item else None
+
+    async def mark_webhook_processed(self, webhook_id: str) -> Optional[WebhookResponse]:
+        """Mark a webhook as processed."""
+        return await self.update_webhook(
+            webhook_id, WebhookUpdate(processed=True, processed_at=datetime.utcnow())
+        )
+
+    async def delete_webhook(self, webhook_id: str) -> bool:
+        """Delete a webhook."""
+        return await self.db_service.delete_webhook(webhook_id)
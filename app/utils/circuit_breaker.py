@@ -0,0 +1,34 @@
+import time
+
+
+class CircuitBreaker:
+    """Minimal circuit breaker.
+
+    Opens after `failure_threshold` consecutive failures so callers can fail
+    fast (or take a fallback path) instead of waiting on a dependency that
+    is down. Once `reset_timeout` has passed, calls are let through again;
+    the first failure re-opens the circuit and a success closes it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.failure_threshold and time.monotonic() < self.open_until
+
+    def allow(self) -> bool:
+        """Return True if a call should be attempted."""
+        return not self.is_open
+
+    def record_success(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.reset_timeout
@@ -1,6 +1,13 @@
+import asyncio
+import hashlib
+import hmac
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+_thread_state = threading.local()
 
 
 def generate_uuid() -> str:
@@ -21,8 +28,90 @@ def parse_datetime(dt_str: str) -> Optional[datetime]:
         return None
 
 
-def validate_webhook_signature(payload: str, signature: str, secret: str) -> bool:
-    """Validate webhook signature (placeholder implementation)."""
-    # This is a placeholder - implement actual signature validation
-    # based on your webhook provider's requirements
-    return True
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion from synchronous code (e.g. Celery tasks).
+
+    Reuses one event loop per thread instead of creating a new loop per call.
+    """
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_state.loop = loop
+    return loop.run_until_complete(coro)
+
+
+class LoopLocal:
+    """A value per event loop, created by `factory` on first use in each loop.
+
+    For objects that belong to the loop that created them (HTTP pools,
+    semaphores) in processes where several threads each run their own loop,
+    e.g. run_sync() under a threaded Celery pool. Values of closed loops are
+    dropped; they cannot be closed cleanly and are left to be collected.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._values: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Return the value of the running loop."""
+        loop = asyncio.get_running_loop()
+        value = self._values.get(loop)
+        if value is None:
+            with self._lock:
+                value = self._values.get(loop)
+                if value is None:
+                    value = self._factory()
+                    # Copied, so lookups from other threads never see a dict being changed
+                    values = {other: v for other, v in self._values.items() if not other.is_closed()}
+                    values[loop] = value
+                    self._values = values
+        return value
+
+
+def sign_webhook_payload(payload: Union[str, bytes], secret: str, timestamp: Optional[int] = None) -> str:
+    """Return a signature header value for a webhook body.
+    
+    The format is `t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">`, so the
+    timestamp is covered by the MAC and old deliveries cannot be replayed.
+    """
+    if timestamp is None:
+        timestamp = int(time.time())
+    if isinstance(payload, str):
+        payload = payload.encode()
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256)
+    return f"t={timestamp},v1={mac.hexdigest()}"
+
+
+def validate_webhook_signature(
+    payload: Union[str, bytes],
+    signature: str,
+    secret: str,
+    tolerance: Optional[int] = 300,
+    now: Optional[float] = None
+) -> bool:
+    """Validate a signature created by sign_webhook_payload.
+    
+    Rejects signatures whose timestamp is more than `tolerance` seconds away
+    from `now` (pass tolerance=None to skip the check). Several `v1` values
+    are accepted so secrets can be rotated.
+    """
+    if not signature or not secret:
+        return False
+    timestamp, candidates = None, []
+    for part in signature.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            candidates.append(value)
+    if timestamp is None or not timestamp.isdigit() or not candidates:
+        return False
+    if tolerance is not None:
+        now = time.time() if now is None else now
+        if abs(now - int(timestamp)) > tolerance:
+            return False
+    expected = sign_webhook_payload(payload, secret, int(timestamp)).split(",v1=")[1]
+    # Check every candidate so timing does not reveal which one matched
+    return sum(hmac.compare_digest(expected, candidate) for candidate in candidates) > 0
@@ -0,0 +1,119 @@
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator
+
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = set("0123456789.eE+-")
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamError(ValueError):
+    """Raised when a streamed JSON body is malformed."""
+
+
+async def iter_ndjson(chunks: AsyncIterable[bytes], max_item_bytes: int) -> AsyncIterator[Any]:
+    """Yield one decoded value per line of an NDJSON body as it arrives."""
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _decode_line(line, line_number)
+        if len(buffer) > max_item_bytes:
+            raise JSONStreamError(f"Line {line_number + 1} exceeds {max_item_bytes} bytes")
+    if buffer.strip():
+        yield _decode_line(buffer, line_number + 1)
+
+
+def _decode_line(line: bytes, line_number: int) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise JSONStreamError(f"Invalid JSON on line {line_number}: {e}") from None
+
+
+async def iter_json_array(chunks: AsyncIterable[bytes], max_item_bytes: int) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array as they arrive.
+
+    Only the element currently being read is buffered, so arbitrarily long
+    arrays are decoded in bounded memory.
+    """
+    buffer = ""
+    position = 0
+    started = False
+    expect_value = True  # a value (or "]" when nothing has been read yet) comes next
+    # Multi-byte characters may be split across chunks
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    async def fill() -> bool:
+        nonlocal buffer, position
+        async for chunk in iterator:
+            try:
+                text = utf8.decode(chunk)
+            except UnicodeDecodeError as e:
+                raise JSONStreamError(f"Invalid UTF-8: {e}") from None
+            buffer = buffer[position:] + text
+            position = 0
+            return True
+        return False
+
+    iterator = chunks.__aiter__()
+    count = 0
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        if position >= len(buffer):
+            if not await fill():
+                break
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != "[":
+                raise JSONStreamError("Expected a JSON array")
+            started = True
+            position += 1
+            continue
+        if char == "]" and (count == 0 or not expect_value):
+            position += 1
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer) or await _has_more(iterator):
+                raise JSONStreamError("Unexpected data after the JSON array")
+            return
+        if not expect_value:
+            if char != ",":
+                raise JSONStreamError(f"Expected ',' or ']' after element {count - 1}")
+            expect_value = True
+            position += 1
+            continue
+
+        try:
+            value, end = _decoder.raw_decode(buffer, position)
+        except ValueError as e:
+            if len(buffer) - position > max_item_bytes:
+                raise JSONStreamError(f"Element {count} exceeds {max_item_bytes} bytes") from None
+            if not await fill():
+                raise JSONStreamError(f"Invalid JSON in element {count}: {e}") from None
+            continue
+        # A number at the end of the buffer may continue in the next chunk
+        if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and _NUMBER_CHARS.issuperset(buffer[end:])):
+            if await fill():
+                continue
+        position = end
+        expect_value = False
+        count += 1
+        yield value
+
+    raise JSONStreamError("Unexpected end of JSON array" if started else "Empty request body")
+
+
+async def _has_more(iterator: AsyncIterator[bytes]) -> bool:
+    async for chunk in iterator:
+        if chunk.strip():
+            return True
+    return False
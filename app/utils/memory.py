@@ -0,0 +1,227 @@
+"""Memory growth instrumentation for API and worker processes.
+
+The tracker traces allocations with tracemalloc and compares snapshots to
+find the allocation sites that keep growing. It runs every
+`interval` seconds once started, or on demand. Tracing slows allocation
+down noticeably, so it only stays on when MEMORY_PROFILING_ENABLED is set;
+otherwise a requested report traces for a short window and stops again.
+"""
+import linecache
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.utils.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+PROCESS_RSS = Gauge(
+    "skippy_process_resident_memory_bytes",
+    "Resident set size of this process"
+)
+TRACED_MEMORY = Gauge(
+    "skippy_tracemalloc_traced_bytes",
+    "Memory allocated by Python and traced by tracemalloc (0 when not tracing)"
+)
+
+# Allocations made by the tracing machinery itself
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Return the resident set size of a process, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def traced_bytes() -> int:
+    """Return the memory currently traced by tracemalloc (0 when not tracing)."""
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+PROCESS_RSS.set_function(lambda: rss_bytes(os.getpid()) or 0)
+TRACED_MEMORY.set_function(traced_bytes)
+
+
+def _format_size(size: int) -> str:
+    if abs(size) < 1024:
+        return f"{size:+d} B"
+    if abs(size) < 1024 ** 2:
+        return f"{size / 1024:+.1f} KiB"
+    return f"{size / 1024 ** 2:+.1f} MiB"
+
+
+class MemoryTracker:
+    """Finds allocation sites that grow between tracemalloc snapshots.
+
+    `report()` compares a new snapshot with the previous one (or with the
+    first one taken, the baseline) and returns the sites that grew most.
+    When tracing is off, `report()` traces for `sample_seconds` only and
+    returns the growth within that window. `start(interval)` also logs such a report every `interval` seconds from
+    a background thread; `request_report()` asks that thread for one now and
+    is safe to call from a signal handler.
+    """
+
+    def __init__(self, frames: int = 1, top: int = 10, key_type: str = "lineno", sample_seconds: float = 30.0):
+        self.frames = frames
+        self.top = top
+        self.key_type = key_type
+        self.sample_seconds = sample_seconds
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._interval = 0.0
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing() and self._baseline is not None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def start(self, interval: float = 0.0):
+        """Start tracing (if needed) and take the baseline; log reports every `interval` seconds if > 0."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            if self._baseline is None:
+                self._baseline = self._previous = self._snapshot()
+            if interval > 0:
+                self._interval = interval
+                self._ensure_thread()
+
+    def _stop_tracing(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = self._previous = None
+
+    def stop(self):
+        """Stop tracing and drop the snapshots."""
+        self._stopping = True
+        self._wake.set()
+        self._stop_tracing()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self._stopping = False
+        self._wake.clear()
+
+    def report(self, since: str = "previous", limit: Optional[int] = None,
+               seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Return the sites that grew most since the previous snapshot or the baseline.
+
+        If tracing is not running, traces for `seconds` (`sample_seconds` by
+        default), reports the growth since then and stops tracing again.
+        """
+        if not self.tracing:
+            self.start()
+            try:
+                time.sleep(self.sample_seconds if seconds is None else seconds)
+                return self._report("baseline", limit)
+            finally:
+                self._stop_tracing()
+        return self._report(since, limit)
+
+    def _report(self, since: str, limit: Optional[int]) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self._snapshot()
+            reference = self._baseline if since == "baseline" else self._previous
+            stats = snapshot.compare_to(reference, self.key_type)
+            self._previous = snapshot
+        growth = [stat for stat in stats if stat.size_diff > 0][:limit or self.top]
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "pid": os.getpid(),
+            "since": since,
+            "rss_bytes": rss_bytes(os.getpid()),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [
+                {
+                    "site": str(stat.traceback[0]) if stat.traceback else "<unknown>",
+                    "traceback": [str(frame) for frame in stat.traceback] if len(stat.traceback) > 1 else None,
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in growth
+            ],
+        }
+
+    def log_report(self, since: str = "previous"):
+        report = self.report(since)
+        lines = [
+            f"Memory growth since {since} snapshot (pid {report['pid']}, "
+            f"rss {(report['rss_bytes'] or 0) / 2**20:.1f} MiB, traced {report['traced_bytes'] / 2**20:.1f} MiB):"
+        ]
+        for entry in report["top"]:
+            lines.append(f"  {_format_size(entry['size_diff'])} ({entry['count_diff']:+d} blocks) {entry['site']}")
+        logger.info("\n".join(lines))
+
+    def request_report(self):
+        """Log a report from the background thread as soon as possible (signal-safe)."""
+        self._wake.set()
+        if self._thread is None:
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="memory-tracker", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self._interval or None)
+            if self._stopping:
+                break
+            self._wake.clear()
+            try:
+                self.log_report()
+            except Exception as e:
+                logger.error(f"Memory report failed: {e}")
+
+
+_tracker: Optional[MemoryTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_memory_tracker() -> MemoryTracker:
+    """Return the process-wide memory tracker, configured from settings."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = MemoryTracker(
+                    frames=settings.memory_trace_frames,
+                    top=settings.memory_report_top,
+                    # Group by full traceback when more than one frame is kept
+                    key_type="traceback" if settings.memory_trace_frames > 1 else "lineno",
+                    sample_seconds=settings.memory_sample_seconds
+                )
+    return _tracker
+
+
+def start_memory_profiling():
+    """Start tracing from process start when enabled in settings."""
+    if settings.memory_profiling_enabled:
+        get_memory_tracker().start(settings.memory_snapshot_interval)
+        logger.info(f"Memory profiling enabled (pid {os.getpid()})")
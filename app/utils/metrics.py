@@ -0,0 +1,374 @@
+import itertools
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class _ThreadMarker:
+    """Dropped with its thread's locals when the thread exits."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _ShardedValues:
+    """Per-thread value shards that are merged when metrics are collected.
+
+    Updates only touch the calling thread's dict, so the hot path never takes
+    a lock; the lock is only used the first time a thread records a value.
+    Shards of threads that have exited are folded into a base shard with
+    `fold(base, shard)` on the next collection, so short-lived threads do
+    not accumulate.
+    """
+
+    def __init__(self, fold: Callable[[dict, dict], None]):
+        self._fold = fold
+        self._local = threading.local()
+        self._shards: Dict[int, dict] = {}
+        self._base: dict = {}
+        self._retired: List[int] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: dict = {}
+            shard_id = next(self._ids)
+            with self._lock:
+                self._shards[shard_id] = shard
+            marker = self._local.marker = _ThreadMarker()
+            # Runs when the thread exits; list.append needs no lock (and takes none, as
+            # the garbage collector may run this on a thread already holding it)
+            weakref.finalize(marker, self._retired.append, shard_id)
+            self._local.shard = shard
+            return shard
+
+    def snapshots(self) -> List[dict]:
+        with self._lock:
+            while self._retired:
+                shard = self._shards.pop(self._retired.pop(), None)
+                if shard is not None:
+                    self._fold(self._base, shard)
+            shards = [self._base, *self._shards.values()]
+        # dict.copy() is atomic under the GIL
+        return [shard.copy() for shard in shards]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for metrics with optional labels."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = _ShardedValues(self._fold)
+        self._children: Dict[Tuple[str, ...], "_Child"] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values: str) -> "_Child":
+        """Return the child metric for the given label values."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(key, self._child_class(self, key))
+        return child
+
+    @staticmethod
+    def _fold(base: dict, shard: dict):
+        """Add the values of an exited thread's shard to the base shard."""
+        for key, value in shard.items():
+            base[key] = base.get(key, 0.0) + value
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class _Child:
+    __slots__ = ("_values", "_key")
+
+    def __init__(self, parent: _Metric, key: Tuple[str, ...]):
+        self._values = parent._values
+        self._key = key
+
+
+class _CounterChild(_Child):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0):
+        shard = self._values.shard()
+        shard[self._key] = shard.get(self._key, 0.0) + amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type = "counter"
+    _child_class = _CounterChild
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def value(self, *labels: str) -> float:
+        key = tuple(str(label) for label in labels)
+        return sum(shard.get(key, 0.0) for shard in self._values.snapshots())
+
+    def collect(self) -> List[str]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._values.snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        lines = self._header()
+        for key, value in sorted(totals.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class Gauge(Counter):
+    """Gauge tracked as per-thread deltas, or computed by a callback on collection."""
+
+    type = "gauge"
+    _child_class = _GaugeChild
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], float]] = None
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the (unlabelled) gauge value by calling `function` on collection."""
+        self._function = function
+
+    def collect(self) -> List[str]:
+        if self._function is None:
+            return super().collect()
+        return self._header() + [f"{self.name} {_format_value(self._function())}"]
+
+
+class _HistogramChild(_Child):
+    __slots__ = ("_buckets",)
+
+    def __init__(self, parent: "Histogram", key: Tuple[str, ...]):
+        super().__init__(parent, key)
+        self._buckets = parent.buckets
+
+    def observe(self, value: float):
+        shard = self._values.shard()
+        entry = shard.get(self._key)
+        if entry is None:
+            # One slot per bucket, one for +Inf and the running sum
+            entry = shard[self._key] = [0] * (len(self._buckets) + 1) + [0.0]
+        entry[bisect_left(self._buckets, value)] += 1
+        entry[-1] += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the elapsed time of its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    """Histogram with fixed bucket upper bounds."""
+
+    type = "histogram"
+    _child_class = _HistogramChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    @staticmethod
+    def _fold(base: dict, shard: dict):
+        for key, entry in shard.items():
+            total = base.get(key)
+            # New lists, so snapshots already taken of the base never change
+            base[key] = list(entry) if total is None else [a + b for a, b in zip(total, entry)]
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def collect(self) -> List[str]:
+        totals: Dict[Tuple[str, ...], list] = {}
+        for shard in self._values.snapshots():
+            for key, entry in shard.items():
+                entry = list(entry)
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = entry
+                else:
+                    for i, value in enumerate(entry):
+                        total[i] += value
+
+        lines = self._header()
+        bounds = self.buckets + (float("inf"),)
+        for key, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, entry):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def generate_latest(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def generate_latest(registry: Registry = REGISTRY) -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    return registry.generate_latest()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        body = generate_latest(self.registry).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread (used by processes without an API)."""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+# HTTP API metrics
+HTTP_REQUEST_DURATION = Histogram(
+    "skippy_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"]
+)
+HTTP_REQUESTS = Counter(
+    "skippy_http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "skippy_http_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency, status and in-flight requests.
+
+    Requests are labelled with the route template (e.g. /sms/{sms_id}) rather
+    than the raw path to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, path).observe(elapsed)
+            HTTP_REQUESTS.labels(method, path, status).inc()
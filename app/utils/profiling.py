@@ -0,0 +1,64 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for the live process.
+
+    Samples the stacks of all threads at a fixed interval and aggregates them
+    into the collapsed-stack format understood by flamegraph.pl and speedscope
+    (`thread;outer;...;inner count` per line). Nothing runs while no profile
+    is being taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float = 0.005) -> Optional[str]:
+        """Sample for `seconds` and return collapsed stacks, or None if already running."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> str:
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        labels: Dict = {}
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(frame)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(f"thread:{names.get(ident, ident)}")
+                stacks[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+profiler = SamplingProfiler()
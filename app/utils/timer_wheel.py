@@ -0,0 +1,88 @@
+from typing import Dict, Hashable, List, Tuple
+
+
+class TimerWheel:
+    """Hierarchical timing wheel.
+
+    Holds keys with due times (ms) in `levels` wheels of `slots` slots each;
+    a slot of level L spans slots**L ticks. Adding and expiring a key is O(1)
+    amortised whatever the number of keys: keys are placed in the coarsest
+    level their delay needs and cascade into finer levels as the wheel turns.
+    Keys due later than `horizon_ms` are rejected and must be added again
+    once they come into range.
+    """
+
+    def __init__(self, now_ms: int, tick_ms: int = 100, slots: int = 64, levels: int = 3):
+        self.tick_ms = tick_ms
+        self.slots = slots
+        self.levels = levels
+        self._tick = now_ms // tick_ms
+        self._wheels: List[List[List[Tuple[int, Hashable]]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._ready: List[Hashable] = []
+        self._due: Dict[Hashable, int] = {}
+
+    @property
+    def horizon_ms(self) -> int:
+        """How far past the current tick keys can be added."""
+        return (self.slots ** self.levels - 1) * self.tick_ms
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._due
+
+    def add(self, key: Hashable, due_ms: int) -> bool:
+        """Schedule `key`; returns False if it is already scheduled or beyond the horizon."""
+        if key in self._due:
+            return False
+        # Round up so a key never fires before it is due
+        due_tick = -(-due_ms // self.tick_ms)
+        if not self._place(key, due_tick):
+            return False
+        self._due[key] = due_tick
+        return True
+
+    def _place(self, key: Hashable, due_tick: int) -> bool:
+        delta = due_tick - self._tick
+        if delta <= 0:
+            self._ready.append(key)
+            return True
+        for level in range(self.levels):
+            if delta < self.slots ** (level + 1):
+                index = (due_tick // self.slots ** level) % self.slots
+                self._wheels[level][index].append((due_tick, key))
+                return True
+        return False
+
+    def advance(self, now_ms: int) -> List[Hashable]:
+        """Turn the wheel to `now_ms` and return the keys that became due, in due order."""
+        target = now_ms // self.tick_ms
+        expired, self._ready = self._ready, []
+        while self._tick < target:
+            if not self._due:
+                # Nothing to cascade or expire; jump straight to the target
+                self._tick = target
+                break
+            self._tick += 1
+            # Cascade coarser slots that start at this tick, coarsest first
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self._tick % span == 0:
+                    slot = self._wheels[level][(self._tick // span) % self.slots]
+                    entries = slot[:]
+                    slot.clear()
+                    for due_tick, key in entries:
+                        self._place(key, due_tick)
+            slot = self._wheels[0][self._tick % self.slots]
+            if slot:
+                expired.extend(key for _, key in slot)
+                slot.clear()
+            if self._ready:
+                expired.extend(self._ready)
+                self._ready = []
+        for key in expired:
+            self._due.pop(key, None)
+        return expired
@@ -0,0 +1,88 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Phase durations recorded while handling one request."""
+
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    def header_value(self, total: float) -> str:
+        parts = [f"{name};dur={duration * 1000:.2f}" for name, duration in self.phases]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+class _Phase:
+    __slots__ = ("_timings", "_name", "_start")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timings.phases.append((self._name, time.perf_counter() - self._start))
+
+
+class _NoopPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP_PHASE = _NoopPhase()
+
+
+def phase(name: str):
+    """Time a block as a named phase of the current request.
+
+    Returns a shared no-op context manager when timing is not enabled for the
+    request, so instrumented code costs a single context variable lookup.
+    """
+    timings = _current.get()
+    if timings is None:
+        return _NOOP_PHASE
+    return _Phase(timings, name)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware returning recorded phase timings in a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                header = timings.header_value(time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
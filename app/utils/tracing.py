@@ -0,0 +1,332 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+KIND_PRODUCER = 4
+KIND_CONSUMER = 5
+
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["SpanContext"]] = ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """Identifiers propagated between processes (W3C trace context)."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: int, span_id: int, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id:032x}-{self.span_id:016x}-{'01' if self.sampled else '00'}"
+
+
+def extract(traceparent: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header; returns None if missing or invalid."""
+    if not traceparent:
+        return None
+    parts = traceparent.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        trace_id, span_id, flags = int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    if not trace_id or not span_id:
+        return None
+    return SpanContext(trace_id, span_id, bool(flags & 1))
+
+
+def inject() -> Optional[str]:
+    """Return the traceparent header value for the current span, if any."""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+class _Activation:
+    """Context manager support shared by recording and non-recording spans."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.record_exception(exc)
+        self.end()
+
+
+class NonRecordingSpan(SpanContext, _Activation):
+    """Span for unsampled traces: propagates context but records nothing."""
+
+    __slots__ = ("_token",)
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+class Span(SpanContext, _Activation):
+    """A sampled, timed operation within a trace."""
+
+    __slots__ = ("name", "parent_id", "kind", "attributes", "start_ns", "end_ns",
+                 "status", "status_message", "_processor", "_token")
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: int, span_id: int, parent_id: Optional[int],
+                 kind: int, attributes: Optional[Dict[str, Any]], processor):
+        super().__init__(trace_id, span_id, True)
+        self.name = name
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = _STATUS_OK
+        self.status_message = ""
+        self._processor = processor
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = _STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._processor.on_end(self)
+
+
+class _NoopSpan(_Activation):
+    """Returned when tracing is disabled; does not touch the span context."""
+
+    __slots__ = ()
+
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_attribute_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()]
+
+
+def encode_otlp_json(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """Encode finished spans as an OTLP/JSON ExportTraceServiceRequest."""
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": f"{span.trace_id:032x}",
+            "spanId": f"{span.span_id:016x}",
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _attributes(span.attributes),
+            "status": {"code": span.status, "message": span.status_message},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = f"{span.parent_id:016x}"
+        encoded.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "skippy"}, "spans": encoded}],
+        }]
+    }
+
+
+class FileSpanExporter:
+    """Append OTLP/JSON export requests to a file, one batch per line."""
+
+    def __init__(self, path: str, service_name: str = "skippy"):
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, spans: List[Span]):
+        line = json.dumps(encode_otlp_json(spans, self.service_name), separators=(",", ":"))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Send spans to an OTLP/HTTP collector endpoint using JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str = "skippy", timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._client: Optional[httpx.Client] = None
+
+    def export(self, spans: List[Span]):
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout)
+        response = self._client.post(self.endpoint, json=encode_otlp_json(spans, self.service_name))
+        response.raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Queue finished spans and export them in batches from a background thread.
+
+    The queue is bounded; spans are dropped rather than blocking requests
+    when the exporter falls behind. The export thread is (re)started lazily
+    so it also runs in forked worker processes.
+    """
+
+    def __init__(self, exporter, max_queue_size: int = 2048, batch_size: int = 512,
+                 interval: float = 5.0):
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: deque = deque()
+        self._wakeup = threading.Event()
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def on_end(self, span: Span):
+        if len(self._queue) >= self.max_queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Export all queued spans."""
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+
+class Tracer:
+    """Creates spans with head-based sampling decided once per trace."""
+
+    def __init__(self, processor, sample_rate: float = 1.0):
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None,
+                   kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        """Start a span; use it as a context manager to make it current."""
+        if parent is None:
+            parent = _current_span.get()
+        span_id = random.getrandbits(64) or 1
+        if parent is None:
+            trace_id = random.getrandbits(128) or 1
+            if random.random() >= self.sample_rate:
+                return NonRecordingSpan(trace_id, span_id, False)
+            return Span(name, trace_id, span_id, None, kind, attributes, self.processor)
+        if not parent.sampled:
+            return NonRecordingSpan(parent.trace_id, span_id, False)
+        return Span(name, parent.trace_id, span_id, parent.span_id, kind, attributes, self.processor)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the process-wide tracer, or None when tracing is disabled."""
+    global _tracer
+    if _tracer is None and settings.tracing_enabled:
+        with _tracer_lock:
+            if _tracer is None:
+                if settings.tracing_exporter == "otlp":
+                    exporter = OTLPHttpSpanExporter(settings.tracing_otlp_endpoint, settings.app_name)
+                else:
+                    exporter = FileSpanExporter(settings.tracing_file_path, settings.app_name)
+                _tracer = Tracer(BatchSpanProcessor(exporter), settings.tracing_sample_rate)
+    return _tracer
+
+
+def start_span(name: str, parent: Optional[SpanContext] = None,
+               kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    """Start a span with the global tracer; returns a no-op span when tracing is disabled."""
+    tracer = _tracer or get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(name, parent, kind, attributes)
@@ -1,4 +1,8 @@
 from .celery_app import celery_app
-from .sms_tasks import process_sms_task, send_sms_reply_task, periodic_sms_cleanup_task
+from .sms_tasks import process_sms_task, send_sms_reply_task, send_scheduled_sms_task, periodic_sms_cleanup_task
+from .campaign_tasks import send_campaign_chunk_task
 
-__all__ = ["celery_app", "process_sms_task", "send_sms_reply_task", "periodic_sms_cleanup_task"]
+__all__ = [
+    "celery_app", "process_sms_task", "send_sms_reply_task", "send_scheduled_sms_task", "periodic_sms_cleanup_task",
+    "send_campaign_chunk_task"
+]
@@ -0,0 +1,34 @@
+import logging
+from .celery_app import celery_app
+from app.config import settings
+from app.services.campaigns import get_campaign_sender
+from app.utils.helpers import run_sync
+
+logger = logging.getLogger(__name__)
+
+
+def queue_chunks(campaign_id: str, chunks: int):
+    """Queue a send task for every chunk of a campaign (tasks for sent chunks exit at once)."""
+    for index in range(chunks):
+        send_campaign_chunk_task.delay(campaign_id, index)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def send_campaign_chunk_task(self, campaign_id: str, index: int):
+    """Send the unsent messages of one campaign chunk."""
+    try:
+        result = run_sync(get_campaign_sender().send_chunk(campaign_id, index))
+    except Exception as exc:
+        logger.error(f"Error sending campaign {campaign_id} chunk {index}: {exc}")
+        
+        # The chunk was released, so the retry can claim it straight away
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=60 * (2 ** self.request.retries))
+        logger.error(f"Max retries exceeded for campaign {campaign_id} chunk {index}")
+        return False
+    
+    if result.requeue:
+        # A throttled chunk waits for the send budget to come back first
+        countdown = settings.campaign_budget_timeout if result.status == "throttled" else 0
+        send_campaign_chunk_task.apply_async(args=[campaign_id, index], countdown=countdown)
+    return result._asdict()
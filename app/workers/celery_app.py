@@ -6,7 +6,8 @@ celery_app = Celery(
     "skippy",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["app.workers.tasks"]
+    include=["app.workers.tasks", "app.workers.sms_tasks", "app.workers.delivery_tasks",
+             "app.workers.campaign_tasks"]
 )
 
 # Celery configuration
@@ -20,7 +21,7 @@ celery_app.conf.update(
     task_time_limit=30 * 60,  # 30 minutes
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=1000,
+    worker_max_tasks_per_child=settings.worker_max_tasks_per_child or None,
     beat_schedule={
         "periodic-cleanup": {
             "task": "app.workers.tasks.periodic_cleanup_task",
@@ -32,3 +33,6 @@ celery_app.conf.update(
         },
     },
 )
+
+# Connect task metrics signal handlers
+from . import monitoring  # noqa: E402,F401
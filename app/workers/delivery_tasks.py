@@ -0,0 +1,69 @@
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from .celery_app import celery_app
+from app.config import settings
+from app.services.webhook_delivery import (
+    DELIVERY_ATTEMPTS,
+    get_delivery_engine,
+    get_subscription_registry,
+    make_event,
+)
+from app.utils.helpers import run_sync
+
+logger = logging.getLogger(__name__)
+
+
+def publish_events(event_type: str, records: List[Dict[str, Any]]):
+    """Queue stored records for delivery to the subscribers of `event_type`.
+
+    Nothing is queued when no subscriber wants the event type.
+    """
+    if not settings.webhook_delivery_enabled or not records:
+        return
+    try:
+        if not get_subscription_registry().matching(event_type):
+            return
+        deliver_events_task.delay([make_event(event_type, record) for record in records])
+    except Exception as exc:
+        # Fan-out must never fail the processing of the event itself
+        logger.error(f"Failed to queue {event_type} events for delivery: {exc}")
+
+
+@celery_app.task
+def deliver_events_task(events: List[Dict[str, Any]], subscription_ids: Optional[List[str]] = None,
+                        attempt: int = 0):
+    """Deliver events to their subscribers, re-queueing retryable failures with back-off."""
+    subscriptions = get_subscription_registry().subscriptions()
+    if subscription_ids is not None:
+        subscriptions = [s for s in subscriptions if s.id in subscription_ids]
+
+    results = run_sync(get_delivery_engine().deliver(events, subscriptions))
+
+    failed: Dict[str, List[str]] = defaultdict(list)
+    delivered = 0
+    for result in results:
+        if result.delivered:
+            delivered += len(result.event_ids)
+        elif result.retryable:
+            failed[result.subscription_id].extend(result.event_ids)
+        else:
+            logger.warning(f"Subscriber {result.subscription_id} rejected events "
+                           f"{result.event_ids}: {result.detail}")
+
+    events_by_id = {event["id"]: event for event in events}
+    requeued = 0
+    for subscription_id, event_ids in failed.items():
+        if attempt + 1 >= settings.webhook_delivery_max_attempts:
+            logger.error(f"Dropping {len(event_ids)} events for subscriber {subscription_id} "
+                         f"after {attempt + 1} attempts")
+            DELIVERY_ATTEMPTS.labels("dropped").inc(len(event_ids))
+            continue
+        deliver_events_task.apply_async(
+            args=[[events_by_id[event_id] for event_id in event_ids], [subscription_id], attempt + 1],
+            countdown=min(30 * (2 ** attempt), 3600)
+        )
+        requeued += len(event_ids)
+
+    return {"delivered": delivered, "requeued": requeued}
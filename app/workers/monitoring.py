@@ -0,0 +1,166 @@
+import logging
+import os
+import signal
+import time
+from typing import Optional
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_prerun,
+    task_postrun,
+    task_retry,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from celery.worker.control import control_command
+
+from app.config import settings
+from app.services.sms_search import close_sms_search_index
+from app.services.traffic_stats import stop_traffic_stats
+from app.utils.memory import get_memory_tracker, rss_bytes, start_memory_profiling, traced_bytes
+from app.utils.metrics import Counter, Gauge, Histogram, start_metrics_server
+from app.utils.tracing import start_span, extract, inject, KIND_CONSUMER, NOOP_SPAN
+
+logger = logging.getLogger(__name__)
+
+TASK_DURATION = Histogram(
+    "skippy_celery_task_duration_seconds",
+    "Celery task runtime by task name",
+    ["task"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+TASK_QUEUE_WAIT = Histogram(
+    "skippy_celery_task_queue_wait_seconds",
+    "Time between publishing a Celery task and a worker starting it",
+    ["task"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+TASK_RESULTS = Counter(
+    "skippy_celery_tasks_total",
+    "Finished Celery tasks by task name and final state",
+    ["task", "state"]
+)
+TASK_RETRIES = Counter(
+    "skippy_celery_task_retries_total",
+    "Celery task retries by task name",
+    ["task"]
+)
+TASK_MEMORY_GROWTH = Gauge(
+    "skippy_celery_task_memory_growth_bytes",
+    "Net memory growth across runs of each task type in this process (kind: rss, or traced when profiling)",
+    ["task", "kind"]
+)
+
+_ENQUEUED_HEADER = "skippy_enqueued_at"
+_TRACEPARENT_HEADER = "traceparent"
+
+# Start time, trace span and memory at start of running tasks, by task ID
+_running: dict = {}
+
+
+def task_enqueued_at(request) -> Optional[float]:
+    """Return when a task was published (epoch seconds), if the publisher stamped it."""
+    enqueued_at = getattr(request, _ENQUEUED_HEADER, None)
+    return float(enqueued_at) if enqueued_at is not None else None
+
+
+@before_task_publish.connect
+def _stamp_task_headers(headers=None, **kwargs):
+    if headers is None:
+        return
+    headers[_ENQUEUED_HEADER] = time.time()
+    traceparent = inject()
+    if traceparent:
+        headers[_TRACEPARENT_HEADER] = traceparent
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    parent = extract(getattr(task.request, _TRACEPARENT_HEADER, None))
+    span = start_span(
+        f"celery.{task.name}",
+        parent=parent,
+        kind=KIND_CONSUMER,
+        attributes={"celery.task_id": task_id, "celery.retries": task.request.retries or 0}
+    )
+    span.__enter__()
+    memory = (rss_bytes(os.getpid()), traced_bytes()) if settings.metrics_enabled else None
+    _running[task_id] = (time.perf_counter(), span, memory)
+
+    enqueued_at = task_enqueued_at(task.request)
+    if enqueued_at is not None and not task.request.eta:
+        TASK_QUEUE_WAIT.labels(task.name).observe(max(time.time() - enqueued_at, 0.0))
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    start, span, memory = _running.pop(task_id, (None, NOOP_SPAN, None))
+    if start is not None:
+        TASK_DURATION.labels(task.name).observe(time.perf_counter() - start)
+    if memory is not None:
+        # Prefork children run one task at a time, so the growth is the task's own
+        rss_before, traced_before = memory
+        rss_after = rss_bytes(os.getpid())
+        if rss_before is not None and rss_after is not None:
+            TASK_MEMORY_GROWTH.labels(task.name, "rss").inc(rss_after - rss_before)
+        if traced_before:
+            TASK_MEMORY_GROWTH.labels(task.name, "traced").inc(traced_bytes() - traced_before)
+    TASK_RESULTS.labels(task.name, state or "UNKNOWN").inc()
+
+    span.set_attribute("celery.state", state or "UNKNOWN")
+    span.__exit__(None, None, None)
+
+
+@task_failure.connect
+def _on_task_failure(task_id=None, exception=None, **kwargs):
+    _, span, _ = _running.get(task_id, (None, NOOP_SPAN, None))
+    if exception is not None:
+        span.record_exception(exception)
+
+
+@task_retry.connect
+def _on_task_retry(sender=None, **kwargs):
+    TASK_RETRIES.labels(sender.name).inc()
+
+
+@worker_process_init.connect
+def _start_worker_exporter(**kwargs):
+    """Expose metrics from each prefork child on worker_metrics_port + its index."""
+    if not settings.metrics_enabled or not settings.worker_metrics_port:
+        return
+    from billiard.process import current_process
+
+    port = settings.worker_metrics_port + (getattr(current_process(), "index", 0) or 0)
+    try:
+        start_metrics_server(port)
+        logger.info(f"Worker metrics exporter listening on port {port}")
+    except OSError as e:
+        logger.warning(f"Could not start worker metrics exporter on port {port}: {e}")
+
+
+@worker_process_init.connect
+def _start_memory_profiling(**kwargs):
+    """Trace allocations in each prefork child when enabled, and report on SIGUSR2."""
+    start_memory_profiling()
+    signal.signal(signal.SIGUSR2, lambda signum, frame: get_memory_tracker().request_report())
+
+
+@control_command()
+def memory_report(state, **kwargs):
+    """Ask each prefork pool process to log a memory growth report.
+
+        celery -A app.workers.celery_app control memory_report
+    """
+    pids = state.consumer.pool.info.get("processes", [])
+    for pid in pids:
+        os.kill(pid, signal.SIGUSR2)
+    return {"ok": f"memory report requested from {len(pids)} pool processes"}
+
+
+@worker_process_shutdown.connect
+def _flush_traffic_stats(**kwargs):
+    """Write traffic counters aggregated by this worker process before it exits."""
+    stop_traffic_stats()
+    # Deleted SMS are removed from the search index
+    close_sms_search_index()
@@ -1,45 +1,190 @@
 import logging
-from datetime import datetime
-from typing import Optional
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 from .celery_app import celery_app
-from app.services.sms_service import SMSService
-from app.models.sms import SMSWebhook
+from .delivery_tasks import publish_events
+from .monitoring import task_enqueued_at
+from app.services.sms_service import INITIAL_VERSION, NewReply, SMSService, StaleSMSError
+from app.services.elks_client import ElksError, get_elks_client
+from app.services.reply_suppression import get_reply_suppressor, SEND, COALESCE
+from app.services.sms_scheduler import get_sms_scheduler
+from app.services.traffic_stats import get_traffic_stats
+from app.models.sms import SMSWebhook, SMSResponse
+from app.utils.helpers import run_sync
+from app.utils.metrics import Counter, Histogram
 
 logger = logging.getLogger(__name__)
 
+# Reply ID of the automatic reply, so a repeated task does not record it twice
+AUTO_REPLY_ID = "auto"
+
+# Stored as the reply rule of messages answered with the default reply
+DEFAULT_RULE_ID = "default"
+
+SMS_TASK_LOADS = Counter(
+    "skippy_sms_task_loads_total",
+    "How process_sms_task got the SMS: from its payload, by reading it, or by reading it after a stale payload",
+    ["source"]
+)
+SMS_ENQUEUE_TO_PROCESSED = Histogram(
+    "skippy_sms_enqueue_to_processed_seconds",
+    "Time from queueing an SMS to finishing processing it, by how the task got the SMS",
+    ["source"]
+)
+
+
+def task_payload(sms: SMSResponse, version: int = INITIAL_VERSION) -> Dict[str, Any]:
+    """Compact copy of a just-stored SMS to enqueue with process_sms_task."""
+    return {
+        "v": version,
+        "id": sms.id,
+        "from": sms.from_number,
+        "to": sms.to_number,
+        "message": sms.message,
+        "direction": sms.direction,
+        "created": sms.created.isoformat(),
+    }
+
+
+def sms_from_payload(payload: Dict[str, Any]) -> Tuple[SMSResponse, int]:
+    """Rebuild the SMS and its stored version from a task payload."""
+    sms = SMSResponse(
+        id=payload["id"],
+        from_number=payload["from"],
+        to_number=payload["to"],
+        message=payload["message"],
+        direction=payload["direction"],
+        created=payload["created"]
+    )
+    return sms, int(payload["v"])
+
+
+def process_sms(
+    sms_service: SMSService,
+    sms: SMSResponse,
+    send_reply: bool = True,
+    publish: bool = True,
+    record_stats: bool = True,
+    expected_version: Optional[int] = None,
+    reply_id: str = AUTO_REPLY_ID,
+) -> Dict[str, Any]:
+    """Process one stored SMS: pick a reply, mark it processed and send the reply.
+    
+    Shared by process_sms_task and the backfill CLI, which reprocesses
+    historical messages without replying or publishing by default, and
+    records its replies under a `reply_id` of its own. The selected rule and
+    reply are stored with the processed flag either way. With
+    `expected_version` (an SMS taken from a task payload) StaleSMSError is
+    raised before anything is sent if the stored SMS has changed.
+    """
+    # Generate automatic reply
+    reply_message, rule = sms_service.select_reply(sms.message)
+    selection = {"reply_rule": rule.id if rule else DEFAULT_RULE_ID, "selected_reply": reply_message}
+    
+    # Mark SMS as processed
+    if expected_version is None:
+        run_sync(sms_service.mark_sms_processed(sms.id, **selection))
+    else:
+        run_sync(sms_service.mark_sms_processed(sms.id, expected_version=expected_version, **selection))
+    
+    decision = None
+    if send_reply:
+        # Suppress repeated replies to chatty senders
+        decision, delay = get_reply_suppressor().check(
+            sms.from_number, sms.id, rule.suppression_window if rule else None
+        )
+        if decision == SEND:
+            # Record the reply
+            run_sync(sms_service.mark_reply_sent(
+                sms.id, reply_message, to_number=sms.from_number, reply_id=reply_id
+            ))
+        elif decision == COALESCE:
+            logger.info(f"Coalescing reply to {sms.from_number}, sending in {delay:.1f}s")
+            scheduler = get_sms_scheduler()
+            if scheduler is not None:
+                scheduler.schedule(
+                    sms.from_number, reply_message, datetime.now(timezone.utc) + timedelta(seconds=delay),
+                    sms_id=sms.id,
+                    schedule_id=f"reply:{sms.id}" if reply_id == AUTO_REPLY_ID else f"{reply_id}:{sms.id}"
+                )
+            else:
+                send_sms_reply_task.apply_async(
+                    args=[sms.id, reply_message, sms.from_number], countdown=delay
+                )
+        else:
+            logger.info(f"Suppressed reply to {sms.from_number} for SMS {sms.id}")
+    
+    if publish:
+        # Forward to subscribers
+        publish_events("sms.received", [sms.model_dump(mode="json")])
+    
+    stats = get_traffic_stats() if record_stats else None
+    if stats is not None:
+        stats.record_processed(sms.to_number, sms.from_number, sms.created, decision)
+    
+    return {
+        "sms_id": sms.id,
+        "reply_message": reply_message,
+        "reply_rule": rule.id if rule else None,
+        "reply_decision": decision,
+        "processed": True
+    }
+
 
 @celery_app.task(bind=True, max_retries=3)
-def process_sms_task(self, sms_id: str):
-    """Process an SMS asynchronously."""
+def process_sms_task(self, sms_id: str, payload: Optional[Dict[str, Any]] = None):
+    """Process an SMS asynchronously.
+    
+    With a payload from task_payload() the SMS is processed without reading
+    it from DynamoDB; it is read only if the payload is unusable or the
+    stored SMS has changed since the payload was built. A changed SMS that
+    is already processed (by another run of this task) is left alone.
+    """
     try:
         # Initialize service
         sms_service = SMSService()
         
-        # Get the SMS
-        sms = sms_service.get_sms(sms_id)
-        if not sms:
-            logger.error(f"SMS {sms_id} not found")
-            return False
-        
-        # Process the SMS
-        logger.info(f"Processing SMS {sms_id} from {sms.from_number}")
+        result = None
+        source = "read"
+        if payload is not None:
+            try:
+                sms, version = sms_from_payload(payload)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Ignoring unusable payload for SMS {sms_id}: {e}")
+                source = "stale"
+            else:
+                try:
+                    logger.info(f"Processing SMS {sms_id} from {sms.from_number}")
+                    result = process_sms(sms_service, sms, expected_version=version)
+                    source = "payload"
+                except StaleSMSError:
+                    logger.info(f"SMS {sms_id} changed since it was queued, reading it")
+                    source = "stale"
         
-        # Generate automatic reply
-        reply_message = sms_service.generate_reply_message(sms.message)
+        if result is None:
+            # Get the SMS
+            sms = run_sync(sms_service.get_sms(sms_id))
+            if not sms:
+                logger.error(f"SMS {sms_id} not found")
+                return False
+            if source == "stale" and sms.processed:
+                SMS_TASK_LOADS.labels(source).inc()
+                logger.info(f"SMS {sms_id} was already processed, skipping")
+                return {"sms_id": sms_id, "processed": True, "skipped": True}
+            
+            # Process the SMS
+            logger.info(f"Processing SMS {sms_id} from {sms.from_number}")
+            result = process_sms(sms_service, sms)
         
-        # Mark SMS as processed
-        sms_service.mark_sms_processed(sms_id)
-        
-        # Mark reply as sent
-        sms_service.mark_reply_sent(sms_id, reply_message)
+        SMS_TASK_LOADS.labels(source).inc()
+        enqueued_at = task_enqueued_at(self.request)
+        if enqueued_at is not None and not self.request.retries:
+            SMS_ENQUEUE_TO_PROCESSED.labels(source).observe(max(time.time() - enqueued_at, 0.0))
         
         logger.info(f"Successfully processed SMS {sms_id}")
-        return {
-            "sms_id": sms_id,
-            "reply_message": reply_message,
-            "processed": True
-        }
+        return result
         
     except Exception as exc:
         logger.error(f"Error processing SMS {sms_id}: {exc}")
@@ -52,19 +197,33 @@ def process_sms_task(self, sms_id: str):
             return False
 
 
+def deliver_sms(to_number: str, message: str, sms_id: Optional[str] = None):
+    """Send one SMS through 46elks (only logged when 46elks is not configured)."""
+    run_sync(get_elks_client().send(to_number, message, sms_id=sms_id))
+
+
+def send_sms(
+    sms_service: SMSService,
+    to_number: str,
+    message: str,
+    sms_id: Optional[str] = None,
+    reply_id: Optional[str] = None
+):
+    """Send one SMS and, if it replies to `sms_id`, record it as a reply to that SMS."""
+    deliver_sms(to_number, message, sms_id)
+    
+    if sms_id:
+        # Record the reply in database
+        run_sync(sms_service.mark_reply_sent(sms_id, message, to_number=to_number, reply_id=reply_id))
+
+
 @celery_app.task(bind=True, max_retries=3)
 def send_sms_reply_task(self, sms_id: str, reply_message: str, to_number: str):
     """Send an SMS reply asynchronously."""
     try:
         logger.info(f"Sending SMS reply to {to_number}: {reply_message}")
-        
-        # Here you would integrate with 46elks SMS API to send the reply
-        # For now, we'll just log it
-        logger.info(f"SMS Reply sent - To: {to_number}, Message: {reply_message}")
-        
-        # Mark reply as sent in database
-        sms_service = SMSService()
-        sms_service.mark_reply_sent(sms_id, reply_message)
+        # The task ID stays the same across retries
+        send_sms(SMSService(), to_number, reply_message, sms_id, reply_id=self.request.id)
         
         return {
             "sms_id": sms_id,
@@ -76,6 +235,10 @@ def send_sms_reply_task(self, sms_id: str, reply_message: str, to_number: str):
     except Exception as exc:
         logger.error(f"Error sending SMS reply {sms_id}: {exc}")
         
+        if isinstance(exc, ElksError) and not exc.retryable:
+            # Rejected, or possibly accepted by 46elks; sending again could deliver it twice
+            return False
+        
         # Retry the task
         if self.request.retries < self.max_retries:
             raise self.retry(countdown=60 * (2 ** self.request.retries))
@@ -84,6 +247,46 @@ def send_sms_reply_task(self, sms_id: str, reply_message: str, to_number: str):
             return False
 
 
+@celery_app.task(bind=True, max_retries=3)
+def send_scheduled_sms_task(self, items: List[Dict[str, Any]]):
+    """Send a batch of scheduled SMS claimed by the dispatcher (app.scheduler).
+    
+    The replies among them are recorded together afterwards, in as few
+    transactions as possible, keyed by schedule ID.
+    """
+    failed = []
+    dropped = 0
+    replies = []
+    for item in items:
+        try:
+            deliver_sms(item["to"], item["message"], item.get("sms_id"))
+        except Exception as exc:
+            logger.error(f"Error sending scheduled SMS {item['id']}: {exc}")
+            if not isinstance(exc, ElksError) or exc.retryable:
+                failed.append(item)
+            else:
+                # Rejected, or possibly accepted by 46elks; never sent again
+                dropped += 1
+            continue
+        if item.get("sms_id"):
+            replies.append(NewReply(item["sms_id"], item["message"], item["to"], reply_id=item["id"]))
+    
+    if replies:
+        try:
+            run_sync(SMSService().record_replies(replies))
+        except Exception as exc:
+            # The messages are sent; retrying would send them again
+            logger.error(f"Error recording {len(replies)} scheduled replies: {exc}")
+    
+    if failed:
+        # Retry only the messages that failed
+        if self.request.retries < self.max_retries:
+            raise self.retry(args=[failed], countdown=60 * (2 ** self.request.retries))
+        logger.error(f"Max retries exceeded for {len(failed)} scheduled SMS")
+    
+    return {"sent": len(items) - len(failed) - dropped, "failed": len(failed) + dropped}
+
+
 @celery_app.task
 def periodic_sms_cleanup_task():
     """Periodic task to clean up old processed SMS messages."""
@@ -94,18 +297,20 @@ def periodic_sms_cleanup_task():
         sms_service = SMSService()
         
         # Get all SMS messages
-        sms_list = sms_service.list_sms(limit=1000)
+        sms_list = run_sync(sms_service.list_sms_records(limit=1000))
         
         # Delete SMS messages older than 30 days that are processed
-        from datetime import timedelta
+        from datetime import timedelta, timezone
         cutoff_date = datetime.utcnow() - timedelta(days=30)
         deleted_count = 0
         
         for sms in sms_list:
-            if sms.processed:
-                created_at = datetime.fromisoformat(sms.created.replace('Z', '+00:00'))
+            if sms.processed and sms.created:
+                created_at = sms.created
+                if created_at.tzinfo:
+                    created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
                 if created_at < cutoff_date:
-                    if sms_service.delete_sms(sms.id):
+                    if run_sync(sms_service.delete_sms(sms.id)):
                         deleted_count += 1
         
         logger.info(f"Periodic SMS cleanup completed. Deleted {deleted_count} old SMS messages")
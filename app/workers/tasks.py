@@ -0,0 +1,97 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from .celery_app import celery_app
+from .delivery_tasks import publish_events
+from app.models.webhook import WebhookResponse
+from app.services.webhook_service import WebhookService
+from app.utils.helpers import run_sync
+
+logger = logging.getLogger(__name__)
+
+
+def _process_webhook(webhook_service: WebhookService, webhook_id: str) -> Optional[WebhookResponse]:
+    webhook = run_sync(webhook_service.get_webhook(webhook_id))
+    if not webhook:
+        logger.error(f"Webhook {webhook_id} not found")
+        return None
+
+    logger.info(f"Processing {webhook.event_type} webhook {webhook_id} from {webhook.source}")
+
+    # Mark webhook as processed
+    run_sync(webhook_service.mark_webhook_processed(webhook_id))
+    return webhook
+
+
+@celery_app.task(bind=True, max_retries=3)
+def process_webhook_task(self, webhook_id: str):
+    """Process a webhook asynchronously."""
+    try:
+        webhook = _process_webhook(WebhookService(), webhook_id)
+        if not webhook:
+            return False
+
+        # Forward to subscribers
+        publish_events("webhook.received", [webhook.model_dump(mode="json")])
+
+        logger.info(f"Successfully processed webhook {webhook_id}")
+        return {"webhook_id": webhook_id, "processed": True}
+
+    except Exception as exc:
+        logger.error(f"Error processing webhook {webhook_id}: {exc}")
+
+        # Retry the task
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=60 * (2 ** self.request.retries))
+        else:
+            logger.error(f"Max retries exceeded for webhook {webhook_id}")
+            return False
+
+
+@celery_app.task
+def process_webhook_batch_task(webhook_ids: List[str]):
+    """Process the webhooks written by one chunk of a batch ingest."""
+    webhook_service = WebhookService()
+    processed = []
+    for webhook_id in webhook_ids:
+        try:
+            webhook = _process_webhook(webhook_service, webhook_id)
+        except Exception as exc:
+            # Hand failures to the single-webhook task so they get its retries
+            logger.error(f"Error processing webhook {webhook_id}, queueing retry: {exc}")
+            process_webhook_task.delay(webhook_id)
+            continue
+        if webhook:
+            processed.append(webhook.model_dump(mode="json"))
+
+    # Forward the whole chunk to subscribers in one delivery task
+    publish_events("webhook.received", processed)
+    return len(processed)
+
+
+@celery_app.task
+def periodic_cleanup_task():
+    """Periodic task to clean up old processed webhooks."""
+    try:
+        logger.info("Starting periodic webhook cleanup task")
+
+        webhook_service = WebhookService()
+        webhooks = run_sync(webhook_service.list_webhooks(limit=1000))
+
+        # Delete processed webhooks older than 30 days
+        cutoff_date = datetime.utcnow() - timedelta(days=30)
+        deleted_count = 0
+
+        for webhook in webhooks:
+            created_at = webhook.created_at.replace(tzinfo=None)
+            if webhook.processed and created_at < cutoff_date:
+                if run_sync(webhook_service.delete_webhook(webhook.id)):
+                    deleted_count += 1
+
+        logger.info(f"Periodic webhook cleanup completed. Deleted {deleted_count} old webhooks")
+        return deleted_count
+
+    except Exception as exc:
+        logger.error(f"Error in periodic webhook cleanup task: {exc}")
+        return 0
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Send a campaign against a local stub of the 46elks API.
+
+Stores the recipients in chunks in an in-memory campaign table, then runs
+the chunk send tasks on a few worker threads (each with its own event loop
+and connection pool, like Celery worker processes) under one shared send
+budget. The campaign is paused part way through and resumed. Reports the
+achieved send rate against the budget, the busiest one-second window, and
+checks every recipient got exactly one message.
+
+Usage: python examples/benchmark_campaign.py [--recipients 3000] [--rate 200] [--workers 4] [--latency-ms 20]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+sys.path.insert(0, ".")
+
+from app.services.campaigns import CampaignSender, Chunk, LeaseLostError  # noqa: E402
+from app.services.elks_client import ElksClient  # noqa: E402
+from app.services.rate_limiter import SendBudget  # noqa: E402
+from app.utils.helpers import run_sync  # noqa: E402
+
+
+class StubElks(BaseHTTPRequestHandler):
+    """Accepts POST /a1/sms after a fixed latency and records each send."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    latency = 0.02
+    sends = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        time.sleep(self.latency)
+        with self.lock:
+            self.sends.append((time.monotonic(), form["to"][0]))
+        body = json.dumps({"id": uuid.uuid4().hex, "status": "created"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MemoryCampaignStore:
+    """The parts of CampaignStore the sender uses, kept in memory."""
+
+    def __init__(self, campaign, chunks):
+        self.campaign = campaign
+        self.chunks = chunks  # index -> {"recipients", "position", "status", "token", "until"}
+        self.lock = threading.Lock()
+
+    def get(self, campaign_id):
+        return self.campaign
+
+    def status(self, campaign_id):
+        return self.campaign.status
+
+    def claim_chunk(self, campaign_id, index, lease):
+        with self.lock:
+            chunk = self.chunks[index]
+            if chunk["status"] == "done" or (chunk["status"] == "running" and chunk["until"] > time.time()):
+                return None
+            chunk.update(status="running", token=uuid.uuid4().hex, until=time.time() + lease)
+            return Chunk(campaign_id, index, chunk["recipients"], chunk["position"], chunk["token"])
+
+    def save_progress(self, chunk, position, sent, failed, status, lease=0.0):
+        with self.lock:
+            stored = self.chunks[chunk.chunk_index]
+            if stored["token"] != chunk.lease_token:
+                raise LeaseLostError(chunk.chunk_index)
+            stored.update(position=position, status=status, until=time.time() + lease)
+            if status != "running":
+                stored["token"] = None
+            self.campaign.sent += sent
+            self.campaign.failed += failed
+            self.campaign.chunks_done += status == "done"
+            if self.campaign.chunks_done == self.campaign.chunks:
+                self.campaign.status = "completed"
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipients", type=int, default=3000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200.0, help="Send budget (messages per second)")
+    parser.add_argument("--workers", type=int, default=4, help="Chunk tasks running at once")
+    parser.add_argument("--concurrency", type=int, default=20, help="In-flight sends per chunk task")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Stub 46elks response time")
+    args = parser.parse_args()
+
+    StubElks.latency = args.latency_ms / 1000
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubElks)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_port}/a1"
+
+    numbers = [f"+4670{i:07d}" for i in range(args.recipients)]
+    chunks = {
+        index: {"recipients": [{"to": to, "vars": {"name": f"Customer {to[-4:]}"}}
+                               for to in numbers[start:start + args.chunk_size]],
+                "position": 0, "status": "pending", "token": None, "until": 0.0}
+        for index, start in enumerate(range(0, len(numbers), args.chunk_size))
+    }
+    campaign = SimpleNamespace(id="bench", template="Hi {name}, our spring sale starts today!",
+                               from_number="Skippy", status="running", chunks=len(chunks),
+                               chunks_done=0, sent=0, failed=0)
+    store = MemoryCampaignStore(campaign, chunks)
+    budget = SendBudget(args.rate, burst=max(1, int(args.rate / 10)))
+    local = threading.local()
+
+    def send_chunk(index):
+        # One client per worker thread, as each Celery worker process has its own
+        if not hasattr(local, "sender"):
+            client = ElksClient(api_url, "user", "secret", max_connections=args.concurrency)
+            local.sender = CampaignSender(store, client, budget, concurrency=args.concurrency,
+                                          checkpoint_interval=0.2)
+        return run_sync(local.sender.send_chunk("bench", index))
+
+    print("🚀 Campaign Send Benchmark")
+    print("=" * 40)
+    print(f"{args.recipients} recipients in {len(chunks)} chunks, budget {args.rate:.0f}/s, "
+          f"{args.workers} workers x {args.concurrency} in flight, {args.latency_ms:.0f} ms per send\n")
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.workers) as workers:
+        pending = [workers.submit(send_chunk, index) for index in chunks]
+        # Pause once roughly a third has been sent, then resume
+        while len(StubElks.sends) < args.recipients // 3:
+            time.sleep(0.01)
+        campaign.status = "paused"
+        paused_at = time.monotonic()
+        results = [future.result() for future in pending]
+        sent_before_resume = len(StubElks.sends)
+        time.sleep(0.5)
+        paused_sends = len(StubElks.sends) - sent_before_resume
+        paused_for = time.monotonic() - paused_at
+        campaign.status = "running"
+        requeued = [index for index, chunk in chunks.items() if chunk["status"] != "done"]
+        results += [future.result() for future in [workers.submit(send_chunk, index) for index in requeued]]
+    elapsed = time.monotonic() - start - paused_for
+    server.shutdown()
+
+    per_number = Counter(to for _, to in StubElks.sends)
+    duplicates = sum(count - 1 for count in per_number.values() if count > 1)
+    missing = args.recipients - len(per_number)
+    times = sorted(t for t, _ in StubElks.sends)
+    busiest, low = 0, 0
+    for high, t in enumerate(times):
+        while times[low] <= t - 1.0:
+            low += 1
+        busiest = max(busiest, high - low + 1)
+
+    statuses = Counter(result.status for result in results)
+    print(f"Paused after {sent_before_resume} sends; {paused_sends} sent while paused")
+    print(f"Chunk tasks: {dict(statuses)}")
+    print(f"Sent {campaign.sent} (failed {campaign.failed}) in {elapsed:.2f} s sending time: "
+          f"{campaign.sent / elapsed:,.0f}/s against a budget of {args.rate:.0f}/s")
+    print(f"Busiest 1 s window at the stub: {busiest} sends (budget {args.rate:.0f} + burst {budget.burst}, "
+          f"plus latency jitter)")
+    print(f"Campaign {campaign.status}; duplicates {duplicates}, missing {missing}")
+
+
+if __name__ == "__main__":
+    main()
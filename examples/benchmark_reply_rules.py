@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark the auto-reply rule engine with thousands of rules.
+"""
+
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+from app.models.reply_rule import ReplyRule
+from app.services.reply_rules import CompiledRuleSet
+
+
+def random_word(rng: random.Random, min_len: int = 4, max_len: int = 10) -> str:
+    """Generate a random lowercase word."""
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+
+def build_rules(rng: random.Random, count: int) -> list:
+    """Build a mix of keyword, word and regex rules."""
+    rules = []
+    for i in range(count):
+        rule_type = "regex" if i % 100 == 0 else ("word" if i % 2 else "keyword")
+        pattern = random_word(rng)
+        if rule_type == "regex":
+            pattern = rf"{pattern}\s+\d+"
+        rules.append(ReplyRule(
+            id=f"rule-{i}",
+            type=rule_type,
+            pattern=pattern,
+            reply=f"Reply {i}",
+            priority=rng.randint(0, 100)
+        ))
+    return rules
+
+
+def main():
+    """Run the benchmark."""
+    rng = random.Random(42)
+    messages = [
+        " ".join(random_word(rng, 2, 9) for _ in range(25))[:160]
+        for _ in range(2000)
+    ]
+
+    print("🚀 Reply Rule Engine Benchmark")
+    print("=" * 40)
+
+    for count in (10, 1000, 5000, 10000):
+        rules = build_rules(rng, count)
+
+        start = time.perf_counter()
+        compiled = CompiledRuleSet(rules)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        matched = sum(1 for message in messages if compiled.match(message) is not None)
+        per_message_us = (time.perf_counter() - start) / len(messages) * 1_000_000
+
+        print(f"{count:>6} rules: compile {compile_ms:8.1f} ms, "
+              f"match {per_message_us:7.1f} µs/message ({matched} matched)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark SMS model construction and JSON encoding for list-sized payloads.
+"""
+
+import json
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.models.sms import SMSRecord, SMSResponse
+
+
+def make_items(count: int) -> list:
+    """Build DynamoDB-shaped SMS rows."""
+    return [
+        {
+            "id": f"sf{i:030x}",
+            "from_number": "+46706861004",
+            "to_number": "+46706860000",
+            "message": "Hello how are you? " * 3,
+            "direction": "incoming",
+            "created": "2018-07-13T13:57:23.741000",
+            "processed": True,
+            "processed_at": "2018-07-13T13:58:00.000000",
+            "reply_sent": False,
+            "reply_message": None,
+        }
+        for i in range(count)
+    ]
+
+
+def rate(label: str, count: int, function, repeat: int = 20):
+    """Print objects per second for a function processing `count` objects."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {count * repeat / elapsed:>12,.0f} objects/s")
+
+
+def main():
+    """Run the benchmark."""
+    print("🚀 SMS Serialization Benchmark")
+    print("=" * 40)
+
+    for count in (100, 1000):
+        items = make_items(count)
+        validated = [SMSResponse(**item) for item in items]
+        trusted = [SMSResponse.from_item(item) for item in items]
+        records = [SMSRecord.from_item(item) for item in items]
+
+        print(f"\n{count} items per payload")
+        print("Construction:")
+        rate("SMSResponse(**item) (validated)", count, lambda: [SMSResponse(**item) for item in items])
+        rate("SMSResponse.from_item", count, lambda: [SMSResponse.from_item(item) for item in items])
+        rate("SMSRecord.from_item", count, lambda: [SMSRecord.from_item(item) for item in items])
+
+        print("Encoding:")
+        rate("jsonable_encoder + json.dumps", count,
+             lambda: json.dumps(jsonable_encoder(validated)).encode())
+        rate("model_dump + orjson.dumps", count,
+             lambda: orjson.dumps([sms.model_dump() for sms in trusted]))
+        rate("SMSRecord.to_dict + orjson.dumps", count,
+             lambda: orjson.dumps([record.to_dict() for record in records]))
+
+
+if __name__ == "__main__":
+    main()
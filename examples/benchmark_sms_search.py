@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SMS full-text search index at millions of messages.
+
+Usage: python examples/benchmark_sms_search.py [--messages 1000000] [--path /tmp/sms.db]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, ".")
+
+from app.services.sms_search import SMSSearchIndex, row_from_item
+
+
+def build_vocabulary(rng: random.Random, size: int) -> list:
+    """Build random lowercase words; earlier words will be more frequent."""
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_items(rng: random.Random, vocabulary: list, numbers: list, start: int, count: int, total: int) -> list:
+    """Build SMS items with Zipf-like word frequencies, in ingest order over one year."""
+    base = datetime(2024, 1, 1)
+    step = 365 * 24 * 3600 / max(total, 1)
+    items = []
+    for i in range(start, start + count):
+        words = [vocabulary[min(int(rng.paretovariate(1.1)) - 1, len(vocabulary) - 1)] for _ in range(rng.randint(5, 25))]
+        created = base + timedelta(seconds=i * step + rng.uniform(-60, 60))
+        items.append({"id": f"sms-{i}", "from_number": rng.choice(numbers), "to_number": rng.choice(numbers[:10]),
+                      "created": created.isoformat(), "message": " ".join(words)})
+    return items
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p = lambda q: samples[min(int(len(samples) * q), len(samples) - 1)] * 1000
+    return f"p50 {p(0.5):7.2f} ms  p95 {p(0.95):7.2f} ms  p99 {p(0.99):7.2f} ms"
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="Runs per query type")
+    parser.add_argument("--path", default=None, help="Index file (defaults to a temporary file)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = build_vocabulary(rng, 50_000)
+    numbers = [f"+4670{rng.randint(0, 9999999):07d}" for _ in range(10_000)]
+    path = args.path or os.path.join(tempfile.mkdtemp(), "sms.db")
+    index = SMSSearchIndex(path)
+
+    print("🚀 SMS Search Benchmark")
+    print("=" * 40)
+
+    existing = index.count()
+    start = time.perf_counter()
+    batch = 10_000
+    for offset in range(existing, args.messages, batch):
+        items = make_items(rng, vocabulary, numbers, offset, min(batch, args.messages - offset), args.messages)
+        index.apply([("upsert", row_from_item(item)) for item in items])
+    elapsed = time.perf_counter() - start
+    added = args.messages - existing
+    if added > 0:
+        print(f"Indexed {added:,} messages in {elapsed:.1f} s ({added / elapsed:,.0f}/s)")
+    print(f"Index size: {os.path.getsize(path) / 1024 / 1024:,.0f} MiB ({index.count():,} messages)\n")
+
+    common, mid, rare = vocabulary[0], vocabulary[50], vocabulary[20_000]
+    queries = {
+        "common word": dict(query=common),
+        "mid-frequency word": dict(query=mid),
+        "rare word": dict(query=rare),
+        "two words": dict(query=f"{common} {mid}"),
+        "phrase": dict(query=f'"{common} {vocabulary[1]}"'),
+        "prefix (3 chars)": dict(query=mid[:3] + "*"),
+        "word + number": dict(query=common, number=numbers[0]),
+        "word + to_number + month": dict(query=mid, to_number=numbers[1],
+                                         start=datetime(2024, 6, 1), end=datetime(2024, 6, 30)),
+        "word by relevance": dict(query=mid, order="relevance"),
+    }
+    for label, kwargs in queries.items():
+        samples = []
+        hits = 0
+        for _ in range(args.queries):
+            query_start = time.perf_counter()
+            hits = len(index.search(limit=50, **kwargs))
+            samples.append(time.perf_counter() - query_start)
+        print(f"{label:<26} {percentiles(samples)}  ({hits} hits, mean {statistics.mean(samples) * 1000:.2f} ms)")
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
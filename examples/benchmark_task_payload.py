@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compare process_sms_task with and without the message in the task payload.
+
+Runs the task in-process against an in-memory SMS table that adds a fixed
+round-trip latency to each DynamoDB call, and reports the reads, read
+capacity and task latency of both modes. In production compare
+skippy_dynamodb_consumed_capacity_units_total{table="skippy_sms",operation="GetItem"}
+and skippy_sms_enqueue_to_processed_seconds by source instead.
+
+Usage: python examples/benchmark_task_payload.py [--messages 500] [--latency-ms 8] [--stale 0.01]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+
+# Keep the run local: no Redis, subscribers, rollups or search index
+os.environ.setdefault("REPLY_SUPPRESSION_WINDOW", "0")
+os.environ.setdefault("WEBHOOK_DELIVERY_ENABLED", "false")
+os.environ.setdefault("TRAFFIC_STATS_ENABLED", "false")
+os.environ.setdefault("SMS_SEARCH_ENABLED", "false")
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from app.models.sms import SMSResponse  # noqa: E402
+from app.services.sms_service import INITIAL_VERSION  # noqa: E402
+from app.workers.sms_tasks import process_sms_task, task_payload  # noqa: E402
+
+# Eventually consistent GetItem of an item up to 4 KB
+READ_UNITS_PER_GET = 0.5
+
+
+class LatencyTable:
+    """In-memory SMS table adding a round-trip latency to every call."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.items = {}
+        self.calls = {"GetItem": 0, "UpdateItem": 0}
+
+    def get_item(self, Key, **kwargs):
+        self.calls["GetItem"] += 1
+        time.sleep(self.latency)
+        item = self.items.get(Key["id"])
+        return {"Item": dict(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ConditionExpression=None, **kwargs):
+        self.calls["UpdateItem"] += 1
+        time.sleep(self.latency)
+        item = self.items[Key["id"]]
+        if ConditionExpression and item.get("version") != ExpressionAttributeValues[":expected_version"]:
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+        for name in ("processed", "processed_at", "reply_sent", "reply_message"):
+            if f":{name}" in ExpressionAttributeValues:
+                item[name] = ExpressionAttributeValues[f":{name}"]
+        item["version"] = item.get("version", 0) + 1
+        return {"Attributes": dict(item)}
+
+
+def store(table: LatencyTable, count: int, stale: float, rng: random.Random) -> list:
+    """Store `count` new messages; a `stale` share is changed again before processing."""
+    messages = []
+    for i in range(count):
+        sms = SMSResponse(id=f"sms-{i}", from_number="+46700000001", to_number="+46700000000",
+                          message="help with my order", direction="incoming", created=datetime(2024, 5, 1))
+        table.items[sms.id] = {**sms.model_dump(mode="json"), "version": INITIAL_VERSION}
+        if rng.random() < stale:
+            table.items[sms.id]["version"] += 1
+        messages.append(sms)
+    return messages
+
+
+def run(messages: list, table: LatencyTable, with_payload: bool) -> list:
+    samples = []
+    for sms in messages:
+        start = time.perf_counter()
+        if with_payload:
+            process_sms_task(sms.id, task_payload(sms))
+        else:
+            process_sms_task(sms.id)
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=8.0, help="Round-trip latency per DynamoDB call")
+    parser.add_argument("--stale", type=float, default=0.01, help="Share of messages changed before processing")
+    args = parser.parse_args()
+
+    print("🚀 process_sms_task Payload Benchmark")
+    print("=" * 40)
+    print(f"{args.messages} messages, {args.latency_ms:.1f} ms per DynamoDB call, {args.stale:.1%} stale\n")
+
+    results = {}
+    for label, with_payload in (("id only", False), ("payload", True)):
+        table = LatencyTable(args.latency_ms / 1000)
+        messages = store(table, args.messages, args.stale, random.Random(42))
+        with patch("app.services.sms_service.DynamoDBService") as db_service:
+            db_service.return_value.dynamodb.Table.return_value = table
+            samples = run(messages, table, with_payload)
+        p = lambda q: samples[min(int(len(samples) * q), len(samples) - 1)] * 1000
+        reads = table.calls["GetItem"]
+        results[label] = (reads, p(0.5))
+        print(f"{label:<8} GetItem {reads:>6} ({reads * READ_UNITS_PER_GET:,.1f} RCU)  "
+              f"UpdateItem {table.calls['UpdateItem']:>6}  p50 {p(0.5):6.2f} ms  p95 {p(0.95):6.2f} ms")
+
+    saved_reads = results["id only"][0] - results["payload"][0]
+    saved_ms = results["id only"][1] - results["payload"][1]
+    print(f"\nSaved {saved_reads} reads ({saved_reads * READ_UNITS_PER_GET:,.1f} RCU) "
+          f"and {saved_ms:.2f} ms p50 per message")
+
+
+if __name__ == "__main__":
+    main()
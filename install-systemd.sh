@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Skippy Systemd Installation Script
-# This script installs and configures Skippy as a systemd service with auto-reload
+# This script installs and configures Skippy as a systemd service
 
 set -e  # Exit on any error
 
@@ -134,7 +134,7 @@ create_service_file() {
     # Create the service file content
     cat > /tmp/${SERVICE_NAME}.service << EOF
 [Unit]
-Description=Skippy Webhook Service with Auto-Reload
+Description=Skippy Webhook Service
 Documentation=https://github.com/your-repo/skippy
 After=network.target docker.service
 Wants=docker.service
@@ -148,8 +148,13 @@ Environment=PATH=${VENV_DIR}/bin
 Environment=PYTHONPATH=${PROJECT_DIR}
 Environment=PYTHONUNBUFFERED=1
 
-# Main application with auto-reload (restricted to project directory)
-ExecStart=${VENV_DIR}/bin/uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload --reload-dir ${PROJECT_DIR}
+# Main application: pre-fork server with one worker per core
+ExecStart=${VENV_DIR}/bin/python -m app.server --host 0.0.0.0 --port 8000
+
+# Graceful shutdown: SIGTERM to the master, which drains the workers
+KillMode=mixed
+KillSignal=SIGTERM
+TimeoutStopSec=60
 
 # Restart configuration
 Restart=always
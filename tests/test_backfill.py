@@ -0,0 +1,146 @@
+from datetime import datetime
+
+import pytest
+from unittest.mock import patch
+
+from app.backfill import Checkpoint, Options, Pacer, Selection, matches, run_backfill, summarize
+
+
+def make_item(sms_id, created="2024-05-10T12:00:00+00:00", processed=True, reply_sent=False):
+    return {
+        "id": sms_id, "from_number": "+46711111111", "to_number": "+46700000000",
+        "message": "help me", "direction": "incoming", "created": created,
+        "processed": processed, "processed_at": None, "reply_sent": reply_sent, "reply_message": None,
+    }
+
+
+class FakeTable:
+    """Scan pages per segment; raises once on the page listed in `fail_on`."""
+
+    def __init__(self, pages, fail_on=None):
+        self.pages = pages
+        self.fail_on = fail_on
+        self.scans = []
+
+    def scan(self, **kwargs):
+        self.scans.append(kwargs)
+        segment = kwargs["Segment"]
+        index = int(kwargs.get("ExclusiveStartKey", {}).get("page", 0))
+        if (segment, index) == self.fail_on:
+            self.fail_on = None
+            raise RuntimeError("connection reset")
+        page = {"Items": self.pages[segment][index]}
+        if index + 1 < len(self.pages[segment]):
+            page["LastEvaluatedKey"] = {"page": str(index + 1)}
+        return page
+
+
+@pytest.fixture
+def table():
+    return FakeTable({
+        0: [[make_item("a"), make_item("b", processed=False)], [make_item("c", created="2024-04-01T00:00:00")]],
+        1: [[make_item("d", reply_sent=True)]],
+    })
+
+
+@pytest.fixture
+def sms_service(table):
+    with patch('app.backfill.SMSService') as service_class:
+        service = service_class.return_value
+        service.db_service.dynamodb.Table.return_value = table
+        service.select_reply.return_value = ("Reply", None)
+        yield service
+
+
+def test_selection_by_time_and_state():
+    """Test messages are selected by creation time and processing state."""
+    may = Selection(start=datetime(2024, 5, 1), end=datetime(2024, 6, 1))
+    assert matches(make_item("a"), may)
+    assert not matches(make_item("a", created="2024-06-01T00:00:00Z"), may)
+    assert matches(make_item("a", created="2024-05-31T23:00:00-01:00"), Selection(end=datetime(2024, 6, 1, 1)))
+    assert not matches(make_item("a"), Selection(state="unprocessed"))
+    assert matches(make_item("a", processed=False), Selection(state="unprocessed"))
+    assert not matches(make_item("a", reply_sent=True), Selection(state="unreplied"))
+
+
+def test_pacer_limits_rate():
+    """Test calls are spaced out to the rate ceiling."""
+    pacer = Pacer(rate=100)
+    start = datetime.now()
+    for _ in range(6):
+        pacer.wait()
+    assert (datetime.now() - start).total_seconds() >= 0.045
+
+
+@patch('app.workers.sms_tasks.process_sms')
+def test_backfill_reprocesses_selected_messages(mock_process, sms_service, table):
+    """Test every segment is scanned and selected messages are reprocessed quietly."""
+    mock_process.return_value = {"reply_rule": "help"}
+    summary = run_backfill(Selection(start=datetime(2024, 5, 1)), Options(), segments=2, processes=1)
+
+    assert (summary["scanned"], summary["selected"], summary["processed"]) == (4, 3, 3)
+    assert summary["rules"] == {"help": 3}
+    assert {call.args[1].id for call in mock_process.call_args_list} == {"a", "b", "d"}
+    assert mock_process.call_args.kwargs == {"send_reply": False, "publish": False, "record_stats": False}
+    assert {scan["TotalSegments"] for scan in table.scans} == {2}
+
+
+@patch('app.workers.sms_tasks.process_sms')
+def test_backfill_resumes_from_checkpoint(mock_process, sms_service, table, tmp_path):
+    """Test an interrupted run continues after the last completed batch."""
+    mock_process.return_value = {"reply_rule": None}
+    job = {"state": "all"}
+    table.fail_on = (0, 1)
+    with pytest.raises(RuntimeError):
+        run_backfill(Selection(), Options(), segments=2, processes=1, checkpoint=Checkpoint(str(tmp_path), job))
+    assert mock_process.call_count == 2
+
+    summary = run_backfill(Selection(), Options(), segments=2, processes=1, checkpoint=Checkpoint(str(tmp_path), job))
+    assert [call.args[1].id for call in mock_process.call_args_list] == ["a", "b", "c", "d"]
+    assert summary["processed"] == 4
+    assert table.scans[-2]["ExclusiveStartKey"] == {"page": "1"}
+
+    # Finished segments are not scanned again
+    scans = len(table.scans)
+    run_backfill(Selection(), Options(), segments=2, processes=1, checkpoint=Checkpoint(str(tmp_path), job))
+    assert len(table.scans) == scans
+
+    with pytest.raises(ValueError):
+        Checkpoint(str(tmp_path), {"state": "unprocessed"})
+
+
+@patch('app.workers.sms_tasks.process_sms')
+def test_dry_run_estimates_without_processing(mock_process, sms_service):
+    """Test a dry run evaluates rules and estimates duration at the rate ceiling."""
+    summary = run_backfill(Selection(), Options(dry_run=True, rate=2.0), segments=2, processes=1)
+
+    mock_process.assert_not_called()
+    assert summary["selected"] == 4
+    assert summary["rules"] == {"default": 4}
+    assert summary["estimated_min_seconds"] == 2.0
+    assert summary["rule_us_per_message"] is not None
+
+
+def test_dry_run_estimate_includes_the_full_scan():
+    """Test a sparse selection without a rate ceiling still costs the scan of the whole table."""
+    results = [
+        {"segment": segment, "scanned": 100000, "selected": 10 * segment, "processed": 0, "failed": 0,
+         "failed_ids": [], "rules": {}, "scan_seconds": 30.0, "rule_seconds": 0.01}
+        for segment in range(4)
+    ]
+
+    summary = summarize(results, 60.0, Options(dry_run=True), processes=2)
+
+    assert summary["estimated_min_seconds"] == 60.0
+
+
+@patch('app.workers.sms_tasks.process_sms')
+def test_backfill_replies_use_the_run_reply_id(mock_process, sms_service, tmp_path):
+    """Test replies sent by a run are recorded under its own ID, kept when the run resumes."""
+    mock_process.return_value = {"reply_rule": None}
+    checkpoint = Checkpoint(str(tmp_path), {"state": "all"})
+    run_backfill(Selection(), Options(send_replies=True), segments=2, processes=1, checkpoint=checkpoint)
+
+    assert mock_process.call_args.kwargs["reply_id"] == f"backfill:{checkpoint.run_id}"
+    assert Checkpoint(str(tmp_path), {"state": "all"}).run_id == checkpoint.run_id
+    assert Checkpoint(str(tmp_path), {"state": "all"}, restart=True).run_id != checkpoint.run_id
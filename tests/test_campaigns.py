@@ -0,0 +1,244 @@
+from datetime import datetime
+
+import httpx
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.main import app
+from app.models.campaign import Campaign, CampaignRecipient
+from app.services.campaigns import (
+    CampaignSender, CampaignStateError, CampaignStore, Chunk, RecipientUploader, compile_template
+)
+from app.services.elks_client import ElksClient, ElksError
+from app.services.rate_limiter import SendBudget
+
+client = TestClient(app)
+HEADERS = {"X-Admin-Token": "secret"}
+
+
+def make_campaign(status="running", **kwargs):
+    return Campaign(id="c1", name="Spring sale", template="Hi {name}!", from_number="Skippy",
+                    status=status, created_at=datetime(2024, 5, 1), **kwargs)
+
+
+def test_template_renders_plain_placeholders_only():
+    """Test placeholders are filled per recipient and anything beyond plain names is refused."""
+    render = compile_template("Hi {name}, {{code}}: {code}")
+    assert render({"name": "Ada", "code": "X1"}) == "Hi Ada, {code}: X1"
+    assert render({}) == "Hi , {code}: "
+
+    for template in ("{0}", "{}", "{name.__class__}", "{name!r}", "{name:>10}"):
+        with pytest.raises(ValueError):
+            compile_template(template)
+
+
+def test_send_budget_grants_burst_then_spaces_sends():
+    """Test the budget grants up to its burst at once and then one token per interval."""
+    budget = SendBudget(rate=10.0, burst=5)
+
+    assert budget.take(8, now=100.0) == (5, 0.0)
+    granted, wait = budget.take(1, now=100.0)
+    assert granted == 0 and wait == pytest.approx(0.1)
+    assert budget.take(8, now=100.25)[0] == 2
+
+
+@pytest.mark.asyncio
+async def test_elks_client_retries_only_sends_that_were_not_accepted():
+    """Test connection errors and 429 are retried, while read errors, 5xx and rejections are not."""
+    outcomes = [httpx.ConnectError("refused"), 429, 200, httpx.ReadTimeout("slow"), 503, 400]
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"id": "s1"})
+
+    elks = ElksClient("https://elks.test/a1", "user", "secret", backoff=0.0,
+                      transport=httpx.MockTransport(handler))
+
+    assert await elks.send("+46700000001", "Hi") == "s1"
+    assert len(requests) == 3
+    for _ in range(3):
+        with pytest.raises(ElksError) as error:
+            await elks.send("+46700000001", "Hi")
+        assert not error.value.retryable
+    # One request each: 46elks may have accepted the message
+    assert len(requests) == 6
+
+
+@pytest.mark.asyncio
+async def test_elks_client_asks_for_delivery_reports():
+    """Test sends carry the whendelivered URL, tagged with the SMS they reply to."""
+    forms = []
+
+    def handler(request):
+        forms.append(dict(httpx.QueryParams(request.content.decode())))
+        return httpx.Response(200, json={"id": "s1"})
+
+    elks = ElksClient("https://elks.test/a1", "user", "secret",
+                      delivery_report_url="https://skippy.test/elks/delivery",
+                      transport=httpx.MockTransport(handler))
+
+    await elks.send("+46700000001", "Hi", sms_id="sms 1")
+    await elks.send("+46700000001", "Hi")
+
+    assert [form["whendelivered"] for form in forms] == [
+        "https://skippy.test/elks/delivery?sms_id=sms+1",
+        "https://skippy.test/elks/delivery",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unexpected_send_errors_count_as_failed():
+    """Test a malformed 46elks response or an unexpected error fails one send, not the window."""
+    elks = ElksClient("https://elks.test/a1", "user", "secret",
+                      transport=httpx.MockTransport(lambda request: httpx.Response(200, text="OK")))
+    with pytest.raises(ElksError) as error:
+        await elks.send("+46700000001", "Hi")
+    assert not error.value.retryable
+
+    store = MagicMock()
+    store.get.return_value = make_campaign()
+    store.claim_chunk.return_value = Chunk("c1", 0, [{"to": "+46700000001"}, {"to": "+46700000002"}], 0, "token")
+    store.status.return_value = "running"
+    sender_client = MagicMock()
+    sender_client.send = AsyncMock(side_effect=[RuntimeError("boom"), None])
+    sender = CampaignSender(store, sender_client, SendBudget(rate=1000.0, burst=100))
+
+    result = await sender.send_chunk("c1", 0)
+
+    assert (result.status, result.sent, result.failed) == ("done", 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_sender_checkpoints_and_releases_chunk_on_pause():
+    """Test a chunk is sent under the budget and handed back at its position when paused."""
+    store = MagicMock()
+    store.get.return_value = make_campaign()
+    recipients = [{"to": f"+4670000000{i}", "vars": {"name": f"n{i}"}} for i in range(7)]
+    chunk = Chunk("c1", 0, recipients, 1, "token")
+    store.claim_chunk.return_value = chunk
+    store.status.side_effect = ["running", "paused", "paused"]
+    elks = MagicMock()
+    elks.send = AsyncMock(side_effect=[None, ElksError("HTTP 400", retryable=False), None, None])
+    sender = CampaignSender(store, elks, SendBudget(rate=1000.0, burst=100), concurrency=2,
+                            checkpoint_interval=0.0)
+
+    result = await sender.send_chunk("c1", 0)
+
+    assert result.status == "paused" and (result.sent, result.failed) == (3, 1)
+    assert not result.requeue
+    assert [call.args[1:] for call in store.save_progress.call_args_list] == [
+        (3, 1, 1, "running", 300.0),
+        (5, 2, 0, "pending"),
+    ]
+    assert elks.send.call_args_list[0].args == ("+46700000001", "Hi n1!", "Skippy")
+
+
+@pytest.mark.asyncio
+async def test_sender_skips_paused_campaigns_and_claimed_chunks():
+    """Test nothing is sent unless the campaign runs and the chunk could be claimed."""
+    store = MagicMock()
+    sender = CampaignSender(store, MagicMock(), SendBudget(rate=10.0, burst=1))
+
+    store.get.return_value = make_campaign(status="paused")
+    assert (await sender.send_chunk("c1", 0)).status == "skipped"
+    store.claim_chunk.assert_not_called()
+
+    store.get.return_value = make_campaign()
+    store.claim_chunk.return_value = None
+    assert (await sender.send_chunk("c1", 0)).status == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_sender_releases_chunk_when_budget_is_unavailable():
+    """Test a chunk is handed back at its position instead of waiting for budget past its lease."""
+    store = MagicMock()
+    store.get.return_value = make_campaign()
+    recipients = [{"to": f"+4670000000{i}"} for i in range(4)]
+    store.claim_chunk.return_value = Chunk("c1", 0, recipients, 0, "token")
+    elks = MagicMock()
+    elks.send = AsyncMock()
+    budget = MagicMock()
+    budget.acquire = AsyncMock(side_effect=[1, 0])
+    sender = CampaignSender(store, elks, budget, concurrency=4, budget_timeout=0.01)
+
+    result = await sender.send_chunk("c1", 0)
+
+    assert (result.status, result.sent, result.requeue) == ("throttled", 1, True)
+    assert store.save_progress.call_args.args[1:] == (1, 1, 0, "pending")
+    assert budget.acquire.await_args.kwargs == {"timeout": 0.01}
+
+
+def test_add_chunk_conflicts_once_campaign_has_started():
+    """Test a chunk write that lost the race with /start is reported instead of overwriting a claimed chunk."""
+    db_service = MagicMock()
+    store = CampaignStore("campaigns", "chunks", db_service=db_service)
+    store.campaigns.update_item.return_value = {"Attributes": {"chunks": 3}}
+    write = db_service.dynamodb.meta.client.transact_write_items
+    write.side_effect = ClientError({
+        "Error": {"Code": "TransactionCanceledException"},
+        "CancellationReasons": [{"Code": "ConditionalCheckFailed"},
+                                {"Code": "ConditionalCheckFailed", "Item": {"status": {"S": "running"}}}],
+    }, "TransactWriteItems")
+
+    with pytest.raises(CampaignStateError) as error:
+        store.add_chunk("c1", [{"to": "+46700000001"}])
+
+    assert error.value.status == "running"
+    put, update = write.call_args.kwargs["TransactItems"]
+    assert put["Put"]["ConditionExpression"] == "attribute_not_exists(id)"
+    assert put["Put"]["Item"]["id"] == {"S": "c1#2"}
+    assert update["Update"]["ConditionExpression"] == "#s = :draft"
+
+
+@pytest.mark.asyncio
+async def test_uploader_writes_full_chunks():
+    """Test recipients are stored in chunks of chunk_size and rejects are reported."""
+    store = MagicMock()
+    uploader = RecipientUploader(store, "c1", chunk_size=2)
+    for i in range(5):
+        await uploader.add(CampaignRecipient(to=f"+4670000000{i}"))
+    uploader.reject(6, "to: invalid")
+
+    response = await uploader.close()
+
+    assert (response.accepted, response.invalid, response.chunks) == (5, 1, 3)
+    assert sorted(len(call.args[1]) for call in store.add_chunk.call_args_list) == [1, 2, 2]
+    assert response.errors == ["line 6: to: invalid"]
+
+
+@patch('app.main.settings.admin_token', "secret")
+@patch('app.main.queue_chunks')
+@patch('app.main.get_campaign_store')
+@patch('app.main.RecipientUploader')
+def test_campaign_endpoints(mock_uploader, mock_get_store, mock_queue_chunks):
+    """Test uploading NDJSON recipients, starting, and pausing a campaign that is not running."""
+    store = mock_get_store.return_value
+    store.get.return_value = make_campaign(status="draft")
+    uploader = mock_uploader.return_value
+    uploader.add = AsyncMock()
+    uploader.close = AsyncMock(side_effect=lambda: MagicMock(
+        error=None, model_dump=lambda: {"accepted": uploader.add.await_count}
+    ))
+    body = b'{"to": "+46700000001", "vars": {"name": "Ada"}}\n{"to": "0701"}\n{"to": "+46700000002"}\n'
+
+    response = client.post("/campaigns/c1/recipients", content=body,
+                           headers={**HEADERS, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json() == {"accepted": 2}
+    assert uploader.reject.call_args.args[0] == 2
+
+    store.start.return_value = make_campaign(chunks=3)
+    assert client.post("/campaigns/c1/start", headers=HEADERS).status_code == 200
+    mock_queue_chunks.assert_called_once_with("c1", 3)
+
+    store.pause.side_effect = CampaignStateError("c1", "completed")
+    response = client.post("/campaigns/c1/pause", headers=HEADERS)
+    assert response.status_code == 409
+    store.pause.side_effect = CampaignStateError("c2")
+    assert client.post("/campaigns/c2/pause", headers=HEADERS).status_code == 404
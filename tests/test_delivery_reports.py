@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.main import app
+from app.models.delivery_report import DeliveryReport, DeliveryStatus
+from app.services.delivery_reports import DeliveryReportBuffer, DeliveryStatusStore
+
+client = TestClient(app)
+
+
+class FakeStore:
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.writes = []
+
+    def write(self, report):
+        if report.id in self.fail_ids:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "UpdateItem")
+        self.writes.append(report)
+        return True
+
+
+def report(message_id, status, delivered=None, sms_id=None):
+    return DeliveryReport(id=message_id, status=status, delivered=delivered, sms_id=sms_id)
+
+
+def test_later_states_supersede_earlier_ones():
+    """Test final states beat 'sent' and later delivery times win."""
+    sent = report("m1", "sent")
+    delivered = report("m1", "delivered", datetime(2024, 1, 1, 12, 0))
+    later = report("m1", "delivered", datetime(2024, 1, 1, 12, 5))
+
+    assert delivered.supersedes(sent)
+    assert not sent.supersedes(delivered)
+    assert later.supersedes(delivered)
+    assert not delivered.supersedes(later)
+
+
+@pytest.mark.asyncio
+async def test_buffer_coalesces_reports_per_message():
+    """Test a report storm costs one write per message with the latest state."""
+    store = FakeStore()
+    buffer = DeliveryReportBuffer(store)
+    for message_id in ("m1", "m2"):
+        buffer.add(report(message_id, "sent", sms_id="sms-1"))
+        buffer.add(report(message_id, "delivered", datetime(2024, 1, 1, 12, 0)))
+        # Arrives late: must not overwrite the final state
+        buffer.add(report(message_id, "sent"))
+
+    assert await buffer.flush() == 2
+    assert {(r.id, r.status, r.sms_id) for r in store.writes} == {
+        ("m1", "delivered", "sms-1"), ("m2", "delivered", "sms-1")
+    }
+    assert buffer.pending_count() == 0
+    assert await buffer.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_retried_on_next_flush():
+    """Test reports whose write failed stay pending."""
+    store = FakeStore(fail_ids={"m1"})
+    buffer = DeliveryReportBuffer(store)
+    buffer.add(report("m1", "delivered"))
+    buffer.add(report("m2", "delivered"))
+
+    assert await buffer.flush() == 1
+    assert buffer.pending("m1") is not None
+
+    store.fail_ids.clear()
+    assert await buffer.flush() == 1
+    assert [r.id for r in store.writes] == ["m2", "m1"]
+
+
+def test_store_write_is_conditional_on_older_state():
+    """Test writes only replace older states and report stale ones."""
+    store = DeliveryStatusStore("skippy_sms_delivery", db_service=MagicMock())
+    store.table = MagicMock()
+
+    assert store.write(report("m1", "delivered", datetime(2024, 1, 1, 12, 0), sms_id="sms-1"))
+    kwargs = store.table.update_item.call_args.kwargs
+    assert "status_rank < :rank" in kwargs["ConditionExpression"]
+    assert kwargs["ExpressionAttributeValues"][":delivered_at"] == "2024-01-01T12:00:00.000000"
+    assert "sms_id = if_not_exists(sms_id, :sms_id)" in kwargs["UpdateExpression"]
+
+    store.table.update_item.side_effect = ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": "stale"}}, "UpdateItem"
+    )
+    assert store.write(report("m1", "sent")) is False
+
+
+@patch('app.main.get_delivery_report_buffer')
+def test_delivery_report_endpoint(mock_get_buffer):
+    """Test delivery report callbacks are validated and buffered."""
+    buffer = mock_get_buffer.return_value
+    buffer.submit = AsyncMock()
+    response = client.post(
+        "/elks/delivery?sms_id=sms-1",
+        data={"id": "s70df59406a1b4643b96f3f91e0bfb7b0", "status": "delivered",
+              "delivered": "2018-07-13T13:57:23.741000"}
+    )
+    assert response.status_code == 200
+    buffered = buffer.submit.await_args.args[0]
+    assert (buffered.status, buffered.sms_id) == ("delivered", "sms-1")
+
+    # Not acknowledged unless stored, so 46elks sends it again
+    buffer.submit.side_effect = ClientError({"Error": {"Code": "ThrottlingException"}}, "UpdateItem")
+    response = client.post("/elks/delivery", data={"id": "s1", "status": "delivered"})
+    assert response.status_code == 503
+
+    response = client.post("/elks/delivery", data={"id": "s1", "status": "lost"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_status_includes_pending_reports():
+    """Test status reads see reports that have not been flushed yet."""
+    store = FakeStore()
+    store.get = AsyncMock(return_value=DeliveryStatus(id="m1", status="sent", sms_id="sms-1"))
+    buffer = DeliveryReportBuffer(store)
+    buffer.add(report("m1", "delivered", datetime(2024, 1, 1, 12, 0)))
+
+    status = await buffer.status("m1")
+    assert (status.status, status.sms_id) == ("delivered", "sms-1")
+
+
+@pytest.mark.asyncio
+async def test_submit_waits_for_the_flush_that_writes_the_report():
+    """Test submitted reports are acknowledged only after their write, coalesced with others."""
+    store = FakeStore(fail_ids={"m2"})
+    buffer = DeliveryReportBuffer(store, flush_interval=0.01)
+    buffer.start()
+    try:
+        sent = asyncio.ensure_future(buffer.submit(report("m1", "sent")))
+        delivered = asyncio.ensure_future(buffer.submit(report("m1", "delivered")))
+        await asyncio.sleep(0)
+        assert store.writes == [] and not sent.done()
+
+        await asyncio.gather(sent, delivered)
+        assert [(r.id, r.status) for r in store.writes] == [("m1", "delivered")]
+
+        with pytest.raises(ClientError):
+            await buffer.submit(report("m2", "delivered"))
+    finally:
+        await buffer.stop()
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+import redis
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+from app.main import app
+from app.services.health_service import HealthProber, InFlightMiddleware
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def dynamodb_client():
+    dynamodb = MagicMock()
+    dynamodb.describe_table.return_value = {"Table": {"TableStatus": "ACTIVE"}}
+    return dynamodb
+
+
+@pytest.fixture
+def redis_client():
+    return MagicMock()
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_ready(dynamodb_client, redis_client):
+    """Test the snapshot is ready when all dependencies respond."""
+    prober = HealthProber(dynamodb_client=dynamodb_client, redis_client=redis_client)
+    await prober.probe()
+
+    snapshot = prober.snapshot()
+    assert snapshot["ready"] is True
+    assert set(snapshot["checks"]) == {"dynamodb", "redis", "saturation"}
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_unreachable_redis(dynamodb_client, redis_client):
+    """Test an unreachable broker makes the node not ready."""
+    redis_client.ping.side_effect = redis.ConnectionError("refused")
+    prober = HealthProber(dynamodb_client=dynamodb_client, redis_client=redis_client)
+    await prober.probe()
+
+    snapshot = prober.snapshot()
+    assert snapshot["ready"] is False
+    assert "ConnectionError" in snapshot["checks"]["redis"]["detail"]
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_inactive_table(dynamodb_client, redis_client):
+    """Test a table that is not active makes the node not ready."""
+    dynamodb_client.describe_table.return_value = {"Table": {"TableStatus": "DELETING"}}
+    prober = HealthProber(dynamodb_client=dynamodb_client, redis_client=redis_client)
+    await prober.probe()
+
+    assert prober.snapshot()["checks"]["dynamodb"]["healthy"] is False
+
+
+@pytest.mark.asyncio
+async def test_snapshot_reads_do_not_probe(dynamodb_client, redis_client):
+    """Test reading the snapshot does not hit dependencies and stale snapshots fail."""
+    prober = HealthProber(interval=1.0, timeout=1.0,
+                          dynamodb_client=dynamodb_client, redis_client=redis_client)
+    assert prober.snapshot()["ready"] is False
+
+    await prober.probe()
+    for _ in range(100):
+        prober.snapshot()
+    assert dynamodb_client.describe_table.call_count == 1
+
+    prober._snapshot["checked_at"] = time.time() - 60
+    assert prober.snapshot()["ready"] is False
+
+
+@pytest.mark.asyncio
+async def test_saturation_counts_requests_and_loop_lag(dynamodb_client, redis_client):
+    """Test in-flight requests are counted without the metrics middleware and lag is a late wake-up."""
+    prober = HealthProber(max_in_flight=1, dynamodb_client=dynamodb_client, redis_client=redis_client)
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def endpoint(scope, receive, send):
+        started.set()
+        await release.wait()
+
+    middleware = InFlightMiddleware(endpoint, prober)
+    requests = [asyncio.ensure_future(middleware({"type": "http"}, None, None)) for _ in range(2)]
+    await started.wait()
+    assert prober.in_flight == 2
+    assert (await prober.probe())["checks"]["saturation"]["healthy"] is False
+    release.set()
+    await asyncio.gather(*requests)
+    assert prober.in_flight == 0
+
+    async def block_loop():
+        time.sleep(0.05)
+
+    sleeping = asyncio.ensure_future(prober._sleep(0.01))
+    await asyncio.sleep(0)
+    await block_loop()
+    await sleeping
+    assert prober._loop_lag >= 0.03
+
+
+def test_liveness_endpoint():
+    """Test the liveness probe."""
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
+
+@patch('app.main.health_prober')
+def test_readiness_endpoint_status_codes(mock_prober):
+    """Test the readiness probe maps the snapshot to 200/503."""
+    mock_prober.snapshot.return_value = {"ready": True, "checks": {}}
+    assert client.get("/health/ready").status_code == 200
+
+    mock_prober.snapshot.return_value = {"ready": False, "checks": {}}
+    assert client.get("/health/ready").status_code == 503
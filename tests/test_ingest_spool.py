@@ -0,0 +1,163 @@
+import threading
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+from unittest.mock import MagicMock, patch
+
+from app.models.sms import SMSWebhook
+from app.services.ingest_spool import IngestSpool, SpoolReplayer
+from app.services.sms_service import SMSService
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+def make_item(index: int) -> dict:
+    return {"id": f"sms-{index}", "message": "Hello", "processed": False, "processed_at": None}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = IngestSpool(str(tmp_path), segment_max_bytes=512)
+    yield spool
+    spool.close()
+
+
+def test_append_rotates_segments_and_reads_back(spool):
+    """Test records survive segment rotation and are read back in order."""
+    for index in range(20):
+        spool.append(make_item(index))
+    spool.seal()
+
+    segments = spool.sealed_segments()
+    assert len(segments) > 1
+    items = [item for segment in segments for item, _, _ in spool.read(segment)]
+    assert [item["id"] for item in items] == [f"sms-{i}" for i in range(20)]
+    assert spool.depth == 20
+    assert spool.oldest_age() >= 0
+
+
+def test_concurrent_appends_are_all_durable(spool):
+    """Test appends from many threads share fsyncs without losing records."""
+    threads = [
+        threading.Thread(target=lambda i=i: [spool.append(make_item(i * 10 + j)) for j in range(10)])
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    spool.seal()
+
+    ids = {item["id"] for segment in spool.sealed_segments() for item, _, _ in spool.read(segment)}
+    assert len(ids) == 80
+
+
+def test_torn_tail_is_skipped_on_restart(tmp_path):
+    """Test a partially written record does not hide the records before it."""
+    spool = IngestSpool(str(tmp_path), segment_max_bytes=1024 * 1024)
+    for index in range(3):
+        spool.append(make_item(index))
+    segment = spool.segments()[-1]
+    spool.close()
+
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00garbage")
+
+    reopened = IngestSpool(str(tmp_path))
+    try:
+        assert reopened.depth == 3
+        assert [item["id"] for item, _, _ in reopened.read(segment)] == ["sms-0", "sms-1", "sms-2"]
+    finally:
+        reopened.close()
+
+
+def test_processes_claim_separate_slots(tmp_path):
+    """Test two spools on one directory never share segment files."""
+    first = IngestSpool(str(tmp_path))
+    second = IngestSpool(str(tmp_path))
+    try:
+        assert first.directory != second.directory
+    finally:
+        first.close()
+        second.close()
+
+
+def test_replayer_drains_and_resumes_after_failure(spool):
+    """Test replay checkpoints progress on failure and resumes where it stopped."""
+    for index in range(10):
+        spool.append(make_item(index))
+
+    written, replayed = [], []
+
+    def failing_write(item):
+        if len(written) == 4:
+            raise EndpointConnectionError(endpoint_url="http://dynamodb")
+        written.append(item["id"])
+        return True
+
+    replayer = SpoolReplayer(spool, failing_write, on_replayed=replayed.append, rate=0, batch_size=3)
+    with pytest.raises(EndpointConnectionError):
+        replayer.replay_once()
+    assert spool.depth == 6
+
+    # sms-2 already made it to DynamoDB: it is skipped, not dispatched again
+    replayer.write = lambda item: item["id"] != "sms-2" and written.append(item["id"]) is None
+    assert replayer.replay_once() == 6
+    assert written == [f"sms-{i}" for i in range(10)]
+    assert [item["id"] for item in replayed] == written
+    assert spool.depth == 0
+    assert spool.oldest_age() == 0.0
+    assert spool.sealed_segments() == []
+
+
+@pytest.mark.asyncio
+@patch('app.services.sms_service.DynamoDBService')
+async def test_store_sms_falls_back_to_spool(mock_db_service, spool):
+    """Test store_sms spools while DynamoDB is down and stops trying it after repeated failures."""
+    table = MagicMock()
+    table.put_item.side_effect = ClientError(
+        {"Error": {"Code": "ServiceUnavailable", "Message": "down"}}, "PutItem"
+    )
+    mock_db_service.return_value.dynamodb.Table.return_value = table
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    webhook = SMSWebhook(**{
+        "id": "sf8425555e5d8db61dda7a7b3f1b91bdb",
+        "from_number": "+46706861004",
+        "to_number": "+46706860000",
+        "message": "Hello",
+        "direction": "incoming",
+        "created": "2018-07-13T13:57:23.741000"
+    })
+    with patch('app.services.sms_service.get_ingest_spool', return_value=spool), \
+            patch('app.services.sms_service._store_breaker', breaker):
+        service = SMSService()
+        for _ in range(3):
+            response = await service.store_sms(webhook)
+            assert response.id == webhook.id
+
+    assert table.put_item.call_count == 2
+    assert spool.depth == 3
+
+
+@pytest.mark.asyncio
+@patch('app.services.sms_service.DynamoDBService')
+async def test_store_sms_raises_on_rejected_write(mock_db_service, spool):
+    """Test errors other than unavailability are not hidden by the spool."""
+    table = MagicMock()
+    table.put_item.side_effect = ClientError(
+        {"Error": {"Code": "ValidationException", "Message": "bad item"}}, "PutItem"
+    )
+    mock_db_service.return_value.dynamodb.Table.return_value = table
+
+    webhook = SMSWebhook(**{
+        "id": "sf1",
+        "from_number": "+46706861004",
+        "to_number": "+46706860000",
+        "message": "Hello",
+        "direction": "incoming",
+        "created": "2018-07-13T13:57:23.741000"
+    })
+    with patch('app.services.sms_service.get_ingest_spool', return_value=spool):
+        with pytest.raises(ClientError):
+            await SMSService().store_sms(webhook)
+    assert spool.depth == 0
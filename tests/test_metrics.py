@@ -0,0 +1,117 @@
+import threading
+
+import boto3
+from botocore.stub import Stubber
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.dynamodb_service import (
+    instrument_dynamodb_client,
+    DYNAMODB_CONSUMED_CAPACITY,
+    DYNAMODB_OPERATION_DURATION,
+)
+from app.utils.metrics import Counter, Gauge, Histogram, Registry
+
+client = TestClient(app)
+
+
+def test_counter_sums_thread_shards():
+    """Test counter increments from several threads are merged."""
+    registry = Registry()
+    counter = Counter("test_events_total", "Events", ["kind"], registry=registry)
+
+    def work():
+        child = counter.labels("a")
+        for _ in range(1000):
+            child.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value("a") == 4000
+    assert 'test_events_total{kind="a"} 4000.0' in registry.generate_latest()
+
+
+def test_shards_of_exited_threads_are_folded():
+    """Test short-lived threads do not leave a shard each behind, and keep their counts."""
+    registry = Registry()
+    counter = Counter("test_jobs_total", "Jobs", registry=registry)
+    histogram = Histogram("test_job_seconds", "Job time", buckets=(1.0,), registry=registry)
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    for _ in range(50):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    counter.inc()
+
+    assert counter.value() == 51
+    assert len(counter._values._shards) <= 2
+    assert 'test_job_seconds_count 50' in registry.generate_latest()
+    assert len(histogram._values._shards) <= 1
+
+
+def test_histogram_exposition():
+    """Test histogram buckets are cumulative with sum and count."""
+    registry = Registry()
+    histogram = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 0.5, 2.0):
+        histogram.observe(value)
+
+    output = registry.generate_latest()
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in output
+    assert 'test_latency_seconds_bucket{le="1.0"} 3' in output
+    assert 'test_latency_seconds_bucket{le="+Inf"} 4' in output
+    assert "test_latency_seconds_count 4" in output
+    assert "test_latency_seconds_sum 3.05" in output
+
+
+def test_gauge_function_and_label_escaping():
+    """Test callback gauges and escaping of label values."""
+    registry = Registry()
+    gauge = Gauge("test_depth", "Depth", registry=registry)
+    gauge.set_function(lambda: 7)
+    counter = Counter("test_paths_total", "Paths", ["path"], registry=registry)
+    counter.labels('a"b').inc()
+
+    output = registry.generate_latest()
+    assert "test_depth 7.0" in output
+    assert 'test_paths_total{path="a\\"b"} 1.0' in output
+
+
+def test_metrics_endpoint_reports_routes():
+    """Test the /metrics endpoint reports request metrics by route template."""
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'skippy_http_requests_total{method="GET",route="/health",status="200"}' in response.text
+    assert "skippy_http_request_duration_seconds_bucket" in response.text
+
+
+def test_dynamodb_calls_are_instrumented():
+    """Test DynamoDB latency and consumed capacity are recorded per operation."""
+    dynamodb = boto3.client(
+        "dynamodb", region_name="us-east-1",
+        aws_access_key_id="test", aws_secret_access_key="test"
+    )
+    instrument_dynamodb_client(dynamodb)
+
+    with Stubber(dynamodb) as stubber:
+        stubber.add_response(
+            "put_item",
+            {"ConsumedCapacity": {"TableName": "metrics_test", "CapacityUnits": 2.0}},
+            {"TableName": "metrics_test", "Item": {"id": {"S": "1"}},
+             "ReturnConsumedCapacity": "TOTAL"}
+        )
+        dynamodb.put_item(TableName="metrics_test", Item={"id": {"S": "1"}})
+
+    assert DYNAMODB_CONSUMED_CAPACITY.value("metrics_test", "PutItem") == 2.0
+    assert 'table="metrics_test",operation="PutItem"' in "\n".join(DYNAMODB_OPERATION_DURATION.collect())
@@ -0,0 +1,160 @@
+import threading
+import time
+import tracemalloc
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.main import app
+from app.utils.memory import MemoryTracker
+from app.utils.profiling import SamplingProfiler
+from app.workers.monitoring import TASK_MEMORY_GROWTH, _on_task_postrun, _on_task_prerun
+from app.utils.timing import ServerTimingMiddleware, phase
+
+client = TestClient(app)
+
+
+def test_phase_is_noop_without_active_request():
+    """Test phases cost nothing when timing is not enabled."""
+    first = phase("parse")
+    with first:
+        pass
+    assert phase("store") is first
+
+
+def test_server_timing_header():
+    """Test recorded phases are returned in the Server-Timing header."""
+    timed_app = FastAPI()
+    timed_app.add_middleware(ServerTimingMiddleware)
+
+    @timed_app.get("/work")
+    async def work():
+        with phase("parse"):
+            pass
+        with phase("store"):
+            pass
+        return {}
+
+    response = TestClient(timed_app).get("/work")
+
+    header = response.headers["server-timing"]
+    names = [part.split(";")[0] for part in header.split(", ")]
+    assert names == ["parse", "store", "total"]
+
+
+def test_sampling_profiler_collapsed_output():
+    """Test the profiler returns collapsed stacks including busy threads."""
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    try:
+        output = SamplingProfiler().profile(0.1, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = output.strip().splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.startswith("thread:busy;") and "busy_loop" in line for line in lines)
+
+
+def test_sampling_profiler_rejects_concurrent_runs():
+    """Test only one profile runs at a time."""
+    profiler = SamplingProfiler()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(profiler.profile(0.2)))
+    thread.start()
+    time.sleep(0.05)
+    assert profiler.profile(0.01) is None
+    thread.join()
+    assert results[0] is not None
+
+
+def test_profile_endpoint_disabled_without_token():
+    """Test the admin profile endpoint is hidden when no admin token is set."""
+    with patch('app.main.settings.admin_token', None):
+        response = client.post("/admin/profile?seconds=0.01")
+    assert response.status_code == 404
+
+
+def test_profile_endpoint_requires_token():
+    """Test the admin profile endpoint checks the admin token."""
+    with patch('app.main.settings.admin_token', "secret"):
+        assert client.post("/admin/profile?seconds=0.01").status_code == 403
+        response = client.post(
+            "/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"}
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def _leak(store, count):
+    store.extend(bytearray(1024) for _ in range(count))
+
+
+def test_memory_tracker_reports_growing_sites():
+    """Test a report lists the allocation site that grew since the previous snapshot."""
+    tracker = MemoryTracker(top=5)
+    leaked = []
+    try:
+        tracker.start()
+        first = tracker.report()
+        assert first["top"] == [] or all(entry["size_diff"] > 0 for entry in first["top"])
+
+        _leak(leaked, 2000)
+        report = tracker.report()
+        assert report["traced_bytes"] > 2000 * 1024
+        assert report["top"][0]["site"].startswith(__file__)
+        assert report["top"][0]["size_diff"] >= 2000 * 1024
+        leak_site = report["top"][0]["site"]
+
+        # Nothing new since the previous report, but all of it since the baseline
+        assert leak_site not in [entry["site"] for entry in tracker.report()["top"]]
+        assert tracker.report("baseline")["top"][0]["site"] == leak_site
+    finally:
+        tracker.stop()
+    assert not tracker.tracing
+
+
+def test_on_demand_memory_report_stops_tracing_again():
+    """Test a report taken while tracing is off traces only for its window."""
+    tracker = MemoryTracker(top=5, sample_seconds=0.0)
+
+    report = tracker.report()
+
+    assert report["since"] == "baseline"
+    assert not tracker.tracing and not tracemalloc.is_tracing()
+
+
+@patch('app.workers.monitoring.rss_bytes', side_effect=[100_000, 150_000])
+def test_task_memory_growth_by_task_type(mock_rss):
+    """Test the RSS growth across a task run is attributed to its task name."""
+    task = SimpleNamespace(name="app.workers.test.leaky", request=SimpleNamespace(retries=0, eta=None))
+    before = TASK_MEMORY_GROWTH.value(task.name, "rss")
+
+    _on_task_prerun(task_id="t1", task=task)
+    _on_task_postrun(task_id="t1", task=task, state="SUCCESS")
+
+    assert TASK_MEMORY_GROWTH.value(task.name, "rss") - before == 50_000
+
+
+@patch('app.main.settings.admin_token', "secret")
+@patch('app.main.get_memory_tracker')
+def test_memory_endpoint(mock_get_tracker):
+    """Test the admin memory endpoint returns this process's report."""
+    mock_get_tracker.return_value.report.return_value = {"pid": 1, "top": []}
+
+    response = client.post("/admin/memory?since=baseline&limit=3", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.json() == {"pid": 1, "top": []}
+    mock_get_tracker.return_value.report.assert_called_once_with("baseline", 3, 30.0)
+    assert client.post("/admin/memory?since=yesterday", headers={"X-Admin-Token": "secret"}).status_code == 422
@@ -0,0 +1,119 @@
+import pytest
+import redis
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.main import app
+from app.services.rate_limiter import (
+    DROP,
+    REJECT,
+    LocalGCRA,
+    RateLimitDecision,
+    RateLimitPolicy,
+    RateLimiter,
+    client_ip,
+)
+
+client = TestClient(app)
+
+SMS_FORM = {
+    "id": "sf8425555e5d8db61dda7a7b3f1b91bdb",
+    "from": "+46706861004",
+    "to": "+46706860000",
+    "message": "Hello how are you?",
+    "direction": "incoming",
+    "created": "2018-07-13T13:57:23.741000"
+}
+
+
+def make_limiter(script_result=(1, 0), burst=20):
+    redis_client = MagicMock()
+    script = MagicMock(return_value=list(script_result))
+    redis_client.register_script.return_value = script
+    limiter = RateLimiter([RateLimitPolicy("sender", 60, 60.0, burst)], redis_client=redis_client, local_fraction=0.1)
+    return limiter, script
+
+
+def test_local_gcra_allows_burst_then_spaces_requests():
+    """Test a burst is admitted at once and further requests at the policy rate."""
+    gcra = LocalGCRA()
+    policy = RateLimitPolicy("sender", 60, 60.0, 3)
+    assert [gcra.check("+4670", 100.0, policy)[0] for _ in range(4)] == [True, True, True, False]
+    assert gcra.check("+4670", 100.0, policy)[1] == pytest.approx(1.0)
+    assert gcra.check("+4670", 101.0, policy)[0]
+
+
+@pytest.mark.asyncio
+async def test_local_prefilter_batches_charges_to_redis():
+    """Test clearly-under-limit requests skip Redis and are charged with the next check."""
+    limiter, script = make_limiter()
+    decisions = [await limiter.check("sender", "+4670") for _ in range(3)]
+
+    assert all(decision.allowed for decision in decisions)
+    assert [decision.backend for decision in decisions] == ["local", "local", "redis"]
+    script.assert_called_once()
+    assert script.call_args.kwargs["keys"] == ["skippy:ratelimit:sender:+4670"]
+    now_ms, interval_ms, tolerance_ms, pending, cost = script.call_args.kwargs["args"]
+    assert (interval_ms, tolerance_ms, pending, cost) == (1000.0, 20000.0, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_limited_key_is_rejected_locally_until_retry_after():
+    """Test a key Redis has limited is rejected without further round-trips."""
+    limiter, script = make_limiter(script_result=(0, 5000), burst=5)
+    first = await limiter.check("sender", "+4670")
+    second = await limiter.check("sender", "+4670")
+
+    assert not first.allowed and first.retry_after == 5.0 and first.backend == "redis"
+    assert not second.allowed and second.backend == "local"
+    assert script.call_count == 1
+    assert (await limiter.check("unknown", "+4670")).allowed
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_limits_when_redis_is_down():
+    """Test Redis errors fall back to in-process limits and back off from Redis."""
+    limiter, script = make_limiter(burst=5)
+    script.side_effect = redis.ConnectionError("down")
+    decisions = [await limiter.check("sender", "+4670") for _ in range(7)]
+
+    assert [decision.allowed for decision in decisions] == [True] * 5 + [False] * 2
+    assert {decision.backend for decision in decisions} == {"fallback"}
+    assert script.call_count == 1
+
+
+def test_client_ip_and_exemptions():
+    """Test the IP key honours X-Forwarded-For only when trusted, and exempt ranges match."""
+    assert client_ip("10.0.0.1", "203.0.113.7, 10.0.0.1") == "10.0.0.1"
+    assert client_ip("10.0.0.2", "203.0.113.7, 10.0.0.1", trusted_proxies=2) == "203.0.113.7"
+    assert client_ip("10.0.0.1", "203.0.113.7", trusted_proxies=1) == "203.0.113.7"
+    limiter = RateLimiter([], exempt_ips="176.10.154.199, 85.24.146.0/24")
+    assert limiter.is_exempt("85.24.146.12")
+    assert not limiter.is_exempt("85.24.147.1")
+    assert not limiter.is_exempt("testclient")
+
+
+def test_client_ip_ignores_spoofed_forwarded_entries():
+    """Test addresses the client prepends to X-Forwarded-For are not used as its key."""
+    spoofed = "176.10.154.199, 198.51.100.9"  # Client claims an exempt address; the proxy appends its own
+    assert client_ip("10.0.0.1", spoofed, trusted_proxies=1) == "198.51.100.9"
+    assert client_ip("10.0.0.1", f"1.2.3.4, {spoofed}", trusted_proxies=1) == "198.51.100.9"
+
+
+@patch('app.services.sms_service.SMSService.store_sms')
+@patch('app.main.get_rate_limiter')
+def test_webhook_rejects_or_drops_limited_requests(mock_get_limiter, mock_store_sms):
+    """Test a limited IP gets 429 with Retry-After and a limited sender is acknowledged but not stored."""
+    limiter = RateLimiter([RateLimitPolicy("sender", 1, 60.0, 1, DROP), RateLimitPolicy("ip", 1, 60.0, 1, REJECT)])
+    limiter.check = AsyncMock(return_value=RateLimitDecision(False, 2.5))
+    mock_get_limiter.return_value = limiter
+
+    response = client.post("/elks/sms", data=SMS_FORM)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+    limiter.check.side_effect = [RateLimitDecision(True), RateLimitDecision(False, 2.5)]
+    response = client.post("/elks/sms", data=SMS_FORM)
+    assert response.status_code == 200
+    assert [call.args for call in limiter.check.call_args_list[-2:]] == [("ip", "testclient"), ("sender", "+46706861004")]
+    mock_store_sms.assert_not_called()
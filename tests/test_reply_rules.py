@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+from app.models.reply_rule import ReplyRule
+from app.services.reply_rules import (
+    CompiledRuleSet,
+    FileRuleSource,
+    ReplyRuleEngine,
+    DEFAULT_REPLY,
+)
+
+
+@pytest.fixture
+def default_engine():
+    return ReplyRuleEngine()
+
+
+def test_default_rules_match_greetings(default_engine):
+    """Test the built-in rules reply to greetings."""
+    assert default_engine.reply_for("Hello how are you?").startswith("Hello!")
+    assert default_engine.reply_for("hi there").startswith("Hello!")
+
+
+def test_hi_only_matches_whole_word(default_engine):
+    """Test that "hi" no longer matches inside other words."""
+    assert default_engine.reply_for("Which one is this?") == DEFAULT_REPLY
+
+
+def test_priority_wins_over_position():
+    """Test the highest priority rule wins regardless of match position."""
+    rules = CompiledRuleSet([
+        ReplyRule(id="low", type="keyword", pattern="order", reply="low", priority=1),
+        ReplyRule(id="high", type="word", pattern="cancel", reply="high", priority=5),
+    ])
+    assert rules.match("Order 42: please cancel").id == "high"
+
+
+def test_overlapping_keywords_are_all_found():
+    """Test overlapping keywords are all considered."""
+    rules = CompiledRuleSet([
+        ReplyRule(id="desk", type="keyword", pattern="helpdesk", reply="desk", priority=5),
+        ReplyRule(id="help", type="keyword", pattern="help", reply="help", priority=1),
+        ReplyRule(id="pdesk", type="keyword", pattern="pdesk", reply="pdesk", priority=9),
+    ])
+    assert rules.match("call the helpdesk").id == "pdesk"
+
+
+def test_regex_rules_and_disabled_rules():
+    """Test regex rules match and disabled rules are ignored."""
+    rules = CompiledRuleSet([
+        ReplyRule(id="order", type="regex", pattern=r"order\s+#?\d+", reply="order", priority=3),
+        ReplyRule(id="off", type="word", pattern="order", reply="off", priority=9, enabled=False),
+    ])
+    assert rules.match("Where is ORDER #123?").id == "order"
+    assert rules.match("no orders here") is None
+
+
+def test_file_source_hot_reload(tmp_path):
+    """Test rules are reloaded when the rule file changes."""
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([
+        {"id": "a", "type": "word", "pattern": "stop", "reply": "Unsubscribed"}
+    ]))
+    engine = ReplyRuleEngine(source=FileRuleSource(str(path)), reload_interval=0)
+    assert engine.reply_for("STOP") == "Unsubscribed"
+
+    path.write_text(json.dumps([
+        {"id": "a", "type": "word", "pattern": "stop", "reply": "You have been unsubscribed"}
+    ]))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert engine.reply_for("STOP") == "You have been unsubscribed"
+
+
+def test_invalid_reload_keeps_previous_rules(tmp_path):
+    """Test a broken rule file does not replace the loaded rules."""
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([
+        {"id": "a", "type": "word", "pattern": "stop", "reply": "Unsubscribed"}
+    ]))
+    engine = ReplyRuleEngine(source=FileRuleSource(str(path)), reload_interval=0)
+
+    path.write_text("not json")
+    assert engine.reload(force=True) is False
+    assert engine.reply_for("stop") == "Unsubscribed"
+
+
+def test_bad_regex_keeps_previous_rules_and_is_retried():
+    """Test a rule set that fails to compile is not served and is loaded again later."""
+    class Source:
+        loads = 0
+
+        def version(self):
+            return "v1"
+
+        def load(self):
+            self.loads += 1
+            return [ReplyRule(id="a", type="regex", pattern="(stop", reply="Unsubscribed")]
+
+    source = Source()
+    engine = ReplyRuleEngine(source=source, reload_interval=0)
+
+    assert engine.reply_for("stop") == DEFAULT_REPLY
+    assert engine.reload() is False
+    assert source.loads == 3
@@ -0,0 +1,124 @@
+import pytest
+import redis
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.models.sms import SMSResponse
+from app.services.reply_suppression import (
+    LocalSuppressionWindow,
+    ReplySuppressor,
+    SEND,
+    COALESCE,
+    SKIP,
+)
+from app.workers.sms_tasks import process_sms_task
+
+
+@pytest.fixture
+def sample_sms_response():
+    return {
+        "id": "sf8425555e5d8db61dda7a7b3f1b91bdb",
+        "from_number": "+46706861004",
+        "to_number": "+46706860000",
+        "message": "Hello how are you?",
+        "direction": "incoming",
+        "created": "2018-07-13T13:57:23.741000",
+        "processed": False,
+        "processed_at": None,
+        "reply_sent": False,
+        "reply_message": None
+    }
+
+
+def test_local_window_sends_then_skips():
+    """Test a burst from one sender gets a single reply."""
+    window = LocalSuppressionWindow()
+    decisions = [window.check("+4670", 100.0 + i, 60, 1, False)[0] for i in range(5)]
+    assert decisions == [SEND, SKIP, SKIP, SKIP, SKIP]
+
+    # Once the window has passed the sender gets a reply again
+    assert window.check("+4670", 161.0, 60, 1, False)[0] == SEND
+
+
+def test_local_window_coalesces_once():
+    """Test suppressed bursts are coalesced into one delayed reply."""
+    window = LocalSuppressionWindow()
+    assert window.check("+4670", 100.0, 60, 1, True) == (SEND, 0.0)
+    assert window.check("+4670", 110.0, 60, 1, True) == (COALESCE, 50.0)
+    assert window.check("+4670", 120.0, 60, 1, True) == (SKIP, 0.0)
+
+
+def test_local_window_is_bounded():
+    """Test the local window does not grow past its sender limit."""
+    window = LocalSuppressionWindow(max_senders=10)
+    for i in range(100):
+        window.check(f"+46{i}", 100.0, 60, 1, False)
+    assert len(window._sent) <= 10
+
+
+def test_windows_of_different_lengths_use_their_own_keys():
+    """Test a rule's short window never trims the timestamps a longer window counts."""
+    client = MagicMock()
+    script = client.register_script.return_value = MagicMock(return_value=[1, 0])
+    suppressor = ReplySuppressor(redis_client=client, window=3600)
+
+    suppressor.check("+4670", "a")
+    suppressor.check("+4670", "b", window=60)
+
+    assert [call.kwargs["keys"][0] for call in script.call_args_list] == [
+        "skippy:suppress:+4670:3600", "skippy:suppress:+4670:60"
+    ]
+
+    # The local fallback keeps them apart too
+    window = LocalSuppressionWindow()
+    assert window.check("+4670:3600", 100.0, 3600, 1, False)[0] == SEND
+    assert window.check("+4670:60", 200.0, 60, 1, False)[0] == SEND
+    assert window.check("+4670:3600", 300.0, 3600, 1, False)[0] == SKIP
+
+
+def test_zero_window_disables_suppression():
+    """Test a rule window of 0 always sends."""
+    suppressor = ReplySuppressor()
+    assert suppressor.check("+4670", "a", window=0) == (SEND, 0.0)
+    assert suppressor.check("+4670", "b", window=0) == (SEND, 0.0)
+
+
+def test_redis_errors_fall_back_to_local_window():
+    """Test Redis failures fall back to the in-process window."""
+    client = MagicMock()
+    client.register_script.return_value = MagicMock(side_effect=redis.ConnectionError("down"))
+    suppressor = ReplySuppressor(redis_client=client, window=60)
+
+    assert suppressor.check("+4670", "a")[0] == SEND
+    assert suppressor.check("+4670", "b")[0] == SKIP
+    # Redis is not retried until the back-off expires
+    assert client.register_script.return_value.call_count == 1
+
+
+def test_redis_decision_is_used():
+    """Test the Redis script result is translated into a decision."""
+    client = MagicMock()
+    client.register_script.return_value = MagicMock(return_value=[2, 1500])
+    suppressor = ReplySuppressor(redis_client=client, window=60, coalesce=True)
+
+    assert suppressor.check("+4670", "a") == (COALESCE, 1.5)
+
+
+@patch('app.workers.sms_tasks.get_reply_suppressor')
+@patch('app.services.sms_service.SMSService.mark_reply_sent', new_callable=AsyncMock)
+@patch('app.services.sms_service.SMSService.mark_sms_processed', new_callable=AsyncMock)
+@patch('app.services.sms_service.SMSService.get_sms', new_callable=AsyncMock)
+def test_process_sms_task_skips_suppressed_reply(
+    mock_get_sms, mock_mark_processed, mock_mark_reply, mock_get_suppressor, sample_sms_response
+):
+    """Test suppressed replies are not marked as sent."""
+    mock_get_sms.return_value = SMSResponse(**sample_sms_response)
+    mock_get_suppressor.return_value.check.return_value = (SKIP, 0.0)
+
+    result = process_sms_task(sample_sms_response["id"])
+
+    assert result["reply_decision"] == SKIP
+    mock_mark_processed.assert_awaited_once_with(
+        sample_sms_response["id"], reply_rule=result["reply_rule"] or "default",
+        selected_reply=result["reply_message"]
+    )
+    mock_mark_reply.assert_not_awaited()
@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+from unittest.mock import patch
+
+from app.server import Master, create_socket, rss_bytes
+
+
+def idle_worker(sock, graceful_timeout):
+    while True:
+        time.sleep(0.1)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def sock():
+    sock = create_socket("127.0.0.1", 0, 16)
+    yield sock
+    sock.close()
+
+
+def test_rss_bytes_of_current_process():
+    """Test reading the resident set size of a process."""
+    if not os.path.exists("/proc/self/statm"):
+        pytest.skip("requires /proc")
+    assert rss_bytes(os.getpid()) > 0
+    assert rss_bytes(999999999) is None
+
+
+@patch('app.server.run_worker', idle_worker)
+def test_master_restarts_crashed_workers_and_shuts_down(sock):
+    """Test dead workers are replaced and shutdown stops every worker."""
+    master = Master(sock, workers=2, graceful_timeout=1)
+    for index in range(2):
+        master.spawn(index)
+
+    crashed = next(iter(master.children))
+    os.kill(crashed, 9)
+    assert wait_for(lambda: master._reap() or crashed not in master.children)
+    assert len(master.children) == 2
+
+    master._shutdown()
+    assert master.children == {}
+
+
+@patch('app.server.run_worker', idle_worker)
+@patch('app.server.rss_bytes', lambda pid: 10 * 1024 * 1024)
+def test_master_recycles_workers_over_memory_limit(sock):
+    """Test workers above the memory limit are replaced before being stopped."""
+    master = Master(sock, workers=1, graceful_timeout=1, max_memory_mb=1)
+    old_pid = master.spawn(0)
+
+    master._check_memory()
+    assert old_pid in master.retiring
+    assert len(master.children) == 2
+
+    assert wait_for(lambda: master._reap() or old_pid not in master.children)
+    assert len(master.children) == 1
+    assert old_pid not in master.retiring
+
+    master._shutdown()
@@ -1,9 +1,11 @@
 import pytest
+from datetime import datetime
+from decimal import Decimal
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch
 
 from app.main import app
-from app.models.sms import SMSWebhook, SMSResponse
+from app.models.sms import SMSWebhook, SMSResponse, SMSRecord
 
 client = TestClient(app)
 
@@ -145,3 +147,32 @@ def test_delete_sms_not_found(mock_delete_sms):
     
     assert response.status_code == 404
     assert response.json()["detail"] == "SMS not found"
+
+
+def test_sms_response_from_item_converts_storage_types(sample_sms_response):
+    """Test rows from DynamoDB are converted to model types."""
+    item = dict(sample_sms_response, processed=True, processed_at="2018-07-13T14:00:00", retries=Decimal("2"))
+    
+    sms = SMSResponse.from_item(item)
+    
+    assert sms.created == datetime(2018, 7, 13, 13, 57, 23, 741000)
+    assert sms.processed_at == datetime(2018, 7, 13, 14, 0)
+    assert sms.model_dump() == SMSResponse(**item).model_dump()
+
+
+def test_sms_record_from_item(sample_sms_response):
+    """Test compact records for bulk reads."""
+    record = SMSRecord.from_item(sample_sms_response)
+    
+    assert record.created == datetime(2018, 7, 13, 13, 57, 23, 741000)
+    assert record.reply_message is None
+    assert record.to_response().model_dump() == SMSResponse(**sample_sms_response).model_dump()
+
+
+def test_sms_webhook_populates_by_name(sample_sms_webhook_data):
+    """Test the webhook model accepts field names."""
+    data = dict(sample_sms_webhook_data)
+    data["from_number"] = data.pop("from")
+    data["to_number"] = data.pop("to")
+    
+    assert SMSWebhook(**data).from_number == "+46706861004"
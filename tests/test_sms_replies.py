@@ -0,0 +1,124 @@
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.main import app
+from app.models.sms import StoredReply
+from app.services.sms_service import (
+    DUPLICATE, MISSING, RECORDED, STALE, NewReply, SMSService, StaleSMSError
+)
+from app.workers.sms_tasks import send_scheduled_sms_task
+
+client = TestClient(app)
+
+
+def cancelled(*reasons):
+    return ClientError(
+        {"Error": {"Code": "TransactionCanceledException"}, "CancellationReasons": list(reasons)},
+        "TransactWriteItems"
+    )
+
+
+OK = {"Code": "None"}
+FAILED = {"Code": "ConditionalCheckFailed"}
+
+
+@pytest.fixture
+def service():
+    with patch('app.services.sms_service.DynamoDBService'):
+        yield SMSService()
+
+
+def transactions(service):
+    calls = service.db_service.dynamodb.meta.client.transact_write_items.call_args_list
+    return [call.kwargs["TransactItems"] for call in calls]
+
+
+@pytest.mark.asyncio
+async def test_record_replies_writes_reply_and_sms_together(service):
+    """Test each reply is a Put plus a version-checked Update of its SMS, with no reads."""
+    outcomes = await service.record_replies([
+        NewReply("a", "Thanks!", "+4670", reply_id="auto", expected_version=2),
+        NewReply("b", "Hi"),
+    ])
+
+    assert outcomes == [RECORDED, RECORDED]
+    [actions] = transactions(service)
+    assert [next(iter(action)) for action in actions] == ["Put", "Update", "Put", "Update"]
+    put, update = actions[0]["Put"], actions[1]["Update"]
+    assert put["Item"]["sms_id"] == {"S": "a"} and put["Item"]["id"] == {"S": "auto"}
+    assert put["ConditionExpression"] == "attribute_not_exists(id)"
+    assert update["ConditionExpression"] == "version = :expected_version"
+    assert update["ExpressionAttributeValues"][":expected_version"] == {"N": "2"}
+    assert "ADD version :one" in update["UpdateExpression"]
+    assert actions[3]["Update"]["ConditionExpression"] == "attribute_exists(id)"
+    service.db_service.dynamodb.Table.return_value.get_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_record_replies_rewrites_group_without_failed_replies(service):
+    """Test a cancelled transaction is written again without its duplicate, stale and missing replies."""
+    service.db_service.dynamodb.meta.client.transact_write_items.side_effect = [
+        cancelled(FAILED, OK, OK, FAILED | {"Item": {"version": {"N": "3"}}}, OK, FAILED, OK, OK),
+        None,
+        None,
+    ]
+    replies = [
+        NewReply("a", "1", reply_id="auto"),
+        NewReply("b", "2", expected_version=2),
+        NewReply("c", "3"),
+        NewReply("d", "4"),
+        NewReply("d", "5"),
+    ]
+
+    outcomes = await service.record_replies(replies)
+
+    assert outcomes == [DUPLICATE, STALE, MISSING, RECORDED, RECORDED]
+    first, second, third = transactions(service)
+    # The second reply to "d" cannot share a transaction with the first
+    assert len(first) == 8
+    assert [action["Update"]["Key"]["id"]["S"] for action in second[1::2]] == ["d"]
+    assert [action["Update"]["Key"]["id"]["S"] for action in third[1::2]] == ["d"]
+    # The retried reply keeps its ID
+    assert second[0]["Put"]["Item"]["id"] == first[6]["Put"]["Item"]["id"]
+
+
+@pytest.mark.asyncio
+async def test_mark_reply_sent_raises_when_stale(service):
+    """Test a single reply reports a changed SMS and swallows other failures."""
+    write = service.db_service.dynamodb.meta.client.transact_write_items
+    write.side_effect = cancelled(OK, FAILED | {"Item": {"version": {"N": "5"}}})
+    with pytest.raises(StaleSMSError):
+        await service.mark_reply_sent("a", "Hi", expected_version=4)
+
+    write.side_effect = cancelled({"Code": "TransactionConflict"}, OK)
+    assert await service.mark_reply_sent("a", "Hi") is None
+
+
+@patch('app.workers.sms_tasks.SMSService.record_replies', new_callable=AsyncMock)
+def test_scheduled_replies_are_recorded_in_one_call(mock_record):
+    """Test a scheduled batch records its replies together, keyed by schedule ID."""
+    result = send_scheduled_sms_task([
+        {"id": "reply:a", "to": "+4671", "message": "Hi", "sms_id": "a"},
+        {"id": "s2", "to": "+4672", "message": "Promo"},
+        {"id": "reply:b", "to": "+4673", "message": "Hi", "sms_id": "b"},
+    ])
+
+    assert result == {"sent": 3, "failed": 0}
+    [replies] = mock_record.await_args.args
+    assert [(reply.sms_id, reply.reply_id) for reply in replies] == [("a", "reply:a"), ("b", "reply:b")]
+
+
+@patch('app.services.sms_service.SMSService.list_replies', new_callable=AsyncMock)
+def test_get_sms_replies(mock_list_replies):
+    """Test the replies of an SMS are listed."""
+    mock_list_replies.return_value = [
+        StoredReply(sms_id="a", id="auto", to_number="+4670", message="Thanks!", created="2024-05-01T10:00:00")
+    ]
+
+    response = client.get("/sms/a/replies")
+
+    assert response.status_code == 200
+    assert response.json()[0]["message"] == "Thanks!"
+    mock_list_replies.assert_awaited_once_with("a")
@@ -0,0 +1,192 @@
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+from app.main import app
+from app.models.sms import SMSResponse
+from app.models.schedule import ScheduledSMS
+from app.scheduler import Dispatcher
+from app.services.reply_suppression import COALESCE
+from app.services.sms_scheduler import SMSScheduler, to_ms
+from app.utils.timer_wheel import TimerWheel
+from app.workers.sms_tasks import process_sms
+
+client = TestClient(app)
+
+
+class FakeScheduler:
+    """In-memory stand-in for the Redis-backed SMSScheduler."""
+
+    def __init__(self):
+        self.due = {}
+        self.inflight = set()
+        self.acked = []
+        self.loads = []
+
+    def add(self, schedule_id, due):
+        self.due[schedule_id] = due
+
+    def cancel(self, schedule_id):
+        return self.due.pop(schedule_id, None) is not None
+
+    def recover(self, now, limit):
+        return 0
+
+    def drain_late(self, limit):
+        return []
+
+    def load(self, since, until, limit, ttl_ms):
+        self.loads.append((since, until, limit))
+        rows = sorted((due, schedule_id) for schedule_id, due in self.due.items()
+                      if (since is None or due > since) and due <= until)
+        return [(schedule_id, due) for due, schedule_id in rows[:limit]]
+
+    def claim(self, schedule_ids, now, lease_ms):
+        claimed = []
+        for schedule_id in schedule_ids:
+            if schedule_id in self.due and self.due[schedule_id] <= now:
+                claimed.append({"id": schedule_id, "to": "+4670", "message": "hi", "sms_id": None,
+                                "due": self.due.pop(schedule_id)})
+                self.inflight.add(schedule_id)
+        return claimed
+
+    def ack(self, schedule_ids):
+        self.acked.extend(schedule_ids)
+        self.inflight.difference_update(schedule_ids)
+
+
+def test_timer_wheel_cascades_and_never_fires_early():
+    """Test keys in coarser levels cascade down and fire once due."""
+    wheel = TimerWheel(0, tick_ms=10, slots=4, levels=3)
+    assert wheel.horizon_ms == 630
+    for key, due in [("a", 25), ("b", 5), ("c", 400), ("d", 41)]:
+        assert wheel.add(key, due)
+    assert not wheel.add("late", 700)
+
+    assert wheel.advance(20) == ["b"]
+    assert wheel.advance(29) == []
+    assert sorted(wheel.advance(50)) == ["a", "d"]
+    assert wheel.advance(399) == []
+    assert wheel.advance(400) == ["c"]
+    assert len(wheel) == 0
+
+
+@patch('app.scheduler.now_ms', return_value=1_000_000)
+def test_dispatcher_sends_due_batches_and_skips_cancelled(mock_now):
+    """Test due sends are claimed in batches and cancelled ones are never sent."""
+    scheduler = FakeScheduler()
+    for i in range(5):
+        scheduler.add(f"s{i}", 1_000_050 + i)
+    scheduler.add("far", 1_000_000 + 3_600_000)
+    batches = []
+    dispatcher = Dispatcher(scheduler, send_batch=batches.append, tick_ms=10, horizon=60.0, batch_size=2)
+
+    assert dispatcher.run_once(1_000_000) == 0
+    assert len(dispatcher.wheel) == 5
+    assert scheduler.cancel("s3")
+
+    assert dispatcher.run_once(1_000_060) == 4
+    assert [[item["id"] for item in batch] for batch in batches] == [["s0", "s1"], ["s2", "s4"]]
+    assert scheduler.acked == ["s0", "s1", "s2", "s4"]
+    assert "far" in scheduler.due
+
+
+@patch('app.scheduler.now_ms', return_value=0)
+def test_dispatcher_is_bounded_and_leaves_failed_sends_in_flight(mock_now):
+    """Test the wheel holds at most max_loaded sends and unqueued claims are not acknowledged."""
+    scheduler = FakeScheduler()
+    for i in range(10):
+        scheduler.add(f"s{i}", i)
+    dispatcher = Dispatcher(scheduler, send_batch=MagicMock(side_effect=RuntimeError("broker down")),
+                            tick_ms=10, refill_interval=0.0, max_loaded=4, batch_size=10)
+
+    assert dispatcher.run_once(0) == 0
+    assert scheduler.inflight == {"s0"}
+    assert scheduler.acked == []
+
+    dispatcher.send_batch = MagicMock()
+    while scheduler.due:
+        dispatcher.run_once(100)
+        assert len(dispatcher.wheel) <= 4
+    assert len(scheduler.acked) == 9
+
+
+
+@patch('app.scheduler.now_ms', return_value=0)
+def test_dispatcher_reloads_sends_the_wheel_rejected(mock_now):
+    """Test a send beyond the lagging wheel's horizon is loaded again instead of stranded."""
+    scheduler = FakeScheduler()
+    scheduler.add("s0", 100_500)
+    batches = []
+    dispatcher = Dispatcher(scheduler, send_batch=batches.append, tick_ms=10, horizon=1.0, refill_interval=0.0)
+
+    # The wheel still stands at 0, so 100 500 ms is beyond its horizon
+    assert dispatcher.run_once(100_000) == 0
+    assert len(dispatcher.wheel) == 0
+    assert dispatcher.loaded_until == 100_499
+
+    dispatcher.run_once(100_010)
+    assert "s0" in dispatcher.wheel
+    assert dispatcher.run_once(100_500) == 1
+    assert [item["id"] for item in batches[0]] == ["s0"]
+
+def test_schedule_and_cancel_use_redis_scripts():
+    """Test scheduling writes through one script and duplicates are refused."""
+    redis_client = MagicMock()
+    script = MagicMock(return_value=1)
+    redis_client.register_script.return_value = script
+    scheduler = SMSScheduler(redis_client)
+    send_at = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+    scheduled = scheduler.schedule("+4670", "Reminder", send_at, sms_id="a", schedule_id="reply:a")
+    assert scheduled.status == "scheduled" and scheduled.send_at == send_at
+    keys, args = script.call_args.kwargs["keys"], script.call_args.kwargs["args"]
+    assert all(key.startswith("{skippy:schedule}:") for key in keys)
+    assert args[:2] == ["reply:a", to_ms(send_at)]
+
+    script.return_value = 0
+    assert scheduler.schedule("+4670", "Reminder", send_at, schedule_id="reply:a") is None
+    assert not scheduler.cancel("reply:a")
+
+
+@patch('app.workers.sms_tasks.publish_events')
+@patch('app.workers.sms_tasks.get_reply_suppressor')
+@patch('app.workers.sms_tasks.get_sms_scheduler')
+def test_coalesced_reply_is_scheduled(mock_get_scheduler, mock_get_suppressor, mock_publish):
+    """Test coalesced replies go through the scheduler instead of a Celery countdown."""
+    mock_get_suppressor.return_value.check.return_value = (COALESCE, 30.0)
+    sms_service = MagicMock()
+    sms_service.select_reply.return_value = ("Thanks", None)
+    sms = SMSResponse(id="a", from_number="+4670", to_number="+4671", message="hi",
+                      direction="incoming", created=datetime(2024, 5, 1))
+
+    with patch('app.workers.sms_tasks.run_sync'):
+        process_sms(sms_service, sms, record_stats=False)
+
+    call = mock_get_scheduler.return_value.schedule.call_args
+    assert call.args[:2] == ("+4670", "Thanks")
+    assert call.kwargs == {"sms_id": "a", "schedule_id": "reply:a"}
+
+
+@patch('app.main.settings.admin_token', "secret")
+@patch('app.main.get_sms_scheduler')
+def test_schedule_endpoints(mock_get_scheduler):
+    """Test scheduling with a delay, and cancelling an unknown schedule."""
+    scheduler = mock_get_scheduler.return_value
+    scheduler.schedule.return_value = ScheduledSMS(
+        id="s1", to_number="+4670", message="Reminder", send_at=datetime(2024, 5, 1), status="scheduled"
+    )
+    headers = {"X-Admin-Token": "secret"}
+
+    response = client.post("/sms/schedule", json={"to_number": "+4670", "message": "Reminder", "delay_seconds": 60},
+                           headers=headers)
+    assert response.status_code == 201
+    assert response.json()["id"] == "s1"
+    send_at = scheduler.schedule.call_args.args[2]
+    assert 55 < (send_at - datetime.now(timezone.utc)).total_seconds() <= 60
+
+    response = client.post("/sms/schedule", json={"to_number": "+4670", "message": "Reminder"}, headers=headers)
+    assert response.status_code == 422
+
+    scheduler.cancel.return_value = False
+    assert client.delete("/sms/schedule/s2", headers=headers).status_code == 404
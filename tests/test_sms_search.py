@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+from app.main import app
+from app.models.sms import SMSWebhook
+from app.services.sms_search import SMSSearchIndex, build_match_query
+from app.services.sms_service import SMSService
+
+client = TestClient(app)
+
+
+def make_item(sms_id, message, from_number="+46711111111", to_number="+46700000000",
+              created="2024-05-01T12:00:00+00:00"):
+    return {"id": sms_id, "from_number": from_number, "to_number": to_number,
+            "created": created, "message": message}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SMSSearchIndex(str(tmp_path / "sms.db"))
+    yield index
+    index.close()
+
+
+def search_ids(index, query, **kwargs):
+    return [hit.id for hit in index.search(query, **kwargs)]
+
+
+def test_match_query_is_sanitized():
+    """Test user input becomes quoted terms, phrases and prefixes only."""
+    assert build_match_query('order 123') == '"order" AND "123"'
+    assert build_match_query('"where is my" pack*') == '"where is my" AND "pack" *'
+    assert build_match_query('a OR b) NEAR(') == '"a" AND "OR" AND "b" AND "NEAR"'
+    with pytest.raises(ValueError):
+        build_match_query('"" * -')
+
+
+def test_phrase_and_prefix_search(index):
+    """Test phrases match in order and prefixes match word starts."""
+    index.add(make_item("1", "Where is my package? Order 123"))
+    index.add(make_item("2", "My package is where I left it"))
+    index.add(make_item("3", "Please cancel order 456"))
+    index.flush()
+
+    assert set(search_ids(index, "package")) == {"1", "2"}
+    assert search_ids(index, '"where is my package"') == ["1"]
+    assert set(search_ids(index, "ord*")) == {"1", "3"}
+    assert search_ids(index, "cancel ord*") == ["3"]
+    assert index.search("cancel")[0].snippet == "Please [cancel] order 456"
+
+
+def test_filters_and_ordering(index):
+    """Test number and time filters and newest-first ordering."""
+    index.add(make_item("old", "refund please", created="2024-04-01T08:00:00+00:00"))
+    index.add(make_item("new", "refund now", created="2024-05-02T08:00:00+02:00"))
+    index.add(make_item("other", "refund", from_number="+46733333333", to_number="+46799999999"))
+    index.flush()
+
+    assert search_ids(index, "refund", number="+46711111111") == ["new", "old"]
+    assert search_ids(index, "refund", number="+46799999999") == ["other"]
+    assert search_ids(index, "refund", from_number="+46733333333") == ["other"]
+    assert search_ids(index, "refund", to_number="+46700000000", start=datetime(2024, 4, 15)) == ["new"]
+    assert search_ids(index, "refund", end=datetime(2024, 4, 2)) == ["old"]
+    # Timestamps are stored in UTC
+    assert index.search("now")[0].created == datetime(2024, 5, 2, 6, 0)
+
+
+def test_updates_and_deletes(index):
+    """Test re-indexing replaces a message and deleted SMS stop matching."""
+    index.add(make_item("1", "first text"))
+    index.add(make_item("1", "second text"))
+    index.add(make_item("2", "second again"))
+    index.remove("2")
+    index.flush()
+
+    assert search_ids(index, "first") == []
+    assert search_ids(index, "second") == ["1"]
+    assert index.count() == 1
+
+
+def test_rebuild_from_parallel_scan(index):
+    """Test a rebuild indexes every scan segment and drops deleted messages."""
+    index.add(make_item("stale", "deleted from the table"))
+    index.flush()
+
+    pages = {
+        0: [{"Items": [make_item("a", "hello one")], "LastEvaluatedKey": {"id": "a"}},
+            {"Items": [make_item("b", "hello two")]}],
+        1: [{"Items": [make_item("c", "hello three")]}],
+    }
+    table = MagicMock()
+    table.scan.side_effect = lambda **kwargs: pages[kwargs["Segment"]].pop(0)
+
+    assert index.rebuild(table, segments=2) == 3
+    assert {call.kwargs["TotalSegments"] for call in table.scan.call_args_list} == {2}
+    assert set(search_ids(index, "hello")) == {"a", "b", "c"}
+    assert search_ids(index, "deleted") == []
+
+
+@patch('app.main.get_sms_search_index')
+def test_search_endpoint(mock_get_index, index):
+    """Test the search API returns hits and rejects empty queries."""
+    mock_get_index.return_value = index
+    index.add(make_item("1", "Where is my package?"))
+    index.flush()
+
+    response = client.get("/sms/search", params={"q": "packa*", "number": "+46700000000"})
+    assert response.status_code == 200
+    assert [hit["id"] for hit in response.json()] == ["1"]
+
+    response = client.get("/sms/search", params={"q": "***"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@patch('app.services.sms_service.get_ingest_spool', return_value=None)
+@patch('app.services.sms_service.DynamoDBService')
+async def test_store_sms_survives_index_failure(mock_db_service, mock_get_spool):
+    """Test an SMS is still stored when the search index cannot be opened."""
+    webhook = SMSWebhook(id="sf1", from_number="+46706861004", to_number="+46706860000",
+                         message="Hello", direction="incoming", created="2018-07-13T13:57:23.741000")
+    with patch('app.services.sms_service.get_sms_search_index', side_effect=FileNotFoundError("/proc/nope")):
+        service = SMSService()
+        assert (await service.store_sms(webhook)).id == "sf1"
+        assert await service.delete_sms("sf1") is True
+    table = mock_db_service.return_value.dynamodb.Table.return_value
+    table.put_item.assert_called_once()
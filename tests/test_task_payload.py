@@ -0,0 +1,150 @@
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.main import app
+from app.models.sms import SMSResponse
+from app.services.sms_service import SMSService, StaleSMSError
+from app.workers.sms_tasks import process_sms_task, sms_from_payload, task_payload
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def sms():
+    return SMSResponse(
+        id="sf8425555e5d8db61dda7a7b3f1b91bdb",
+        from_number="+46706861004",
+        to_number="+46706860000",
+        message="Hello how are you?",
+        direction="incoming",
+        created="2018-07-13T13:57:23.741000"
+    )
+
+
+def test_payload_round_trip(sms):
+    """Test a task payload rebuilds the same SMS and carries its version."""
+    payload = task_payload(sms)
+    assert payload["v"] == 1
+    assert sms_from_payload(payload) == (sms, 1)
+
+
+@patch('app.workers.sms_tasks.publish_events')
+@patch('app.workers.sms_tasks.get_reply_suppressor')
+@patch('app.services.sms_service.SMSService.mark_reply_sent', new_callable=AsyncMock)
+@patch('app.services.sms_service.SMSService.mark_sms_processed', new_callable=AsyncMock)
+@patch('app.services.sms_service.SMSService.get_sms', new_callable=AsyncMock)
+def test_payload_skips_read_unless_stale(mock_get_sms, mock_mark_processed, mock_mark_reply, mock_get_suppressor,
+                                         mock_publish, sms):
+    """Test a payload is processed without a read, and a stale one falls back to reading."""
+    mock_get_suppressor.return_value.check.return_value = ("send", 0.0)
+
+    result = process_sms_task(sms.id, task_payload(sms))
+    assert result["processed"]
+    mock_get_sms.assert_not_awaited()
+    mock_mark_processed.assert_awaited_once_with(
+        sms.id, expected_version=1, reply_rule=result["reply_rule"] or "default",
+        selected_reply=result["reply_message"]
+    )
+
+    mock_mark_processed.reset_mock()
+    mock_mark_processed.side_effect = [StaleSMSError(sms.id), None]
+    mock_get_sms.return_value = sms.model_copy(update={"message": "edited"})
+    result = process_sms_task(sms.id, task_payload(sms))
+    assert result["processed"]
+    mock_get_sms.assert_awaited_once_with(sms.id)
+    assert mock_mark_processed.await_args_list[-1].args == (sms.id,)
+    assert mock_publish.call_args.args[1][0]["message"] == "edited"
+    mock_mark_reply.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_mark_processed_checks_version():
+    """Test the processed update is conditional on the expected version."""
+    with patch('app.services.sms_service.DynamoDBService'):
+        service = SMSService()
+    table = service.db_service.dynamodb.Table.return_value
+    table.update_item.side_effect = ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem"
+    )
+
+    with pytest.raises(StaleSMSError):
+        await service.mark_sms_processed("a", expected_version=1)
+    kwargs = table.update_item.call_args.kwargs
+    assert kwargs["ConditionExpression"] == "version = :expected_version"
+    assert "ADD version :one" in kwargs["UpdateExpression"]
+
+    # Without an expected version failures are still swallowed
+    assert await service.mark_sms_processed("a") is None
+
+    # Other failures are raised so the task retries
+    table.update_item.side_effect = ClientError({"Error": {"Code": "ThrottlingException"}}, "UpdateItem")
+    with pytest.raises(ClientError):
+        await service.mark_sms_processed("a", expected_version=1)
+    assert await service.mark_sms_processed("a") is None
+
+
+@pytest.mark.asyncio
+async def test_mark_processed_stores_selected_reply():
+    """Test the selected rule and reply are written with the processed flag."""
+    with patch('app.services.sms_service.DynamoDBService'):
+        service = SMSService()
+    table = service.db_service.dynamodb.Table.return_value
+    table.update_item.return_value = {"Attributes": None}
+
+    await service.mark_sms_processed("a", reply_rule="help", selected_reply="Need help?")
+
+    kwargs = table.update_item.call_args.kwargs
+    assert "reply_rule = :reply_rule, selected_reply = :selected_reply" in kwargs["UpdateExpression"]
+    assert kwargs["ExpressionAttributeValues"][":reply_rule"] == "help"
+
+
+@patch('app.main.get_rate_limiter', return_value=None)
+@patch('app.main.settings.sms_task_payload_enabled', True)
+@patch('app.services.sms_service.SMSService.store_sms', new_callable=AsyncMock)
+@patch('app.workers.sms_tasks.process_sms_task.delay')
+def test_webhook_enqueues_payload(mock_delay, mock_store_sms, mock_get_limiter, sms):
+    """Test the webhook enqueues the stored message with the task when enabled."""
+    mock_store_sms.return_value = sms
+    response = client.post("/elks/sms", data={
+        "id": sms.id, "from": sms.from_number, "to": sms.to_number,
+        "message": sms.message, "direction": sms.direction, "created": "2018-07-13T13:57:23.741000"
+    })
+
+    assert response.status_code == 200
+    mock_delay.assert_called_once_with(sms.id, task_payload(sms))
+
+
+@patch('app.workers.sms_tasks.publish_events')
+@patch('app.workers.sms_tasks.get_reply_suppressor')
+@patch('app.services.sms_service.SMSService.mark_sms_processed', new_callable=AsyncMock)
+def test_payload_task_retries_when_marking_fails(mock_mark_processed, mock_get_suppressor, mock_publish, sms):
+    """Test a failed processed update retries the task before replying or publishing."""
+    mock_mark_processed.side_effect = ClientError({"Error": {"Code": "ThrottlingException"}}, "UpdateItem")
+
+    with patch.object(process_sms_task, 'retry', side_effect=RuntimeError("retry")) as mock_retry:
+        with pytest.raises(RuntimeError):
+            process_sms_task(sms.id, task_payload(sms))
+
+    mock_retry.assert_called_once()
+    mock_get_suppressor.return_value.check.assert_not_called()
+    mock_publish.assert_not_called()
+
+
+@patch('app.workers.sms_tasks.publish_events')
+@patch('app.workers.sms_tasks.get_reply_suppressor')
+@patch('app.services.sms_service.SMSService.mark_sms_processed', new_callable=AsyncMock)
+@patch('app.services.sms_service.SMSService.get_sms', new_callable=AsyncMock)
+def test_stale_payload_of_processed_sms_is_skipped(mock_get_sms, mock_mark_processed, mock_get_suppressor,
+                                                   mock_publish, sms):
+    """Test an SMS another task already processed is not processed or published again."""
+    mock_mark_processed.side_effect = StaleSMSError(sms.id)
+    mock_get_sms.return_value = sms.model_copy(update={"processed": True})
+
+    result = process_sms_task(sms.id, task_payload(sms))
+
+    assert result["skipped"]
+    mock_mark_processed.assert_awaited_once()
+    mock_get_suppressor.return_value.check.assert_not_called()
+    mock_publish.assert_not_called()
@@ -0,0 +1,141 @@
+import json
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from unittest.mock import patch
+
+from app.services.dynamodb_service import instrument_dynamodb_client
+from app.utils import tracing
+from app.utils.tracing import (
+    BatchSpanProcessor,
+    FileSpanExporter,
+    NonRecordingSpan,
+    Span,
+    Tracer,
+    extract,
+    inject,
+    start_span,
+)
+from app.workers import monitoring
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracer = Tracer(BatchSpanProcessor(exporter), sample_rate=1.0)
+    with patch.object(tracing, "_tracer", tracer):
+        yield exporter
+        tracer.processor.flush()
+
+
+def test_traceparent_round_trip():
+    """Test W3C traceparent headers are parsed and rejected when malformed."""
+    header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    context = extract(header)
+    assert context.traceparent == header
+    assert context.sampled
+    assert extract("00-xyz-b7ad6b7169203331-01") is None
+    assert extract(None) is None
+
+
+def test_disabled_tracing_returns_noop_span():
+    """Test spans cost nothing when tracing is disabled."""
+    with patch.object(tracing, "_tracer", None), patch.object(tracing.settings, "tracing_enabled", False):
+        with start_span("noop") as span:
+            assert not span.recording
+            assert inject() is None
+
+
+def test_children_share_trace_and_propagate(exporter):
+    """Test child spans join the current trace and the context is injectable."""
+    with start_span("root") as root:
+        with start_span("child") as child:
+            assert inject() == child.traceparent
+    tracing._tracer.processor.flush()
+
+    assert [span.name for span in exporter.spans] == ["child", "root"]
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+
+
+def test_head_sampling_is_inherited():
+    """Test unsampled traces produce non-recording spans all the way down."""
+    exporter = ListExporter()
+    tracer = Tracer(BatchSpanProcessor(exporter), sample_rate=0.0)
+    root = tracer.start_span("root")
+    assert isinstance(root, NonRecordingSpan)
+    with root:
+        child = tracer.start_span("child")
+        assert isinstance(child, NonRecordingSpan)
+        assert child.trace_id == root.trace_id
+    assert root.traceparent.endswith("-00")
+
+    sampled_parent = extract("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    assert isinstance(tracer.start_span("remote", parent=sampled_parent), Span)
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    """Test the file exporter writes OTLP/JSON export requests."""
+    path = tmp_path / "traces.jsonl"
+    processor = BatchSpanProcessor(FileSpanExporter(str(path)))
+    tracer = Tracer(processor)
+    with tracer.start_span("root", attributes={"sms.id": "abc", "retries": 2}):
+        pass
+    processor.flush()
+
+    request = json.loads(path.read_text().splitlines()[0])
+    span = request["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == "root"
+    assert len(span["traceId"]) == 32
+    assert {"key": "retries", "value": {"intValue": "2"}} in span["attributes"]
+
+
+def test_dynamodb_calls_create_client_spans(exporter):
+    """Test DynamoDB calls become child spans of the current span."""
+    dynamodb = boto3.client(
+        "dynamodb", region_name="us-east-1",
+        aws_access_key_id="test", aws_secret_access_key="test"
+    )
+    instrument_dynamodb_client(dynamodb)
+
+    with Stubber(dynamodb) as stubber:
+        stubber.add_response("get_item", {"ConsumedCapacity": {"TableName": "t", "CapacityUnits": 0.5}})
+        with start_span("root") as root:
+            dynamodb.get_item(TableName="t", Key={"id": {"S": "1"}})
+    tracing._tracer.processor.flush()
+
+    db_span = next(span for span in exporter.spans if span.name == "DynamoDB.GetItem")
+    assert db_span.parent_id == root.span_id
+    assert db_span.attributes["aws.dynamodb.consumed_capacity"] == 0.5
+
+
+def test_celery_headers_carry_trace_context(exporter):
+    """Test trace context is injected into task headers and resumed by the worker."""
+    headers = {}
+    with start_span("receive_sms_webhook") as root:
+        monitoring._stamp_task_headers(headers=headers)
+    assert headers["traceparent"] == root.traceparent
+
+    task = SimpleNamespace(
+        name="app.workers.sms_tasks.process_sms_task",
+        request=SimpleNamespace(traceparent=headers["traceparent"], retries=0, eta=None,
+                                skippy_enqueued_at=headers["skippy_enqueued_at"])
+    )
+    monitoring._on_task_prerun(task_id="task-1", task=task)
+    monitoring._on_task_postrun(task_id="task-1", task=task, state="SUCCESS")
+    tracing._tracer.processor.flush()
+
+    task_span = next(span for span in exporter.spans if span.name.startswith("celery."))
+    assert task_span.trace_id == root.trace_id
+    assert task_span.parent_id == root.span_id
+    assert task_span.attributes["celery.state"] == "SUCCESS"
@@ -0,0 +1,150 @@
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.main import app
+from app.services.traffic_stats import TrafficStats, bucket_key, lag_counter
+
+client = TestClient(app)
+
+CREATED = datetime(2024, 5, 1, 13, 45, tzinfo=timezone.utc)
+
+
+def make_stats(**kwargs):
+    stats = TrafficStats("skippy_sms_stats", db_service=MagicMock(), **kwargs)
+    table = stats.db_service.dynamodb.Table.return_value
+    return stats, table
+
+
+def written_counts(table):
+    """Map (scope, bucket) to the counters ADDed by each update_item call."""
+    counts = {}
+    for call in table.update_item.call_args_list:
+        kwargs = call.kwargs
+        key = (kwargs["Key"]["scope"], kwargs["Key"]["bucket"])
+        names = kwargs["ExpressionAttributeNames"]
+        values = kwargs["ExpressionAttributeValues"]
+        counts[key] = {names[f"#c{i}"]: values[f":c{i}"] for i in range(len(names))}
+    return counts
+
+
+def test_bucket_keys_and_lag_buckets():
+    """Test buckets are keyed by UTC hour/day and lags land in the right bucket."""
+    assert bucket_key("hour", CREATED) == "hour#2024-05-01T13"
+    assert bucket_key("day", datetime(2024, 5, 1, 23, 30)) == "day#2024-05-01"
+    assert lag_counter(0.2) == "lag_le_1"
+    assert lag_counter(45) == "lag_le_60"
+    assert lag_counter(3600) == "lag_gt_300"
+
+
+def test_flush_adds_aggregated_counters():
+    """Test many events cost one ADD update per scope and bucket."""
+    stats, table = make_stats()
+    for _ in range(3):
+        stats.record_received("+46700000000", "+46711111111", CREATED)
+    stats.record_processed("+46700000000", "+46711111111", CREATED, "send",
+                           processed_at=datetime(2024, 5, 1, 13, 45, 2))
+    stats.record_processed("+46700000000", "+46722222222", CREATED, "skip",
+                           processed_at=datetime(2024, 5, 1, 13, 45, 30))
+
+    assert stats.flush() == 4
+    counts = written_counts(table)
+    assert set(counts) == {
+        ("all", "hour#2024-05-01T13"), ("all", "day#2024-05-01"),
+        ("to:+46700000000", "hour#2024-05-01T13"), ("to:+46700000000", "day#2024-05-01"),
+    }
+    assert counts[("all", "hour#2024-05-01T13")] == {
+        "received": 3, "processed": 2, "replied": 1, "reply_suppressed": 1,
+        "lag_ms": 32000, "lag_le_10": 1, "lag_le_60": 1,
+    }
+    assert "ADD" in table.update_item.call_args.kwargs["UpdateExpression"]
+    assert stats.flush() == 0
+
+
+def test_per_sender_scope():
+    """Test sender rollups are only kept when enabled."""
+    stats, table = make_stats(per_sender=True)
+    stats.record_received("+46700000000", "+46711111111", CREATED)
+    stats.flush()
+    assert ("from:+46711111111", "hour#2024-05-01T13") in written_counts(table)
+
+
+def test_failed_flush_keeps_counts():
+    """Test counters whose update failed are added to the next flush."""
+    stats, table = make_stats()
+    stats.record_received("+46700000000", "+46711111111", CREATED)
+    table.update_item.side_effect = Exception("throttled")
+    assert stats.flush() == 0
+    assert stats.pending_count() == 4
+
+    table.update_item.side_effect = None
+    table.update_item.reset_mock()
+    stats.record_received("+46700000000", "+46711111111", CREATED)
+    assert stats.flush() == 4
+    assert written_counts(table)[("all", "day#2024-05-01")] == {"received": 2}
+
+
+@pytest.mark.asyncio
+async def test_query_builds_buckets():
+    """Test stored rollups are read with one range query and derived rates."""
+    stats, table = make_stats()
+    table.query.return_value = {"Items": [{
+        "scope": "all", "bucket": "hour#2024-05-01T13",
+        "received": Decimal(4), "processed": Decimal(4), "replied": Decimal(2),
+        "reply_coalesced": Decimal(1), "lag_ms": Decimal(6000),
+        "lag_le_1": Decimal(3), "lag_le_10": Decimal(1),
+    }]}
+
+    buckets = await stats.query("hour", datetime(2024, 5, 1, 0), datetime(2024, 5, 1, 23))
+
+    values = table.query.call_args.kwargs["ExpressionAttributeValues"]
+    assert (values[":start"], values[":end"]) == ("hour#2024-05-01T00", "hour#2024-05-01T23")
+    bucket = buckets[0]
+    assert bucket.start == datetime(2024, 5, 1, 13)
+    assert bucket.reply_rate == 0.75
+    assert bucket.avg_processing_lag == 1.5
+    assert bucket.processing_lag == {"le_1": 3, "le_10": 1}
+
+
+@patch('app.main.get_traffic_stats')
+def test_traffic_stats_endpoint(mock_get_stats):
+    """Test the endpoint picks the scope and rejects oversized ranges."""
+    stats = mock_get_stats.return_value
+    stats.query = AsyncMock(return_value=[])
+
+    response = client.get("/stats/traffic", params={
+        "granularity": "day", "number": "+46700000000",
+        "start": "2024-05-01T00:00:00Z", "end": "2024-05-31T00:00:00Z"
+    })
+    assert response.status_code == 200
+    granularity, start, end, scope = stats.query.call_args.args
+    assert (granularity, scope) == ("day", "to:+46700000000")
+    assert start == datetime(2024, 5, 1)
+
+    response = client.get("/stats/traffic", params={
+        "granularity": "hour", "start": "2024-01-01T00:00:00", "end": "2024-05-01T00:00:00"
+    })
+    assert response.status_code == 400
+
+
+def test_worker_shutdown_only_stops_an_aggregator_of_this_process():
+    """Test shutdown does not create an aggregator (and its flusher) in a process that never used one."""
+    from app.services import traffic_stats
+    from app.workers.monitoring import _flush_traffic_stats
+
+    stats = MagicMock()
+    with patch.object(traffic_stats, '_stats', None), patch.object(traffic_stats, 'TrafficStats') as mock_cls:
+        _flush_traffic_stats()
+        mock_cls.assert_not_called()
+
+    with patch.object(traffic_stats, '_stats', stats), patch.object(traffic_stats, '_stats_pid', -1):
+        _flush_traffic_stats()
+        stats.stop.assert_not_called()
+
+    with patch.object(traffic_stats, '_stats', stats), patch.object(traffic_stats, '_stats_pid', os.getpid()):
+        _flush_traffic_stats()
+        stats.stop.assert_called_once()
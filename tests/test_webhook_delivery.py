@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from unittest.mock import patch
+
+from app.models.subscription import Subscription
+from app.services.webhook_delivery import SIGNATURE_HEADER, WebhookDeliveryEngine, make_event
+from app.utils.helpers import sign_webhook_payload, validate_webhook_signature
+from app.workers.delivery_tasks import deliver_events_task
+
+SECRET = "test-secret-0123456789"
+
+
+class StubReceiver:
+    """Local HTTP server recording webhook deliveries."""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with receiver._lock:
+                    receiver.in_flight += 1
+                    receiver.max_in_flight = max(receiver.max_in_flight, receiver.in_flight)
+                    status = receiver.statuses.pop(0) if receiver.statuses else 200
+                time.sleep(receiver.delay)
+                with receiver._lock:
+                    receiver.in_flight -= 1
+                    receiver.requests.append((dict(self.headers), body))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver():
+    stub = StubReceiver()
+    yield stub
+    stub.close()
+
+
+def make_subscription(url, **kwargs):
+    return Subscription(id=kwargs.pop("id", "sub-1"), url=url, secret=SECRET, **kwargs)
+
+
+def make_events(count, event_type="sms.received"):
+    return [make_event(event_type, {"id": f"sms-{i}", "message": "Hello"}) for i in range(count)]
+
+
+def test_signature_roundtrip():
+    """Test signatures validate, and tampered, stale or missing ones do not."""
+    body = b'{"id": "sms-1"}'
+    signature = sign_webhook_payload(body, SECRET, timestamp=1000)
+
+    assert validate_webhook_signature(body, signature, SECRET, now=1010)
+    assert validate_webhook_signature(body.decode(), signature, SECRET, now=1010)
+    assert not validate_webhook_signature(body + b" ", signature, SECRET, now=1010)
+    assert not validate_webhook_signature(body, signature, "other-secret", now=1010)
+    assert not validate_webhook_signature(body, signature, SECRET, now=2000)
+    assert validate_webhook_signature(body, signature, SECRET, tolerance=None, now=2000)
+    assert not validate_webhook_signature(body, "", SECRET)
+    assert not validate_webhook_signature(body, "t=1000", SECRET, now=1010)
+
+    # Rotated secrets: any matching v1 value is accepted
+    rotated = signature + ",v1=" + "0" * 64
+    assert validate_webhook_signature(body, rotated, SECRET, now=1010)
+
+
+@pytest.mark.asyncio
+async def test_delivers_signed_events(receiver):
+    """Test each event is POSTed with a signature the receiver can verify."""
+    engine = WebhookDeliveryEngine(retries=0)
+    results = await engine.deliver(make_events(3), [make_subscription(receiver.url)])
+
+    assert all(result.delivered for result in results)
+    assert len(receiver.requests) == 3
+    for headers, body in receiver.requests:
+        assert validate_webhook_signature(body, headers[SIGNATURE_HEADER], SECRET)
+        assert json.loads(body)["type"] == "sms.received"
+
+
+@pytest.mark.asyncio
+async def test_batch_subscribers_receive_arrays(receiver):
+    """Test batch subscribers get arrays of at most max_batch_size events."""
+    engine = WebhookDeliveryEngine(retries=0)
+    subscription = make_subscription(receiver.url, batch=True, max_batch_size=4)
+    results = await engine.deliver(make_events(10), [subscription])
+
+    assert [len(result.event_ids) for result in results] == [4, 4, 2]
+    sizes = sorted(len(json.loads(body)) for _, body in receiver.requests)
+    assert sizes == [2, 4, 4]
+
+
+@pytest.mark.asyncio
+async def test_event_type_filter(receiver):
+    """Test subscribers only receive the event types they asked for."""
+    engine = WebhookDeliveryEngine(retries=0)
+    subscription = make_subscription(receiver.url, event_types=["webhook.received"])
+    events = make_events(2) + make_events(1, event_type="webhook.received")
+    await engine.deliver(events, [subscription])
+
+    assert [json.loads(body)["type"] for _, body in receiver.requests] == ["webhook.received"]
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_failures_but_not_rejections():
+    """Test 5xx responses are retried and other 4xx responses are not."""
+    flaky = StubReceiver(statuses=[503, 500])
+    rejecting = StubReceiver(statuses=[422])
+    try:
+        engine = WebhookDeliveryEngine(retries=2, backoff=0.01)
+        results = await engine.deliver(make_events(1), [
+            make_subscription(flaky.url, id="flaky"),
+            make_subscription(rejecting.url, id="rejecting"),
+        ])
+    finally:
+        flaky.close()
+        rejecting.close()
+
+    by_subscription = {result.subscription_id: result for result in results}
+    assert by_subscription["flaky"].delivered
+    assert len(flaky.requests) == 3
+    assert not by_subscription["rejecting"].delivered
+    assert not by_subscription["rejecting"].retryable
+    assert len(rejecting.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_repeated_failures():
+    """Test a failing subscriber stops receiving requests once its circuit opens."""
+    failing = StubReceiver(statuses=[500] * 100)
+    try:
+        engine = WebhookDeliveryEngine(retries=0, breaker_threshold=3, breaker_reset=60)
+        subscription = make_subscription(failing.url, max_concurrency=1)
+        results = await engine.deliver(make_events(10), [subscription])
+    finally:
+        failing.close()
+
+    assert len(failing.requests) == 3
+    assert all(result.retryable and not result.delivered for result in results)
+    assert sum(result.detail == "circuit open" for result in results) == 7
+
+
+@pytest.mark.asyncio
+async def test_per_subscriber_concurrency_limit():
+    """Test no more than max_concurrency requests are in flight to one subscriber."""
+    slow = StubReceiver(delay=0.05)
+    try:
+        engine = WebhookDeliveryEngine(retries=0)
+        await engine.deliver(make_events(12), [make_subscription(slow.url, max_concurrency=3)])
+    finally:
+        slow.close()
+
+    assert len(slow.requests) == 12
+    assert slow.max_in_flight <= 3
+
+
+@patch('app.workers.delivery_tasks.deliver_events_task.apply_async')
+@patch('app.workers.delivery_tasks.get_subscription_registry')
+def test_deliver_task_requeues_retryable_failures(mock_registry, mock_apply_async):
+    """Test the Celery task re-queues only the failed subscriber's events."""
+    failing = StubReceiver(statuses=[500] * 10)
+    working = StubReceiver()
+    try:
+        mock_registry.return_value.subscriptions.return_value = [
+            make_subscription(failing.url, id="failing"),
+            make_subscription(working.url, id="working"),
+        ]
+        with patch('app.workers.delivery_tasks.get_delivery_engine',
+                   return_value=WebhookDeliveryEngine(retries=0)):
+            result = deliver_events_task(make_events(2))
+    finally:
+        failing.close()
+        working.close()
+
+    assert result == {"delivered": 2, "requeued": 2}
+    args = mock_apply_async.call_args.kwargs["args"]
+    assert [event["id"] for event in args[0]] == ["sms-0", "sms-1"]
+    assert args[1:] == [["failing"], 1]
+
+
+def test_each_event_loop_gets_its_own_pool():
+    """Test threads running their own loops never share (or close) each other's HTTP pool."""
+    engine = WebhookDeliveryEngine()
+
+    async def pool():
+        return engine._pools.get()
+
+    first_loop = asyncio.new_event_loop()
+    try:
+        first = first_loop.run_until_complete(pool())
+        second = asyncio.run(pool())
+        assert first_loop.run_until_complete(pool()) is first
+        assert first.client is not second.client and not first.client.is_closed
+        # The closed loop's pool is dropped once another loop needs one
+        third = asyncio.run(pool())
+        assert second not in engine._pools._values.values() and third is not second
+    finally:
+        first_loop.close()
@@ -1,9 +1,16 @@
+import json
+from decimal import Decimal
+
 import pytest
+from botocore.exceptions import ClientError
 from fastapi.testclient import TestClient
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+from app.config import settings
 from app.main import app
 from app.models.webhook import WebhookCreate, WebhookResponse
+from app.services.dynamodb_service import DynamoDBService
+from app.utils.json_stream import JSONStreamError, iter_json_array
 
 client = TestClient(app)
 
@@ -147,3 +154,88 @@ def test_process_webhook(mock_task_delay, mock_get_webhook, sample_webhook_respo
     assert response.status_code == 200
     assert response.json()["message"] == "Webhook queued for processing"
     mock_task_delay.assert_called_once_with("test-uuid")
+
+
+def make_events(count):
+    return [
+        {"event_type": "user.created", "payload": {"user_id": str(i), "score": 1.5}, "source": "test-service"}
+        for i in range(count)
+    ]
+
+
+async def byte_chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@patch('app.main.process_webhook_batch_task')
+@patch('app.services.dynamodb_service.DynamoDBService.write_webhook_items')
+def test_create_webhooks_batch_json_array(mock_write, mock_batch_task):
+    """Test a JSON array batch is written in chunks with one result per event."""
+    mock_write.side_effect = lambda items: [None] * len(items)
+    events = make_events(60)
+    events.insert(3, {"event_type": "user.created", "source": "test-service"})
+
+    response = client.post("/webhooks/batch", json=events)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["invalid"], data["failed"]) == (60, 1, 0)
+    assert [result["index"] for result in data["results"]] == list(range(61))
+    assert data["results"][3]["status"] == "invalid"
+    assert "payload" in data["results"][3]["error"]
+    assert mock_write.call_count == 3
+    written = [webhook_id for call in mock_batch_task.delay.call_args_list for webhook_id in call.args[0]]
+    assert sorted(written) == sorted(r["id"] for r in data["results"] if r["status"] == "created")
+
+
+@patch('app.main.process_webhook_batch_task')
+@patch('app.services.dynamodb_service.DynamoDBService.write_webhook_items')
+def test_create_webhooks_batch_ndjson_reports_progress_on_bad_line(mock_write, mock_batch_task):
+    """Test NDJSON batches report failed writes and stop at a malformed line."""
+    mock_write.side_effect = lambda items: ["ValidationException: too large"] + [None] * (len(items) - 1)
+    body = "\n".join(json.dumps(event) for event in make_events(3)) + "\n{not json}\n"
+
+    response = client.post(
+        "/webhooks/batch", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 400
+    data = response.json()
+    assert "line 4" in data["error"]
+    assert [result["status"] for result in data["results"]] == ["failed", "created", "created"]
+
+
+@patch('app.services.dynamodb_service.time.sleep')
+def test_write_webhook_items_retries_unprocessed(mock_sleep):
+    """Test unprocessed items are retried and rejected chunks are reported per item."""
+    service = DynamoDBService()
+    service.dynamodb = MagicMock()
+    client_mock = service.dynamodb.meta.client
+    items = [service.build_webhook_item(event) for event in make_events(2)]
+    client_mock.batch_write_item.side_effect = [
+        {"UnprocessedItems": {settings.dynamodb_table_name: [{"PutRequest": {"Item": items[1]}}]}},
+        {"UnprocessedItems": {}},
+    ]
+
+    assert service.write_webhook_items(items) == [None, None]
+    retried = client_mock.batch_write_item.call_args.kwargs["RequestItems"][settings.dynamodb_table_name]
+    assert [request["PutRequest"]["Item"]["id"] for request in retried] == [items[1]["id"]]
+    assert retried[0]["PutRequest"]["Item"]["payload"]["score"] == Decimal("1.5")
+
+    client_mock.batch_write_item.side_effect = ClientError(
+        {"Error": {"Code": "ValidationException", "Message": "bad"}}, "BatchWriteItem"
+    )
+    assert service.write_webhook_items(items) == ["ValidationException: bad"] * 2
+
+
+@pytest.mark.asyncio
+async def test_iter_json_array_handles_split_chunks():
+    """Test array elements split across chunks (including numbers and UTF-8) decode correctly."""
+    values = [{"text": "héj ✓"}, 12345, -2.5e-3, True, None, [1, 2]]
+    data = json.dumps(values).encode()
+    for size in (1, 3, 7):
+        assert [value async for value in iter_json_array(byte_chunks(data, size), 1024)] == values
+
+    with pytest.raises(JSONStreamError):
+        [value async for value in iter_json_array(byte_chunks(b'[1, 2', 2), 1024)]